@@ -0,0 +1,179 @@
+"""
+Benchmark de los indicadores de modules/ sobre datos OHLCV sintéticos
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.benchmark_indicadores --salida benchmark.json
+    python -m benchmarks.benchmark_indicadores --filas 1000 10000 --baseline benchmarks/baseline.json
+
+benchmarks/baseline.json es el reporte de referencia del repo (numpy y pandas con los que se midió dentro del json). Por defecto los casos de AT se corren hasta 10k filas:
+para medir también los de 100k (los que están en el baseline, varios minutos por caso con lags chicos) hay que pasar --max_filas_AT 0. Al regenerar el baseline:
+    python -m benchmarks.benchmark_indicadores --max_filas_AT 0 --salida benchmarks/baseline.json
+
+El reporte es un json con una entrada por (función, parámetros, filas): segundos (mejor de N repeticiones), filas por segundo y pico de memoria (tracemalloc, en una corrida aparte para no afectar el tiempo). Con --baseline compara contra un reporte anterior y termina con código 1 si alguna función es más lenta que la tolerancia
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from modules import indicators_foreign as foreign
+from modules import indicators_mios as mios
+
+"""
+OHLCV SINTÉTICO
+Params:
+    filas: cantidad de días
+    semilla: semilla del generador (mismos datos en cada corrida)
+
+Returns:
+    DataFrame con las columnas <FC>, <OPEN>, <HIGH>, <LOW>, <CLOSE>, <VOL> (días hábiles desde 2000-01-03)
+"""
+def genera_ohlcv(filas, semilla=0):
+  """Camino aleatorio geométrico para el cierre; apertura, máximo y mínimo alrededor del cierre y volumen log-normal."""
+  rng = np.random.default_rng(semilla)
+  close = 100*np.exp(np.cumsum(rng.normal(0, 0.02, filas)))
+  open_ = close*(1 + rng.normal(0, 0.005, filas))
+  high = np.maximum(open_, close)*(1 + np.abs(rng.normal(0, 0.01, filas)))
+  low = np.minimum(open_, close)*(1 - np.abs(rng.normal(0, 0.01, filas)))
+  vol = np.round(rng.lognormal(10, 1, filas))
+  return pd.DataFrame({'<FC>': pd.bdate_range('2000-01-03', periods=filas), '<OPEN>': np.round(open_, 2), '<HIGH>': np.round(high, 2),
+                       '<LOW>': np.round(low, 2), '<CLOSE>': np.round(close, 2), '<VOL>': vol})
+
+"""
+CASOS
+Lista de (nombre, función, parámetros). Las de canalidad y AT se miden para varias ventanas y lags
+"""
+CASOS = [(nombre, getattr(foreign, nombre), {}) for nombre in
+         ('ema', 'macd', 'acc_dist', 'on_balance_volume', 'price_volume_trend', 'average_true_range', 'bollinger_bands',
+          'chaikin_oscillator', 'typical_price', 'ease_of_movement', 'mass_index', 'directional_movement_index',
+          'money_flow_index', 'negative_volume_index', 'positive_volume_index', 'momentum', 'rsi', 'chaikin_volatility',
+          'williams_ad', 'williams_r', 'trix', 'ultimate_oscillator')]
+CASOS += [('calcula_amplitud', mios.calcula_amplitud, {}),
+          ('estandariza_volumen', mios.estandariza_volumen, {}),
+          ('calcula_historia', mios.calcula_historia, {'columnas': ['<OPEN>', '<HIGH>', '<LOW>', '<CLOSE>', '<VOL>'], 'lags': 15})]
+CASOS += [('calcula_canalidad_y', mios.calcula_canalidad_y, {'lista_ventanas': ventanas}) for ventanas in ([5, 30], [5, 30, 90, 180])]
+CASOS += [('calcula_canalidad_histog_macd', mios.calcula_canalidad_histog_macd, {'lista_ventanas': ventanas}) for ventanas in ([5, 30], [5, 30, 90, 180])]
+CASOS += [('calcula_AT_tendencias', mios.calcula_AT_tendencias, {'lags': lags}) for lags in (4, 8, 30, 120, 360)]
+CASOS += [('calcula_AT_tendencias_lags', mios.calcula_AT_tendencias_lags, {})]
+
+def _prepara(nombre, data):
+  """Columnas que la función espera de antes (el histograma MACD para la canalidad del histograma)."""
+  if nombre == 'calcula_canalidad_histog_macd':
+    return foreign.macd(data)
+  return data
+
+def _mide(funcion, data, params, repeticiones):
+  """Mejor tiempo de N corridas (cada una sobre una copia) y pico de memoria de una corrida más con tracemalloc."""
+  tiempos = []
+  for _ in range(repeticiones):
+    copia = data.copy()
+    inicio = time.perf_counter()
+    funcion(copia, **params)
+    tiempos.append(time.perf_counter() - inicio)
+  copia = data.copy()
+  tracemalloc.start()
+  funcion(copia, **params)
+  _, pico = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return min(tiempos), pico
+
+"""
+CORRE BENCHMARK
+Params:
+    lista_filas: tamaños de la base sintética
+    repeticiones: corridas por caso (se queda con la más rápida)
+    filtro: si se indica, solo corre los casos cuyo nombre contiene este texto
+    semilla: semilla de los datos
+    max_filas_AT: tamaño máximo en el que se corren los casos de AT (su costo crece con filas x picos: con lags chicos y 100k filas son varios minutos por caso). None para correrlos siempre
+
+Returns:
+    lista de resultados (diccionarios con funcion, params, filas, segundos, filas_por_segundo, pico_memoria_bytes)
+"""
+def corre_benchmark(lista_filas=(1000, 10000, 100000), repeticiones=3, filtro=None, semilla=0, max_filas_AT=10000):
+  """Corre cada caso para cada tamaño, con los mismos datos para todas las funciones."""
+  resultados = []
+  for filas in lista_filas:
+    data = genera_ohlcv(filas, semilla)
+    for nombre, funcion, params in CASOS:
+      if filtro is not None and filtro not in nombre:
+        continue
+      if max_filas_AT is not None and filas > max_filas_AT and nombre.startswith('calcula_AT'):
+        continue
+      entrada = _prepara(nombre, data.copy())
+      segundos, pico = _mide(funcion, entrada, params, repeticiones)
+      resultados.append({'funcion': nombre, 'params': params, 'filas': filas, 'segundos': segundos,
+                         'filas_por_segundo': filas / segundos if segundos > 0 else None, 'pico_memoria_bytes': pico})
+      print("%-32s %-28s %7d filas %10.4f s %10.0f filas/s %8.1f MB" % (nombre, json.dumps(params), filas, segundos, filas / max(segundos, 1e-12), pico / 1e6), file=sys.stderr)
+  return resultados
+
+def _clave(resultado):
+  return (resultado['funcion'], json.dumps(resultado['params'], sort_keys=True), resultado['filas'])
+
+"""
+COMPARA CONTRA BASELINE
+Params:
+    resultados: salida de corre_benchmark
+    baseline: resultados de un reporte anterior
+    tolerancia: cociente de tiempos (actual / baseline) a partir del cual se considera una regresión
+    diferencia_minima: segundos que tiene que ser más lento para que cuente como regresión (los casos de menos de unos milisegundos varían más que la tolerancia entre corridas)
+
+Returns:
+    lista de comparaciones (funcion, params, filas, segundos, segundos_baseline, cociente, regresion) de los casos que están en los dos
+"""
+def compara_baseline(resultados, baseline, tolerancia=1.25, diferencia_minima=0.002):
+  """Empareja por función, parámetros y filas."""
+  anteriores = {_clave(resultado): resultado for resultado in baseline}
+  comparaciones = []
+  for resultado in resultados:
+    anterior = anteriores.get(_clave(resultado))
+    if anterior is None or not anterior['segundos']:
+      continue
+    cociente = resultado['segundos'] / anterior['segundos']
+    comparaciones.append({'funcion': resultado['funcion'], 'params': resultado['params'], 'filas': resultado['filas'],
+                          'segundos': resultado['segundos'], 'segundos_baseline': anterior['segundos'],
+                          'cociente': cociente, 'regresion': cociente > tolerancia and resultado['segundos'] - anterior['segundos'] > diferencia_minima})
+  return comparaciones
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmark de los indicadores de modules/")
+  parser.add_argument('--filas', type=int, nargs='+', default=[1000, 10000, 100000])
+  parser.add_argument('--repeticiones', type=int, default=3)
+  parser.add_argument('--filtro', default=None, help="solo los casos cuyo nombre contiene este texto")
+  parser.add_argument('--semilla', type=int, default=0)
+  parser.add_argument('--salida', default=None, help="archivo json donde guardar el reporte")
+  parser.add_argument('--baseline', default=None, help="reporte json anterior para comparar")
+  parser.add_argument('--tolerancia', type=float, default=1.25)
+  parser.add_argument('--diferencia_minima', type=float, default=0.002, help="segundos de diferencia mínima para contar una regresión")
+  parser.add_argument('--max_filas_AT', type=int, default=10000, help="tamaño máximo para los casos de AT (0 para correrlos en todos los tamaños)")
+  args = parser.parse_args(argv)
+
+  # Lo que impriman las funciones va a stderr para no mezclarse con el reporte
+  with contextlib.redirect_stdout(sys.stderr):
+    resultados = corre_benchmark(args.filas, args.repeticiones, args.filtro, args.semilla, args.max_filas_AT or None)
+  reporte = {'version_numpy': np.__version__, 'version_pandas': pd.__version__, 'semilla': args.semilla, 'resultados': resultados}
+
+  regresiones = []
+  if args.baseline is not None:
+    with open(args.baseline) as f:
+      baseline = json.load(f)['resultados']
+    reporte['comparacion'] = compara_baseline(resultados, baseline, args.tolerancia, args.diferencia_minima)
+    regresiones = [comparacion for comparacion in reporte['comparacion'] if comparacion['regresion']]
+    for comparacion in regresiones:
+      print("REGRESIÓN %s %s %d filas: %.2fx más lento" % (comparacion['funcion'], json.dumps(comparacion['params']), comparacion['filas'], comparacion['cociente']), file=sys.stderr)
+
+  texto = json.dumps(reporte, indent=2)
+  if args.salida is not None:
+    with open(args.salida, 'w') as f:
+      f.write(texto)
+  else:
+    print(texto)
+  return 1 if regresiones else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Almacén de features en parquet, particionado por ticker (reemplaza el ida y vuelta por v2.csv)
+"""
+
+import os
+
+import pandas as pd
+
+try:
+  import pyarrow as pa
+  import pyarrow.dataset as ds
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = None
+
+def _requiere_pyarrow():
+  if pa is None:
+    raise ImportError("El almacén de features necesita pyarrow (pip install pyarrow)")
+
+def _carpeta_ticker(ruta, ticker):
+  """Partición de un ticker, con el formato hive (ticker=valor) para que pyarrow la lea como columna."""
+  return os.path.join(ruta, 'ticker=%s' % ticker)
+
+"""
+ÚLTIMA FECHA GUARDADA
+Params:
+    ruta: carpeta del almacén
+    ticker: ticker a consultar
+
+Returns:
+    última fecha guardada para el ticker (None si no tiene datos). Sale del nombre de los archivos, no lee los datos
+"""
+def ultima_fecha(ruta, ticker):
+  """Cada archivo se llama desde_hasta.parquet (fechas AAAAMMDD)."""
+  carpeta = _carpeta_ticker(ruta, ticker)
+  if not os.path.isdir(carpeta):
+    return None
+  hastas = [archivo[:-len('.parquet')].split('_')[1] for archivo in os.listdir(carpeta) if archivo.endswith('.parquet')]
+  return pd.to_datetime(max(hastas), format='%Y%m%d') if hastas else None
+
+"""
+GUARDA FEATURES
+Params:
+    data: pandas DataFrame con los features, de uno o varios tickers (en formato largo)
+    ruta: carpeta del almacén
+    ticker_col: the name of the TICKER values column
+    date_col: the name of the FC values column
+
+Returns:
+    diccionario ticker: cantidad de filas nuevas escritas. Solo se agregan las fechas posteriores a la última guardada de cada ticker, en un archivo nuevo: la historia no se reescribe
+"""
+def guarda_features(data, ruta, ticker_col='<TICKER>', date_col='<FC>'):
+  """Escribe un archivo por ticker con las filas nuevas; la columna del ticker queda en el nombre de la carpeta."""
+  _requiere_pyarrow()
+  escritas = {}
+  for ticker, df in data.groupby(ticker_col, sort=False):
+    ultima = ultima_fecha(ruta, ticker)
+    if ultima is not None:
+      df = df[df[date_col] > ultima]
+    escritas[ticker] = len(df)
+    if len(df) == 0:
+      continue
+    carpeta = _carpeta_ticker(ruta, ticker)
+    os.makedirs(carpeta, exist_ok=True)
+    nombre = '%s_%s.parquet' % (df[date_col].min().strftime('%Y%m%d'), df[date_col].max().strftime('%Y%m%d'))
+    tabla = pa.Table.from_pandas(df.drop(columns=[ticker_col]).reset_index(drop=True), preserve_index=False)
+    pq.write_table(tabla, os.path.join(carpeta, nombre))
+  return escritas
+
+"""
+LEE FEATURES
+Params:
+    ruta: carpeta del almacén
+    columnas: columnas a leer (además del ticker y la fecha). Si es None se leen todas
+    tickers: lista de tickers a leer. Si es None se leen todos
+    desde: primera fecha a leer (incluida)
+    hasta: última fecha a leer (incluida)
+    ticker_col: the name of the TICKER values column
+    date_col: the name of the FC values column
+
+Returns:
+    DataFrame en formato largo, ordenado por ticker y fecha. Solo se leen de disco las columnas pedidas, y las particiones y bloques que pueden tener filas en el rango de fechas
+"""
+def lee_features(ruta, columnas=None, tickers=None, desde=None, hasta=None, ticker_col='<TICKER>', date_col='<FC>'):
+  """Lee con pyarrow.dataset: los filtros de ticker y fecha se aplican sobre las particiones y las estadísticas de cada archivo."""
+  _requiere_pyarrow()
+  dataset = ds.dataset(ruta, format='parquet', partitioning='hive')
+  filtro = None
+  condiciones = []
+  if tickers is not None:
+    condiciones.append(ds.field('ticker').isin([str(ticker) for ticker in tickers]))
+  if desde is not None:
+    condiciones.append(ds.field(date_col) >= pd.Timestamp(desde))
+  if hasta is not None:
+    condiciones.append(ds.field(date_col) <= pd.Timestamp(hasta))
+  for condicion in condiciones:
+    filtro = condicion if filtro is None else filtro & condicion
+  if columnas is not None:
+    columnas = ['ticker', date_col] + [columna for columna in columnas if columna not in ('ticker', date_col, ticker_col)]
+  data = dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+  data = data.rename(columns={'ticker': ticker_col})
+  data[ticker_col] = data[ticker_col].astype(str)
+  data = data[[ticker_col] + [columna for columna in data.columns if columna != ticker_col]]
+  return data.sort_values([ticker_col, date_col], kind='stable').reset_index(drop=True)
@@ -0,0 +1,132 @@
+"""
+Backtest de la regla de compra (pred_alza mayor a un umbral y pred_baja menor a otro) con salida por stop loss, take profit o tiempo, para todos los tickers a la vez
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.target import _combina, _ordena_tickers, _primer_toque, _tabla_extremos
+
+SALIDAS = {1: 'TG', 0: 'SL', 2: 'tiempo', 3: 'abierta'}
+
+def _resultado_por_fila(y, high, low, fin_ticker, SL, TG, dias_max, empate_tg):
+  """
+  Resultado de comprar al cierre de cada fila (ya ordenadas por ticker y fecha): tipo de salida (claves de SALIDAS), días hasta la salida y retorno bruto.
+  No depende de los umbrales, así que se calcula una sola vez para toda la grilla
+  """
+  n = len(y)
+  filas = np.arange(n)
+  limite = np.minimum(filas + dias_max, fin_ticker)
+  niveles = max(int(dias_max).bit_length(), 1)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    dias_tg = _primer_toque(_tabla_extremos(high, niveles, np.fmax, -np.inf), y, limite, lambda extremo, y: extremo/y-1 > TG)
+    dias_sl = _primer_toque(_tabla_extremos(low, niveles, np.fmin, np.inf), y, limite, lambda extremo, y: extremo/y-1 < -SL)
+  salida, dias = _combina(dias_tg, dias_sl, empate_tg)
+
+  # Sin barrera: sale por tiempo al cierre de dias_max, o queda abierta si el ticker no tiene tantos días
+  sin_barrera = np.isnan(dias)
+  por_tiempo = sin_barrera & (filas + dias_max <= fin_ticker)
+  salida = np.where(por_tiempo, 2, np.where(sin_barrera, 3, salida))
+  dias = np.where(por_tiempo, dias_max, np.where(sin_barrera, fin_ticker - filas, dias)).astype(int)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    retorno = np.select([salida == 1, salida == 0, salida == 2], [TG, -SL, y[filas + dias]/y - 1], np.nan)
+  return salida, dias, retorno
+
+def _entradas(senal, dias, fin_ticker, una_por_ticker):
+  """
+  Posiciones (ordenadas) de las filas en las que se entra. Con una_por_ticker, no se entra mientras haya una posición abierta en el ticker:
+  cada ronda avanza una operación en todos los tickers a la vez (el loop es por operación dentro del ticker, no por operación total)
+  """
+  n = len(senal)
+  if not una_por_ticker:
+    return np.flatnonzero(senal)
+  # proxima[p]: primera fila con señal desde p (n si no hay)
+  proxima = np.minimum.accumulate(np.where(senal, np.arange(n), n)[::-1])[::-1]
+  proxima = np.append(proxima, n)
+  inicios = np.unique(np.searchsorted(fin_ticker, fin_ticker, side='left'))
+  actuales = proxima[inicios]
+  actuales = actuales[actuales <= fin_ticker[inicios]]
+  entradas = []
+  while len(actuales):
+    entradas.append(actuales)
+    siguientes = proxima[np.minimum(actuales + dias[actuales] + 1, n)]
+    actuales = siguientes[siguientes <= fin_ticker[actuales]]
+  return np.sort(np.concatenate(entradas)) if entradas else np.array([], dtype=int)
+
+"""
+BACKTEST DE UMBRALES
+Params:
+    data: pandas DataFrame con precios y predicciones por ticker y fecha (ej. el oos de v2_train)
+    umbrales_alza: lista de umbrales para pred_alza (se compra si pred_alza > umbral)
+    umbrales_baja: lista de umbrales para pred_baja (se compra si pred_baja < umbral). Se prueban todas las combinaciones con umbrales_alza
+    SL: stop loss en proporción (sale en -SL si el mínimo lo perfora)
+    TG: take profit en proporción (sale en +TG si el máximo lo supera)
+    dias_max: días máximos de la posición (sale al cierre de ese día)
+    costo: costo de la operación completa (compra y venta) en proporción, se descuenta de cada retorno
+    empate_tg: si es True y el SL y el TG se tocan el mismo día gana el TG. Por defecto gana el SL (no se sabe cuál fue primero)
+    una_por_ticker: si es True no se vuelve a comprar un ticker hasta el día siguiente a la salida. Si es False cada señal es una operación
+    pred_alza_col: the name of the PRED_ALZA values column
+    pred_baja_col: the name of the PRED_BAJA values column
+    y_col: the name of the CLOSE values column (precio de compra)
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    ticker_col: the name of the TICKER values column (si es None, data es de un solo ticker)
+    date_col: the name of the DATE values column
+
+Returns:
+    DataFrame con una fila por (umbral_alza, umbral_baja): operaciones cerradas, abiertas (sin salida al final de los datos, no entran en las métricas), tasa_acierto, pnl (suma de retornos netos, con el mismo monto por operación), retorno_medio, retorno_compuesto, salidas por TG, SL y tiempo, dias_promedio y exposicion (días con posición sobre días de ticker; sin una_por_ticker puede ser mayor a 1)
+"""
+def backtest_umbrales(data, umbrales_alza=(0.5,), umbrales_baja=(0.11,), SL=0.06, TG=0.15, dias_max=90, costo=0.015, empate_tg=False,
+                      una_por_ticker=True, pred_alza_col='pred_alza', pred_baja_col='pred_baja', y_col='y', high_col='high', low_col='low',
+                      ticker_col='ticker', date_col='fc'):
+  """El resultado de cada posible compra se calcula una vez (primer toque de las barreras con la tabla de extremos de target.py); cada umbral solo elige filas."""
+  orden, fin_ticker = _ordena_tickers(data, ticker_col, date_col)
+  y = data[y_col].values.astype(float)[orden]
+  salida, dias, retorno = _resultado_por_fila(y, data[high_col].values.astype(float)[orden], data[low_col].values.astype(float)[orden],
+                                              fin_ticker, SL, TG, dias_max, empate_tg)
+  retorno_neto = retorno - costo
+  pred_alza = data[pred_alza_col].values.astype(float)[orden]
+  pred_baja = data[pred_baja_col].values.astype(float)[orden]
+  dias_ticker = max(len(data), 1)
+
+  filas = []
+  for umbral_alza in umbrales_alza:
+    supera_alza = pred_alza > umbral_alza
+    for umbral_baja in umbrales_baja:
+      entradas = _entradas(supera_alza & (pred_baja < umbral_baja) & ~np.isnan(y), dias, fin_ticker, una_por_ticker)
+      cerradas = entradas[salida[entradas] != 3]
+      netos = retorno_neto[cerradas]
+      filas.append({'umbral_alza': umbral_alza, 'umbral_baja': umbral_baja, 'operaciones': len(cerradas), 'abiertas': len(entradas) - len(cerradas),
+                    'tasa_acierto': (netos > 0).mean() if len(netos) else np.nan, 'pnl': netos.sum(),
+                    'retorno_medio': netos.mean() if len(netos) else np.nan, 'retorno_compuesto': np.prod(1 + netos) - 1,
+                    'salidas_TG': int((salida[cerradas] == 1).sum()), 'salidas_SL': int((salida[cerradas] == 0).sum()),
+                    'salidas_tiempo': int((salida[cerradas] == 2).sum()),
+                    'dias_promedio': dias[cerradas].mean() if len(cerradas) else np.nan,
+                    'exposicion': dias[entradas].sum() / dias_ticker})
+  return pd.DataFrame(filas)
+
+"""
+OPERACIONES
+Params:
+    data, umbral_alza, umbral_baja y el resto: como en backtest_umbrales, para un solo par de umbrales
+
+Returns:
+    DataFrame con una fila por operación: ticker, fecha de entrada y de salida, precio de entrada, salida (TG, SL, tiempo o abierta), dias y retorno neto
+"""
+def operaciones(data, umbral_alza=0.5, umbral_baja=0.11, SL=0.06, TG=0.15, dias_max=90, costo=0.015, empate_tg=False, una_por_ticker=True,
+                pred_alza_col='pred_alza', pred_baja_col='pred_baja', y_col='y', high_col='high', low_col='low', ticker_col='ticker', date_col='fc'):
+  """Detalle de las operaciones de un par de umbrales, para revisar lo que resume backtest_umbrales."""
+  orden, fin_ticker = _ordena_tickers(data, ticker_col, date_col)
+  y = data[y_col].values.astype(float)[orden]
+  salida, dias, retorno = _resultado_por_fila(y, data[high_col].values.astype(float)[orden], data[low_col].values.astype(float)[orden],
+                                              fin_ticker, SL, TG, dias_max, empate_tg)
+  senal = (data[pred_alza_col].values[orden] > umbral_alza) & (data[pred_baja_col].values[orden] < umbral_baja) & ~np.isnan(y)
+  entradas = _entradas(senal, dias, fin_ticker, una_por_ticker)
+  ordenada = data.iloc[orden]
+  detalle = pd.DataFrame({'fc_entrada': ordenada[date_col].values[entradas] if date_col is not None else entradas,
+                          'fc_salida': ordenada[date_col].values[entradas + dias[entradas]] if date_col is not None else entradas + dias[entradas],
+                          'precio_entrada': y[entradas], 'salida': [SALIDAS[s] for s in salida[entradas]],
+                          'dias': dias[entradas], 'retorno': retorno[entradas] - costo})
+  if ticker_col is not None:
+    detalle.insert(0, ticker_col, ordenada[ticker_col].values[entradas])
+  return detalle
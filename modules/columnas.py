@@ -0,0 +1,79 @@
+"""
+Armado de columnas nuevas: se juntan en un bloque y se pegan a la base una sola vez
+
+Contrato de precisión del modo compacto (compact=True):
+    - Conteos y flags (columnas enteras o booleanas): exactos, en el entero sin signo (o con signo si hay negativos) más chico que alcanza. Los nu_dias_* de ventanas de hasta 255 días entran en uint8
+    - Todo lo demás (ratios, osciladores, precios relativos, acumulados): float32. Error relativo máximo 2**-24 (~6e-8) contra el float64, unos 7 dígitos significativos. Los enteros guardados como float (ej. nu_pruebas_*) son exactos hasta 2**24
+    - Los nulos se mantienen (NaN en float32)
+    - Los cálculos se hacen siempre en float64: solo se compacta el resultado
+"""
+
+import numpy as np
+import pandas as pd
+
+def _compacta_valores(valores):
+  """Baja el tipo de dato de un array según el contrato de precisión."""
+  valores = np.asarray(valores)
+  if valores.dtype.kind == 'f':
+    return valores.astype(np.float32)
+  if valores.dtype.kind in 'iu' and len(valores):
+    return pd.to_numeric(valores, downcast='unsigned' if valores.min() >= 0 else 'integer')
+  return valores
+
+"""
+AGREGA COLUMNAS
+Params:
+    data: pandas DataFrame al que se agregan las columnas
+    nuevas: diccionario (ordenado) nombre: array o Series con las columnas nuevas, del largo de data
+    return_new_only: si es True devuelve solo el bloque de columnas nuevas (con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas se guardan con tipos chicos (ver el contrato de precisión arriba)
+
+Returns:
+    copy of 'data' DataFrame con las columnas nuevas al final (las que ya existían se reemplazan en su lugar), o solo el bloque nuevo
+"""
+def agrega_columnas(data, nuevas, return_new_only=False, compact=False):
+  """Arma las columnas nuevas como un DataFrame (un bloque por tipo de dato) y las pega con una sola concatenación, sin fragmentar la base."""
+  bloque = {nombre: (valores.values if isinstance(valores, pd.Series) else valores) for nombre, valores in nuevas.items()}
+  if compact:
+    bloque = {nombre: _compacta_valores(valores) for nombre, valores in bloque.items()}
+  bloque = pd.DataFrame(bloque, index=data.index)
+  if return_new_only:
+    return bloque
+  existentes = [nombre for nombre in bloque.columns if nombre in data.columns]
+  if existentes:
+    data = data.copy()
+    data[existentes] = bloque[existentes]
+    bloque = bloque.drop(columns=existentes)
+  return pd.concat([data, bloque], axis=1)
+
+"""
+COMPACTA
+Params:
+    data: pandas DataFrame (por ejemplo una base ya armada)
+    columnas: columnas a compactar. Si es None, todas las numéricas
+
+Returns:
+    copy of 'data' DataFrame con las columnas compactadas según el contrato de precisión
+"""
+def compacta(data, columnas=None):
+  """Versión de compact=True para una base que ya existe."""
+  if columnas is None:
+    columnas = [nombre for nombre in data.columns if data[nombre].dtype.kind in 'iuf']
+  return agrega_columnas(data, {nombre: data[nombre] for nombre in columnas}, compact=True)
+
+"""
+REPORTE DE MEMORIA
+Params:
+    original: pandas DataFrame en tipos completos
+    compacto: el mismo DataFrame compactado
+
+Returns:
+    diccionario con los bytes de cada uno (incluye el índice y el contenido de los strings), los bytes ahorrados y la proporción del original que ocupa el compacto
+"""
+def reporte_memoria(original, compacto):
+  """Compara memory_usage(deep=True) de las dos versiones."""
+  bytes_original = int(original.memory_usage(deep=True).sum())
+  bytes_compacto = int(compacto.memory_usage(deep=True).sum())
+  return {'bytes_original': bytes_original, 'bytes_compacto': bytes_compacto,
+          'bytes_ahorrados': bytes_original - bytes_compacto,
+          'proporcion': bytes_compacto / bytes_original if bytes_original else np.nan}
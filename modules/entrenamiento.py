@@ -0,0 +1,228 @@
+"""
+Entrenamiento walk-forward de model_alza y model_baja: la matriz de features se arma una vez (DMatrix de xgboost), cada mes es un fold de test y los modelos de todos los folds, targets y candidatos de hiperparámetros se entrenan en paralelo
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+  import xgboost as xgb
+except ImportError:
+  xgb = None
+
+from modules.target import INDETERMINADO
+
+TARGETS = ['target_alza', 'target_baja']
+
+def _requiere_xgboost():
+  if xgb is None:
+    raise ImportError("El entrenamiento necesita xgboost (pip install xgboost)")
+
+"""
+CANDIDATOS ALEATORIOS
+Params:
+    n: cantidad de candidatos
+    semilla: semilla del sorteo
+
+Returns:
+    lista de diccionarios de hiperparámetros sorteados con las mismas distribuciones que el RandomizedSearchCV de v2_train
+"""
+def candidatos_aleatorios(n=10, semilla=5):
+  """Sorteo con numpy (sin scipy): n_estimators entero en [15, 100), learning_rate uniforme en [0.05, 0.35), colsample y subsample beta(10, 1), gamma uniforme en [0, 10), reg_alpha y min_child_weight exponenciales de media 50."""
+  rng = np.random.default_rng(semilla)
+  return [{'n_estimators': int(rng.integers(15, 100)), 'max_depth': 3, 'learning_rate': float(rng.uniform(0.05, 0.35)),
+           'colsample_bytree': float(rng.beta(10, 1)), 'subsample': float(rng.beta(10, 1)), 'gamma': float(rng.uniform(0, 10)),
+           'reg_alpha': float(rng.exponential(50)), 'min_child_weight': float(rng.exponential(50))}
+          for _ in range(n)]
+
+"""
+FOLDS WALK-FORWARD POR MES
+Params:
+    fechas: array de fechas de cada fila
+    meses_minimos: cantidad de meses de entrenamiento antes del primer fold
+    embargo: días corridos que se sacan del entrenamiento antes de cada mes de test. El target mira hasta dias_indeterminacion filas (días hábiles) hacia adelante: sin embargo, las últimas filas de entrenamiento ven precios del test. 90 días hábiles son unos 130 corridos
+    desde: primer mes de test (por defecto, el que sigue a meses_minimos)
+
+Returns:
+    lista de (mes, filas de entrenamiento, filas de test), con las posiciones de las filas
+"""
+def folds_mensuales(fechas, meses_minimos=24, embargo=130, desde=None):
+  """Cada fold entrena con todo lo anterior al mes (menos el embargo) y testea en el mes."""
+  fechas = pd.to_datetime(pd.Series(fechas)).values
+  meses = fechas.astype('datetime64[M]')
+  todos = np.unique(meses)
+  primero = todos[0] + np.timedelta64(meses_minimos, 'M') if desde is None else np.datetime64(desde, 'M')
+  orden = np.argsort(fechas, kind='stable')
+  fechas_ordenadas = fechas[orden]
+  folds = []
+  for mes in todos[todos >= primero]:
+    inicio = mes.astype('datetime64[ns]')
+    corte = inicio - np.timedelta64(embargo, 'D')
+    entrenamiento = orden[:np.searchsorted(fechas_ordenadas, corte, side='left')]
+    test = np.flatnonzero(meses == mes)
+    if len(entrenamiento) and len(test):
+      folds.append((str(mes), entrenamiento, test))
+  return folds
+
+def auc(y, score):
+  """Área bajo la curva ROC por rangos (Mann-Whitney), con los empates promediados. Nulo si hay una sola clase."""
+  y = np.asarray(y).astype(bool)
+  positivos = y.sum()
+  negativos = len(y) - positivos
+  if positivos == 0 or negativos == 0:
+    return np.nan
+  rangos = pd.Series(score).rank(method='average').values
+  return (rangos[y].sum() - positivos*(positivos + 1)/2)/(positivos*negativos)
+
+def _logloss(y, p):
+  p = np.clip(p, 1e-15, 1 - 1e-15)
+  return float(-np.mean(y*np.log(p) + (1 - y)*np.log(1 - p)))
+
+"""
+MATRIZ DE FEATURES
+Params:
+    base: pandas DataFrame con las features y los targets (ej. la salida de calcula_features + target.calcula_targets)
+    columnas: columnas de features. Si es None, todas las numéricas que no son targets ni días al target
+    targets: columnas de target (valores 0, 1 o 99 = indeterminado)
+
+Returns:
+    objeto con la DMatrix de toda la base (float32, se arma una sola vez), las etiquetas de cada target y las fechas. Los folds son slices de la DMatrix, sin volver a pasar por pandas. Con guarda / carga queda en disco entre corridas
+"""
+class MatrizFeatures:
+  """Cache de la matriz en el formato nativo de xgboost."""
+
+  def __init__(self, base, columnas=None, targets=TARGETS, date_col='fc'):
+    _requiere_xgboost()
+    if columnas is None:
+      excluidas = set(targets) | {columna for columna in base.columns if columna.startswith('dias_')}
+      columnas = [columna for columna in base.columns if columna not in excluidas and base[columna].dtype.kind in 'iufb']
+    self.columnas = list(columnas)
+    self.fechas = base[date_col].values
+    self.etiquetas = {target: base[target].values for target in targets}
+    self.dmatrix = xgb.DMatrix(base[self.columnas].to_numpy(dtype=np.float32), feature_names=self.columnas, nthread=-1)
+
+  def guarda(self, carpeta):
+    """Guarda la DMatrix en el binario de xgboost y las etiquetas y fechas en npz, para no volver a armarla en la próxima corrida."""
+    os.makedirs(carpeta, exist_ok=True)
+    self.dmatrix.save_binary(os.path.join(carpeta, 'features.buffer'))
+    np.savez(os.path.join(carpeta, 'etiquetas.npz'), fechas=self.fechas, **self.etiquetas)
+    with open(os.path.join(carpeta, 'columnas.json'), 'w') as f:
+      json.dump(self.columnas, f)
+
+  @classmethod
+  def carga(cls, carpeta):
+    """MatrizFeatures guardada con guarda."""
+    _requiere_xgboost()
+    matriz = cls.__new__(cls)
+    with open(os.path.join(carpeta, 'columnas.json')) as f:
+      matriz.columnas = json.load(f)
+    with np.load(os.path.join(carpeta, 'etiquetas.npz'), allow_pickle=False) as guardado:
+      matriz.fechas = guardado['fechas']
+      matriz.etiquetas = {target: guardado[target] for target in guardado.files if target != 'fechas'}
+    matriz.dmatrix = xgb.DMatrix(os.path.join(carpeta, 'features.buffer'))
+    return matriz
+
+  def filas_validas(self, target, filas):
+    """Filas con target determinado (saca los 99, como el filtro de v2_train)."""
+    return filas[self.etiquetas[target][filas] != INDETERMINADO]
+
+  def slice(self, target, filas):
+    """DMatrix de las filas con la etiqueta del target."""
+    dmatrix = self.dmatrix.slice(filas)
+    dmatrix.set_label(self.etiquetas[target][filas].astype(np.float32))
+    return dmatrix
+
+def _params_xgb(candidato, hilos):
+  """Parámetros de xgb.train a partir de los del XGBClassifier (n_estimators pasa a ser la cantidad de rondas)."""
+  params = {k: v for k, v in candidato.items() if k != 'n_estimators'}
+  params.update({'objective': 'binary:logistic', 'eval_metric': 'auc', 'nthread': hilos, 'seed': 5})
+  return params, candidato.get('n_estimators', 100)
+
+def _entrena_uno(matriz, target, candidato, entrenamiento, test, hilos):
+  """Un modelo de un fold, target y candidato: entrena, predice el test y devuelve las métricas."""
+  inicio = time.perf_counter()
+  entrenamiento = matriz.filas_validas(target, entrenamiento)
+  test = matriz.filas_validas(target, test)
+  params, rondas = _params_xgb(candidato, hilos)
+  booster = xgb.train(params, matriz.slice(target, entrenamiento), num_boost_round=rondas)
+  y = matriz.etiquetas[target][test].astype(float)
+  p = booster.predict(matriz.slice(target, test)) if len(test) else np.zeros(0)
+  return {'filas_entrenamiento': len(entrenamiento), 'filas_test': len(test),
+          'tasa_positivos': float(y.mean()) if len(y) else np.nan,
+          'auc': auc(y, p), 'logloss': _logloss(y, p) if len(y) else np.nan,
+          'segundos': time.perf_counter() - inicio}
+
+"""
+WALK-FORWARD
+Params:
+    base: pandas DataFrame con las features, los targets y la fecha
+    candidatos: lista de diccionarios de hiperparámetros (ver candidatos_aleatorios)
+    columnas: columnas de features (ver MatrizFeatures)
+    targets: columnas de target que se entrenan (por defecto target_alza y target_baja)
+    meses_minimos: meses de entrenamiento antes del primer fold
+    embargo: días corridos entre el fin del entrenamiento y el mes de test (ver folds_mensuales)
+    desde: primer mes de test
+    trabajos: cantidad de modelos que se entrenan a la vez (por defecto, los cores). Cada modelo usa un hilo: xgboost libera el GIL, así que los threads comparten la DMatrix sin copiarla
+    date_col: the name of the DATE values column
+
+Returns:
+    (metricas, matriz): DataFrame con una fila por (mes, target, candidato) con filas, tasa de positivos, auc, logloss y segundos, y la MatrizFeatures para reusar en entrena_final
+"""
+def walk_forward(base, candidatos=None, columnas=None, targets=TARGETS, meses_minimos=24, embargo=130, desde=None, trabajos=None, date_col='fc'):
+  """Todos los (fold, target, candidato) van a un solo pool."""
+  candidatos = candidatos or candidatos_aleatorios()
+  matriz = base if isinstance(base, MatrizFeatures) else MatrizFeatures(base, columnas, targets, date_col)
+  folds = folds_mensuales(matriz.fechas, meses_minimos, embargo, desde)
+  trabajos = trabajos or os.cpu_count() or 1
+
+  tareas = [(mes, target, i, entrenamiento, test) for mes, entrenamiento, test in folds for target in targets for i in range(len(candidatos))]
+  with ThreadPoolExecutor(max_workers=trabajos) as pool:
+    futuros = [pool.submit(_entrena_uno, matriz, target, candidatos[i], entrenamiento, test, 1) for mes, target, i, entrenamiento, test in tareas]
+    filas = [dict({'mes': mes, 'target': target, 'candidato': i}, **futuro.result()) for (mes, target, i, _, _), futuro in zip(tareas, futuros)]
+  return pd.DataFrame(filas), matriz
+
+"""
+MEJOR CANDIDATO
+Params:
+    metricas: salida de walk_forward
+    metrica: columna con la que se elige (mayor es mejor)
+
+Returns:
+    diccionario target: número del candidato con mejor promedio de la métrica en los folds
+"""
+def mejores_candidatos(metricas, metrica='auc'):
+  promedios = metricas.groupby(['target', 'candidato'])[metrica].mean()
+  return {target: int(promedios[target].idxmax()) for target in promedios.index.get_level_values('target').unique()}
+
+"""
+ENTRENAMIENTO FINAL
+Params:
+    base: pandas DataFrame (o la MatrizFeatures ya armada por walk_forward)
+    params: diccionario target: hiperparámetros (ej. {t: candidatos[i] for t, i in mejores_candidatos(metricas).items()})
+    columnas: columnas de features (ver MatrizFeatures)
+    hasta: última fecha (excluida) que entra en el entrenamiento. Si es None, toda la base
+    hilos: hilos por modelo (los targets se entrenan a la vez)
+    date_col: the name of the DATE values column
+
+Returns:
+    diccionario target: Booster entrenado con todas las filas determinadas (para exportar con modelo_plano.exporta_modelo). Es el paso que se corre cada noche
+"""
+def entrena_final(base, params, columnas=None, hasta=None, hilos=None, date_col='fc'):
+  """Un modelo por target, en paralelo, sobre la misma DMatrix."""
+  matriz = base if isinstance(base, MatrizFeatures) else MatrizFeatures(base, columnas, list(params), date_col)
+  filas = np.arange(len(matriz.fechas))
+  if hasta is not None:
+    filas = filas[pd.to_datetime(pd.Series(matriz.fechas)).values < np.datetime64(pd.Timestamp(hasta))]
+  hilos = hilos or max((os.cpu_count() or 1)//len(params), 1)
+
+  def entrena(target):
+    xgb_params, rondas = _params_xgb(params[target], hilos)
+    return xgb.train(xgb_params, matriz.slice(target, matriz.filas_validas(target, filas)), num_boost_round=rondas)
+
+  with ThreadPoolExecutor(max_workers=len(params)) as pool:
+    return dict(zip(params, pool.map(entrena, list(params))))
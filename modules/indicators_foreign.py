@@ -6,6 +6,9 @@ License: GNU General Public License
 import numpy as np
 import pandas as pd
 
+from modules.columnas import agrega_columnas
+from modules.instrumentacion import instrumenta
+
 """
 Exponential moving average
 Source: http://stockcharts.com/school/doku.php?id=chart_school:technical_indicators:moving_averages
@@ -13,15 +16,18 @@ Params:
     data: pandas DataFrame
     period: smoothing period
     column: the name of the column with values for calculating EMA in the 'data' DataFrame
+    return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+    compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'ema[period]' column added
 """
-def ema(data, period=0, column='<CLOSE>'):
+@instrumenta
+def ema(data, period=0, column='<CLOSE>', return_new_only=False, compact=False):
     """Agrega una columna (relativa a Y) con la media movil exponencial suavizada para los N períodos."""
-    data['ema' + str(period)] = data[column].ewm(ignore_na=False, min_periods=period, com=period, adjust=True).mean()
+    ema = data[column].ewm(ignore_na=False, min_periods=period, com=period, adjust=True).mean()
     
-    return data
+    return agrega_columnas(data, {'ema' + str(period): ema}, return_new_only, compact)
 
 """
 Moving Average Convergence/Divergence Oscillator (MACD)
@@ -32,28 +38,25 @@ Params:
     period_short: the shorter period EMA (12 days recommended)
     period_signal: signal line EMA (9 days recommended)
     column: the name of the column with values for calculating MACD in the 'data' DataFrame
+    return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+    compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'macd_val' and 'macd_signal_line' columns added
 """
-def macd(data, period_long=26, period_short=12, period_signal=9, column='<CLOSE>'):
+@instrumenta
+def macd(data, period_long=26, period_short=12, period_signal=9, column='<CLOSE>', return_new_only=False, compact=False):
     """Agrega tres columnas (relativas a Y) con el valor del MACD, la linea de señal del MACD y el Histograma MACD."""
-    remove_cols = []
-    if not 'ema' + str(period_long) in data.columns:
-        data = ema(data, period_long)
-        remove_cols.append('ema' + str(period_long))
-
-    if not 'ema' + str(period_short) in data.columns:
-        data = ema(data, period_short)
-        remove_cols.append('ema' + str(period_short))
-
-    data['macd_val'] = data['ema' + str(period_short)] - data['ema' + str(period_long)]
-    data['macd_signal_line'] = data['macd_val'].ewm(ignore_na=False, min_periods=0, com=period_signal, adjust=True).mean()
-    data['macd_histog'] = data['macd_val'] - data['macd_signal_line']
-	
-    data = data.drop(remove_cols, axis=1)
+    # Reuses the EMA columns if they are already there, otherwise computes them without adding them to 'data'
+    emas = {}
+    for period in (period_long, period_short):
+        name = 'ema' + str(period)
+        emas[period] = data[name] if name in data.columns else ema(data, period, column, return_new_only=True)[name]
+
+    macd_val = emas[period_short] - emas[period_long]
+    macd_signal_line = macd_val.ewm(ignore_na=False, min_periods=0, com=period_signal, adjust=True).mean()
         
-    return data
+    return agrega_columnas(data, {'macd_val': macd_val, 'macd_signal_line': macd_signal_line, 'macd_histog': macd_val - macd_signal_line}, return_new_only, compact)
 
 """
 Accumulation Distribution 
@@ -66,20 +69,21 @@ Params:
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'acc_dist' and 'acc_dist_ema[trend_periods]' columns added
 """
-def acc_dist(data, trend_periods=21, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', vol_col='<VOL>'):
-    for index, row in data.iterrows():
-        if row[high_col] != row[low_col]:
-            ac = ((row[close_col] - row[low_col]) - (row[high_col] - row[close_col])) / (row[high_col] - row[low_col]) * row[vol_col]
-        else:
-            ac = 0
-        data.at[index,'acc_dist']=ac
-    data['acc_dist_ema' + str(trend_periods)] = data['acc_dist'].ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
+@instrumenta
+def acc_dist(data, trend_periods=21, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', vol_col='<VOL>', return_new_only=False, compact=False):
+    high, low, close, vol = data[high_col].values, data[low_col].values, data[close_col].values, data[vol_col].values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ac = ((close - low) - (high - close)) / (high - low) * vol
+    ac = pd.Series(np.where(high != low, ac, 0.), index=data.index)
+    acc_dist_ema = ac.ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
     
-    return data
+    return agrega_columnas(data, {'acc_dist': ac, 'acc_dist_ema' + str(trend_periods): acc_dist_ema}, return_new_only, compact)
 
 """
 On Balance Volume (OBV)
@@ -89,28 +93,24 @@ Params:
     trend_periods: the over which to calculate OBV
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'obv' and 'obv_ema[trend_periods]' columns added
 """
-def on_balance_volume(data, trend_periods=21, close_col='<CLOSE>', vol_col='<VOL>'):
-    for index, row in data.iterrows():
-        if index > 0:
-            last_obv = data.at[index - 1, 'obv']
-            if row[close_col] > data.at[index - 1, close_col]:
-                current_obv = last_obv + row[vol_col]
-            elif row[close_col] < data.at[index - 1, close_col]:
-                current_obv = last_obv - row[vol_col]
-            else:
-                current_obv = last_obv
-        else:
-            last_obv = 0
-            current_obv = row[vol_col]
-        data.at[index,'obv']=current_obv
+@instrumenta
+def on_balance_volume(data, trend_periods=21, close_col='<CLOSE>', vol_col='<VOL>', return_new_only=False, compact=False):
+    close = data[close_col].values
+    vol = data[vol_col].values.astype(float)
+    change = np.zeros(len(data))
+    change[1:] = np.where(close[1:] > close[:-1], vol[1:], np.where(close[1:] < close[:-1], -vol[1:], 0.))
+    change[:1] = vol[:1]
+    obv = pd.Series(np.cumsum(change), index=data.index)
 
-    data['obv_ema' + str(trend_periods)] = data['obv'].ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
+    obv_ema = obv.ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
     
-    return data
+    return agrega_columnas(data, {'obv': obv, 'obv_ema' + str(trend_periods): obv_ema}, return_new_only, compact)
 
 """
 Price-volume trend (PVT) (sometimes volume-price trend)
@@ -120,26 +120,24 @@ Params:
     trend_periods: the over which to calculate PVT
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values columna
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'pvt' and 'pvt_ema[trend_periods]' columns added
 """
-def price_volume_trend(data, trend_periods=21, close_col='<CLOSE>', vol_col='<VOL>'):
-    for index, row in data.iterrows():
-        if index > 0:
-            last_val = data.at[index - 1, 'pvt']
-            last_close = data.at[index - 1, close_col]
-            today_close = row[close_col]
-            today_vol = row[vol_col]
-            current_val = last_val + (today_vol * (today_close - last_close) / last_close)
-        else:
-            current_val = row[vol_col]
+@instrumenta
+def price_volume_trend(data, trend_periods=21, close_col='<CLOSE>', vol_col='<VOL>', return_new_only=False, compact=False):
+    close = data[close_col].values.astype(float)
+    vol = data[vol_col].values.astype(float)
+    change = np.zeros(len(data))
+    change[1:] = (vol[1:] * (close[1:] - close[:-1]) / close[:-1])
+    change[:1] = vol[:1]
+    pvt = pd.Series(np.cumsum(change), index=data.index)
 
-        data.at[index,'pvt']=current_val
-
-    data['pvt_ema' + str(trend_periods)] = data['pvt'].ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
+    pvt_ema = pvt.ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
         
-    return data
+    return agrega_columnas(data, {'pvt': pvt, 'pvt_ema' + str(trend_periods): pvt_ema}, return_new_only, compact)
 
 """
 Average true range (ATR)
@@ -152,29 +150,46 @@ Params:
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values column
-	drop_tr: whether to drop the True Range values column from the resulting DataFrame
+	drop_tr: whether to drop the True Range values column from the resulting DataFrame (an existing 'true_range' column is reused and never dropped)
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'atr' (and 'true_range' if 'drop_tr' == True) column(s) added
 """
-def average_true_range(data, trend_periods=14, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', drop_tr = True):
-    for index, row in data.iterrows():
-        prices = [row[high_col], row[low_col], row[close_col], row[open_col]]
-        if index > 0:
-            val1 = np.amax(prices) - np.amin(prices)
-            val2 = abs(np.amax(prices) - data.at[index - 1, close_col])
-            val3 = abs(np.amin(prices) - data.at[index - 1, close_col])
-            true_range = np.amax([val1, val2, val3])
-
-        else:
-            true_range = np.amax(prices) - np.amin(prices)
-
-        data.at[index,'true_range']=true_range
-    data['atr'] = data['true_range'].ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
-    if drop_tr:
-        data = data.drop(['true_range'], axis=1)
+@instrumenta
+def average_true_range(data, trend_periods=14, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', drop_tr = True, return_new_only=False, compact=False):
+    new_cols = {}
+    if 'true_range' in data.columns:
+        true_range = data['true_range']
+    else:
+        true_range = pd.Series(_true_range(data, open_col, high_col, low_col, close_col), index=data.index)
+        if not drop_tr:
+            new_cols['true_range'] = true_range
+    new_cols['atr'] = true_range.ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
         
-    return data
+    return agrega_columnas(data, new_cols, return_new_only, compact)
+
+"""
+True range
+Params: 
+    data: pandas DataFrame
+    open_col: the name of the OPEN values column
+	high_col: the name of the HIGH values column
+	low_col: the name of the LOW values column
+	close_col: the name of the CLOSE values column
+    
+Returns:
+    array with the true range of every bar (range of OPEN/HIGH/LOW/CLOSE, widened to the previous close)
+"""
+def _true_range(data, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
+    prices = [data[high_col].values, data[low_col].values, data[close_col].values, data[open_col].values]
+    highest = np.maximum.reduce(prices)
+    lowest = np.minimum.reduce(prices)
+    true_range = highest - lowest
+    prev_close = prices[2][:-1]
+    true_range[1:] = np.maximum.reduce([true_range[1:], np.abs(highest[1:] - prev_close), np.abs(lowest[1:] - prev_close)])
+    return true_range
 
 
 
@@ -185,30 +200,61 @@ Params:
     data: pandas DataFrame
     trend_periods: the over which to calculate BB
 	close_col: the name of the CLOSE values column
+	inclusive_window: if True the window ends at the current bar (conventional); by default it ends at the previous bar
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'bol_bands_middle', 'bol_bands_upper' and 'bol_bands_lower' columns added
 """
-def bollinger_bands(data, trend_periods=20, close_col='<CLOSE>'):
+@instrumenta
+def bollinger_bands(data, trend_periods=20, close_col='<CLOSE>', inclusive_window=False, return_new_only=False, compact=False):
 
-    data['bol_bands_middle'] = data[close_col].ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean()
-    for index, row in data.iterrows():
+    middle_band = data[close_col].ewm(ignore_na=False, min_periods=0, com=trend_periods, adjust=True).mean().values
 
-        s = data[close_col].iloc[index - trend_periods: index]
-        sums = 0
-        middle_band = data.at[index, 'bol_bands_middle']
-        for e in s:
-            sums += np.square(e - middle_band)
+    # Mean squared distance of the window to the middle band: window variance plus the squared gap between window mean and band
+    close = data[close_col].values
+    window_mean = _window(close, trend_periods, 'mean', inclusive_window)
+    window_var = _window(close, trend_periods, 'var', inclusive_window, ddof=0)
+    std = np.sqrt(window_var + np.square(window_mean - middle_band))
+    std[~_window_ready(len(data), trend_periods, inclusive_window)] = 0.
 
-        std = np.sqrt(sums / trend_periods)
-        d = 2
-        upper_band = middle_band + (d * std)
-        lower_band = middle_band - (d * std)
-	
-        data.at[index,'bol_bands_upper']=upper_band
-        data.at[index,'bol_bands_lower']=lower_band
+    d = 2
+    return agrega_columnas(data, {'bol_bands_middle': middle_band, 'bol_bands_upper': middle_band + (d * std), 'bol_bands_lower': middle_band - (d * std)}, return_new_only, compact)
 
-    return data
+"""
+Rolling window aggregate
+Params: 
+    values: array of values
+    periods: window length
+    how: name of the aggregate ('sum', 'mean', 'var', 'max', 'min')
+    inclusive_window: if True the window ends at the current bar, otherwise at the previous bar
+    kwargs: extra arguments for the aggregate (e.g. ddof)
+    
+Returns:
+    writable array with the aggregate over each window (NaN while the window is incomplete). Sums, means and variances are computed from the values of each window only
+    (the online pandas rolling sum carries the rounding of every earlier row), so a row comes out the same from any start with at least its window before it
+"""
+def _window(values, periods, how, inclusive_window=False, rows_per_chunk=65536, **kwargs):
+    values = np.asarray(values, dtype=float)
+    if how in ('max', 'min') or periods < 1:
+        # A writable copy: under copy-on-write the values of the rolled Series are read-only and callers mask them in place
+        rolled = np.array(getattr(pd.Series(values).rolling(periods, min_periods=periods), how)(**kwargs).values)
+    else:
+        rolled = np.full(len(values), np.nan)
+        # In chunks of rows: the temporaries of the window views stay at rows_per_chunk x periods
+        for start in range(periods - 1, len(values), rows_per_chunk):
+            end = min(start + rows_per_chunk, len(values))
+            windows = np.lib.stride_tricks.sliding_window_view(values[start - periods + 1:end], periods)
+            rolled[start:end] = getattr(windows, how)(axis=1, **kwargs)
+    if inclusive_window:
+        return rolled
+    return np.concatenate([[np.nan], rolled[:-1]])[:len(rolled)]
+
+def _window_ready(rows, periods, inclusive_window=False):
+    """Mask of the rows whose window is complete (index >= periods, or index >= periods-1 when inclusive)."""
+    first = periods - 1 if inclusive_window else periods
+    return np.arange(rows) >= first
 
 """
 Chaikin Oscillator
@@ -221,29 +267,23 @@ Params:
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'ch_osc' column added
 """
+@instrumenta
 def chaikin_oscillator(data, periods_short=3, periods_long=10, high_col='<HIGH>',
-                       low_col='<LOW>', close_col='<CLOSE>', vol_col='<VOL>'):
-    ac = pd.Series([])
-    val_last = 0
-	
-    for index, row in data.iterrows():
-        if row[high_col] != row[low_col]:
-            val = val_last + ((row[close_col] - row[low_col]) - (row[high_col] - row[close_col])) / (row[high_col] - row[low_col]) * row[vol_col]
-        else:
-            val = val_last
-	
-        ac.at[index]=val
-        val_last = val
+                       low_col='<LOW>', close_col='<CLOSE>', vol_col='<VOL>', return_new_only=False, compact=False):
+    high, low, close, vol = data[high_col].values, data[low_col].values, data[close_col].values, data[vol_col].values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        val = ((close - low) - (high - close)) / (high - low) * vol
+    ac = pd.Series(np.cumsum(np.where(high != low, val, 0.)), index=data.index)
 
     ema_long = ac.ewm(ignore_na=False, min_periods=0, com=periods_long, adjust=True).mean()
     ema_short = ac.ewm(ignore_na=False, min_periods=0, com=periods_short, adjust=True).mean()
-    data['ch_osc'] = ema_short - ema_long
-
-    return data
+    return agrega_columnas(data, {'ch_osc': ema_short - ema_long}, return_new_only, compact)
 
 """
 Typical Price
@@ -253,15 +293,16 @@ Params:
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'typical_price' column added
 """
-def typical_price(data, high_col = '<HIGH>', low_col = '<LOW>', close_col = '<CLOSE>'):
+@instrumenta
+def typical_price(data, high_col = '<HIGH>', low_col = '<LOW>', close_col = '<CLOSE>', return_new_only=False, compact=False):
     
-    data['typical_price'] = (data[high_col] + data[low_col] + data[close_col]) / 3
-
-    return data
+    return agrega_columnas(data, {'typical_price': (data[high_col] + data[low_col] + data[close_col]) / 3}, return_new_only, compact)
 
 """
 Ease of Movement
@@ -272,34 +313,29 @@ Params:
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
 	vol_col: the name of the VOL values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'emv' and 'emv_ema_[period]' columns added
 """
-def ease_of_movement(data, period=14, high_col='<HIGH>', low_col='<LOW>', vol_col='<VOL>'):
-    for index, row in data.iterrows():
-        if index > 0:
-            midpoint_move = (row[high_col] + row[low_col]) / 2 - (data.at[index - 1, high_col] + data.at[index - 1, low_col]) / 2
-        else:
-            midpoint_move = 0
-        
-        diff = row[high_col] - row[low_col]
-		
-        if diff == 0:
-			#this is to avoid division by zero below
-            diff = 0.000000001			
-            
-        vol = row[vol_col]
-        if vol == 0:
-            vol = 1
-        box_ratio = (vol / 100000000) / (diff)
-        emv = midpoint_move / box_ratio
+@instrumenta
+def ease_of_movement(data, period=14, high_col='<HIGH>', low_col='<LOW>', vol_col='<VOL>', return_new_only=False, compact=False):
+    high, low = data[high_col].values, data[low_col].values
+    midpoint = (high + low) / 2
+    midpoint_move = np.zeros(len(data))
+    midpoint_move[1:] = midpoint[1:] - midpoint[:-1]
+
+    diff = high - low
+    diff = np.where(diff == 0, 0.000000001, diff)	#this is to avoid division by zero below
+    vol = data[vol_col].values
+    vol = np.where(vol == 0, 1, vol)
+    box_ratio = (vol / 100000000) / (diff)
+    emv = pd.Series(midpoint_move / box_ratio, index=data.index)
         
-        data.at[index,'emv']=emv
+    emv_ema = emv.ewm(ignore_na=False, min_periods=0, com=period, adjust=True).mean()
         
-    data['emv_ema_'+str(period)] = data['emv'].ewm(ignore_na=False, min_periods=0, com=period, adjust=True).mean()
-        
-    return data
+    return agrega_columnas(data, {'emv': emv, 'emv_ema_'+str(period): emv_ema}, return_new_only, compact)
 
 """
 Mass Index
@@ -309,24 +345,23 @@ Params:
 	period: period for calculating MI (9 days recommended)
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
+	inclusive_window: if True the window ends at the current bar (conventional); by default it ends at the previous bar
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'mass_index' column added
 """
-def mass_index(data, period=25, ema_period=9, high_col='<HIGH>', low_col='<LOW>'):
+@instrumenta
+def mass_index(data, period=25, ema_period=9, high_col='<HIGH>', low_col='<LOW>', inclusive_window=False, return_new_only=False, compact=False):
     high_low = data[high_col] - data[low_col] + 0.000001	#this is to avoid division by zero below
     ema = high_low.ewm(ignore_na=False, min_periods=0, com=ema_period, adjust=True).mean()
     ema_ema = ema.ewm(ignore_na=False, min_periods=0, com=ema_period, adjust=True).mean()
     div = ema / ema_ema
 
-    for index, row in data.iterrows():
-        if index >= period:
-            val = div[index-25:index].sum()
-        else:
-            val = 0
-        data.at[index,'mass_index']=val
+    mass_index = np.where(_window_ready(len(data), period, inclusive_window), _window(div.values, period, 'sum', inclusive_window), 0.)
 	
-    return data
+    return agrega_columnas(data, {'mass_index': mass_index}, return_new_only, compact)
 
 """
 Average directional movement index
@@ -336,45 +371,35 @@ Params:
 	periods: period for calculating ADX (14 days recommended)
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'adx', 'dxi', 'di_plus', 'di_minus' columns added
 """
-def directional_movement_index(data, periods=14, high_col='<HIGH>', low_col='<LOW>'):
-    remove_tr_col = False
-    if not 'true_range' in data.columns:
-        data = average_true_range(data, drop_tr = False)
-        remove_tr_col = True
-
-    data['m_plus'] = 0.
-    data['m_minus'] = 0.
-    
-    for i,row in data.iterrows():
-        if i>0:
-            data.at[i,'m_plus']=row[high_col] - data.at[i-1, high_col]
-            data.at[i,'m_minus']=row[low_col] - data.at[i-1, low_col]
-	    
-    data['dm_plus'] = 0.
-    data['dm_minus'] = 0.
-    
-    for i,row in data.iterrows():
-        if row['m_plus'] > row['m_minus'] and row['m_plus'] > 0:
-            data.at[i,'dm_plus']= row['m_plus']
-            
-        if row['m_minus'] > row['m_plus'] and row['m_minus'] > 0:
-            data.at[i,'dm_minus']=row['m_minus']
-
-    data['di_plus'] = (data['dm_plus'] / data['true_range']).ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
-    data['di_minus'] = (data['dm_minus'] / data['true_range']).ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
-    
-    data['dxi'] = np.abs(data['di_plus'] - data['di_minus']) / (data['di_plus'] + data['di_minus'])
-    data.at[0,'dxi']=1.
-    data['adx'] = data['dxi'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
-    data = data.drop(['m_plus', 'm_minus', 'dm_plus', 'dm_minus'], axis=1)
-    if remove_tr_col:
-        data = data.drop(['true_range'], axis=1)
+@instrumenta
+def directional_movement_index(data, periods=14, high_col='<HIGH>', low_col='<LOW>', return_new_only=False, compact=False):
+    if 'true_range' in data.columns:
+        true_range = data['true_range'].values
+    else:
+        true_range = _true_range(data, high_col=high_col, low_col=low_col)
+
+    high, low = data[high_col].values, data[low_col].values
+    m_plus = np.zeros(len(data))
+    m_minus = np.zeros(len(data))
+    m_plus[1:] = high[1:] - high[:-1]
+    m_minus[1:] = low[1:] - low[:-1]
+    dm_plus = np.where((m_plus > m_minus) & (m_plus > 0), m_plus, 0.)
+    dm_minus = np.where((m_minus > m_plus) & (m_minus > 0), m_minus, 0.)
+
+    di_plus = pd.Series(dm_plus / true_range, index=data.index).ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+    di_minus = pd.Series(dm_minus / true_range, index=data.index).ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+    
+    dxi = (np.abs(di_plus - di_minus) / (di_plus + di_minus)).to_numpy(copy=True)
+    dxi[:1] = 1.
+    adx = pd.Series(dxi, index=data.index).ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
          
-    return data
+    return agrega_columnas(data, {'di_plus': di_plus, 'di_minus': di_minus, 'dxi': dxi, 'adx': adx}, return_new_only, compact)
 
 """
 Money Flow Index (MFI)
@@ -383,50 +408,37 @@ Params:
     data: pandas DataFrame
 	periods: period for calculating MFI (14 days recommended)
 	vol_col: the name of the VOL values column
+	inclusive_window: if True the window ends at the current bar (conventional); by default it ends at the previous bar
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'money_flow_index' column added
 """
-def money_flow_index(data, periods=14, vol_col='<VOL>'):
-    remove_tp_col = False
-    if not 'typical_price' in data.columns:
-        data = typical_price(data)
-        remove_tp_col = True
-    
-    data['money_flow'] = data['typical_price'] * data[vol_col]
-    data['money_ratio'] = 0.
-    data['money_flow_index'] = 0.
-    data['money_flow_positive'] = 0.
-    data['money_flow_negative'] = 0.
-    
-    for index,row in data.iterrows():
-        if index > 0:
-            if row['typical_price'] < data.at[index-1, 'typical_price']:
-                data.at[index,'money_flow_positive']=row['money_flow']
-            else:
-                data.at[index,'money_flow_negative']=row['money_flow']
-    
-        if index >= periods:
-            period_slice = data['money_flow'][index-periods:index]
-            positive_sum = data['money_flow_positive'][index-periods:index].sum()
-            negative_sum = data['money_flow_negative'][index-periods:index].sum()
-
-            if negative_sum == 0.:
-				#this is to avoid division by zero below
-                negative_sum = 0.00001
-            m_r = positive_sum / negative_sum
+@instrumenta
+def money_flow_index(data, periods=14, vol_col='<VOL>', inclusive_window=False, return_new_only=False, compact=False):
+    if 'typical_price' in data.columns:
+        tp = data['typical_price'].values
+    else:
+        tp = typical_price(data, return_new_only=True)['typical_price'].values
+    money_flow = tp * data[vol_col].values
+    lower = np.zeros(len(data), dtype=bool)
+    lower[1:] = tp[1:] < tp[:-1]
+    money_flow_positive = np.where(lower, money_flow, 0.)
+    money_flow_negative = np.where(~lower, money_flow, 0.)
+    money_flow_negative[:1] = 0.
 
-            mfi = 1-(1 / (1 + m_r))
+    # Windows without any flow are exactly zero
+    positive_sum = _window(money_flow_positive, periods, 'sum', inclusive_window)
+    positive_sum[_window(money_flow_positive != 0, periods, 'sum', inclusive_window) == 0] = 0.
+    negative_sum = _window(money_flow_negative, periods, 'sum', inclusive_window)
+    negative_sum[_window(money_flow_negative != 0, periods, 'sum', inclusive_window) == 0] = 0.00001	#this is to avoid division by zero below
 
-            data.at[index,'money_ratio']=m_r
-            data.at[index,'money_flow_index']=mfi
-          
-    data = data.drop(['money_flow', 'money_ratio', 'money_flow_positive', 'money_flow_negative'], axis=1)
-    
-    if remove_tp_col:
-        data = data.drop(['typical_price'], axis=1)
+    m_r = positive_sum / negative_sum
+    mfi = 1-(1 / (1 + m_r))
+    money_flow_index = np.where(_window_ready(len(data), periods, inclusive_window), mfi, 0.)
 
-    return data
+    return agrega_columnas(data, {'money_flow_index': money_flow_index}, return_new_only, compact)
 
 """
 Negative Volume Index (NVI)
@@ -436,27 +448,21 @@ Params:
 	periods: period for calculating NVI (255 days recommended)
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'nvi' and 'nvi_ema' columns added
 """
-def negative_volume_index(data, periods=255, close_col='<CLOSE>', vol_col='<VOL>'):
-    data['nvi'] = 0.
-    
-    for index,row in data.iterrows():
-        if index > 0:
-            prev_nvi = data.at[index-1, 'nvi']
-            prev_close = data.at[index-1, close_col]
-            if row[vol_col] < data.at[index-1, vol_col]:
-                nvi = prev_nvi + (row[close_col] - prev_close / prev_close * prev_nvi)
-            else: 
-                nvi = prev_nvi
-        else:
-            nvi = 1000
-        data.at[index,'nvi']=nvi
-    data['nvi_ema'] = data['nvi'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+@instrumenta
+def negative_volume_index(data, periods=255, close_col='<CLOSE>', vol_col='<VOL>', return_new_only=False, compact=False):
+    vol = data[vol_col].values
+    falling = np.zeros(len(data), dtype=bool)
+    falling[1:] = vol[1:] < vol[:-1]
+    nvi = pd.Series(_volume_index(data[close_col].values.astype(float), falling), index=data.index)
+    nvi_ema = nvi.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
     
-    return data
+    return agrega_columnas(data, {'nvi': nvi, 'nvi_ema': nvi_ema}, return_new_only, compact)
 
 """
 Positive Volume Index (PVI)
@@ -466,27 +472,57 @@ Params:
 	periods: period for calculating PVI (255 days recommended)
 	close_col: the name of the CLOSE values column
 	vol_col: the name of the VOL values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'pvi' and 'pvi_ema' columns added
 """
-def positive_volume_index(data, periods=255, close_col='<CLOSE>', vol_col='<VOL>'):
-    data['pvi'] = 0.
-    
-    for index,row in data.iterrows():
-        if index > 0:
-            prev_pvi = data.at[index-1, 'pvi']
-            prev_close = data.at[index-1, close_col]
-            if row[vol_col] > data.at[index-1, vol_col]:
-                pvi = prev_pvi + (row[close_col] - prev_close / prev_close * prev_pvi)
-            else: 
-                pvi = prev_pvi
-        else:
-            pvi = 1000
-        data.at[index,'pvi']=pvi
-    data['pvi_ema'] = data['pvi'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+@instrumenta
+def positive_volume_index(data, periods=255, close_col='<CLOSE>', vol_col='<VOL>', return_new_only=False, compact=False):
+    vol = data[vol_col].values
+    rising = np.zeros(len(data), dtype=bool)
+    rising[1:] = vol[1:] > vol[:-1]
+    pvi = pd.Series(_volume_index(data[close_col].values.astype(float), rising), index=data.index)
+    pvi_ema = pvi.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
 
-    return data
+    return agrega_columnas(data, {'pvi': pvi, 'pvi_ema': pvi_ema}, return_new_only, compact)
+
+"""
+Shared recursion of the Negative/Positive Volume Index
+Params: 
+    close: array of CLOSE values
+    update: boolean array, True on the days the index moves (never the first one)
+    
+Returns:
+    array with the index: 1000 until the first update, then prev + (close - prev_close / prev_close * prev) on every update day
+"""
+def _volume_index(close, update, start=1000.):
+    rows = np.flatnonzero(update)
+    ratio = close[rows - 1] / close[rows - 1]
+    current = close[rows]
+    # With the previous index exactly at the previous close (or at start) and the close within a factor of 2 of it,
+    # prev + (close - prev) is exactly the close (Sterbenz), so those days need no recursion. The rest (big jumps,
+    # NaN or zero closes) follow the row-by-row formula, each day at most once, until the index is back on the close.
+    prev_guess = np.concatenate([[start], current[:-1]])
+    with np.errstate(invalid='ignore'):
+        on_close = (ratio == 1) & (current >= prev_guess / 2) & (current <= 2 * prev_guess)
+    values = current.copy()
+    done = 0
+    for k in np.flatnonzero(~on_close):
+        if k < done:
+            continue
+        done = k
+        while done < len(rows):
+            prev = start if done == 0 else values[done - 1]
+            values[done] = prev + (current[done] - ratio[done] * prev)
+            done += 1
+            if values[done - 1] == current[done - 1]:
+                break
+    on_update = np.full(len(close), start)
+    on_update[rows] = values
+    last = np.maximum.accumulate(np.where(update, np.arange(len(close)), -1))
+    return np.where(last >= 0, on_update[np.maximum(last, 0)], start)
 
 """
 Momentum
@@ -495,20 +531,19 @@ Params:
     data: pandas DataFrame
 	periods: period for calculating momentum
 	close_col: the name of the CLOSE values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'momentum' column added
 """
-def momentum(data, periods=14, close_col='<CLOSE>'):
-    data['momentum'] = 0.
-    
-    for index,row in data.iterrows():
-        if index >= periods:
-            prev_close = data.at[index-periods, close_col]
-            val_perc = (row[close_col] - prev_close)/prev_close
-            data.at[index,'momentum'] = val_perc
-
-    return data
+@instrumenta
+def momentum(data, periods=14, close_col='<CLOSE>', return_new_only=False, compact=False):
+    close = data[close_col].values
+    val_perc = np.zeros(len(data))
+    prev_close = close[:-periods] if periods > 0 else close
+    val_perc[periods:] = (close[periods:] - prev_close)/prev_close
+    return agrega_columnas(data, {'momentum': val_perc}, return_new_only, compact)
 
 """
 Relative Strenght Index
@@ -517,29 +552,23 @@ Params:
     data: pandas DataFrame
 	periods: period for calculating momentum
 	close_col: the name of the CLOSE values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'rsi' column added
 """
-def rsi(data, periods=14, close_col='<CLOSE>'):
-    data['rsi_u'] = 0.
-    data['rsi_d'] = 0.
-    data['rsi'] = 0.
-    
-    for index,row in data.iterrows():
-        if index >= periods:
-            
-            prev_close = data.at[index-periods, close_col]
-            if prev_close < row[close_col]:
-                data.at[index,'rsi_u'] = row[close_col] - prev_close
-            elif prev_close > row[close_col]:
-                data.at[index,'rsi_d'] = prev_close - row[close_col]
+@instrumenta
+def rsi(data, periods=14, close_col='<CLOSE>', return_new_only=False, compact=False):
+    close = data[close_col].values
+    change = np.zeros(len(data))
+    change[periods:] = close[periods:] - (close[:-periods] if periods > 0 else close)
+    rsi_u = pd.Series(np.where(change > 0, change, 0.), index=data.index)
+    rsi_d = pd.Series(np.where(change < 0, -change, 0.), index=data.index)
             
-    data['rsi'] = data['rsi_u'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean() / (data['rsi_u'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean() + data['rsi_d'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean())
-    
-    data = data.drop(['rsi_u', 'rsi_d'], axis=1)
+    rsi = rsi_u.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean() / (rsi_u.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean() + rsi_d.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean())
         
-    return data
+    return agrega_columnas(data, {'rsi': rsi}, return_new_only, compact)
 
 """
 Chaikin Volatility (CV)
@@ -551,27 +580,23 @@ Params:
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'chaikin_volatility' column added
 """
-def chaikin_volatility(data, ema_periods=10, change_periods=10, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
-    data['ch_vol_hl'] = data[high_col] - data[low_col]
-    data['ch_vol_ema'] = data['ch_vol_hl'].ewm(ignore_na=False, min_periods=0, com=ema_periods, adjust=True).mean()
-    data['chaikin_volatility'] = 0.
+@instrumenta
+def chaikin_volatility(data, ema_periods=10, change_periods=10, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', return_new_only=False, compact=False):
+    ch_vol_hl = data[high_col] - data[low_col]
+    ch_vol_ema = ch_vol_hl.ewm(ignore_na=False, min_periods=0, com=ema_periods, adjust=True).mean().values
+    chaikin_volatility = np.zeros(len(data))
     
-    for index,row in data.iterrows():
-        if index >= change_periods:
-            
-            prev_value = data.at[index-change_periods, 'ch_vol_ema']
-            if prev_value == 0:
-                #this is to avoid division by zero below
-                prev_value = 0.0001
-            data.at[index,'chaikin_volatility'] = ((row['ch_vol_ema'] - prev_value)/prev_value)
-            
-    data = data.drop(['ch_vol_hl', 'ch_vol_ema'], axis=1)
+    prev_value = ch_vol_ema[:-change_periods] if change_periods > 0 else ch_vol_ema
+    prev_value = np.where(prev_value == 0, 0.0001, prev_value)	#this is to avoid division by zero below
+    chaikin_volatility[change_periods:] = (ch_vol_ema[change_periods:] - prev_value)/prev_value
         
-    return data
+    return agrega_columnas(data, {'chaikin_volatility': chaikin_volatility}, return_new_only, compact)
 
 """
 William's Accumulation/Distribution
@@ -581,27 +606,22 @@ Params:
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'williams_ad' column added
 """
-def williams_ad(data, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
-    data['williams_ad'] = 0.
-    
-    for index,row in data.iterrows():
-        if index > 0:
-            prev_value = data.at[index-1, 'williams_ad']
-            prev_close = data.at[index-1, close_col]
-            if row[close_col] > prev_close:
-                ad = row[close_col] - min(prev_close, row[low_col])
-            elif row[close_col] < prev_close:
-                ad = row[close_col] - max(prev_close, row[high_col])
-            else:
-                ad = 0.
-
-            data.at[index,'williams_ad'] = (ad+prev_value)		
+@instrumenta
+def williams_ad(data, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', return_new_only=False, compact=False):
+    high, low, close = data[high_col].values, data[low_col].values, data[close_col].values
+    ad = np.zeros(len(data))
+    prev_close = close[:-1]
+    today = close[1:]
+    ad[1:] = np.where(today > prev_close, today - np.minimum(prev_close, low[1:]),
+                      np.where(today < prev_close, today - np.maximum(prev_close, high[1:]), 0.))
         
-    return data
+    return agrega_columnas(data, {'williams_ad': np.cumsum(ad)}, return_new_only, compact)
 
 """
 William's % R
@@ -612,19 +632,23 @@ Params:
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
+	inclusive_window: if True the window ends at the current bar (conventional); by default it ends at the previous bar
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'williams_r' column added
 """
-def williams_r(data, periods=14, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
-    data['williams_r'] = 0.
-    
-    for index,row in data.iterrows():
-        if index > periods:
-            data.at[index,'williams_r']= ((max(data[high_col][index-periods:index]) - row[close_col]) / 
-                                                 (max(data[high_col][index-periods:index]) - min(data[low_col][index-periods:index])))	
+@instrumenta
+def williams_r(data, periods=14, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', inclusive_window=False, return_new_only=False, compact=False):
+    highest = _window(data[high_col].values, periods, 'max', inclusive_window)
+    lowest = _window(data[low_col].values, periods, 'min', inclusive_window)
+    # The original window starts one bar later than the others (index > periods)
+    ready = np.arange(len(data)) > periods if not inclusive_window else _window_ready(len(data), periods, True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        williams_r = np.where(ready, (highest - data[close_col].values) / (highest - lowest), 0.)
        
-    return data
+    return agrega_columnas(data, {'williams_r': williams_r}, return_new_only, compact)
 
 """
 TRIX
@@ -634,17 +658,20 @@ Params:
 	periods: the period over which to calculate the indicator value
 	signal_periods: the period for signal moving average
 	close_col: the name of the CLOSE values column
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'trix' and 'trix_signal' columns added
 """
-def trix(data, periods=14, signal_periods=9, close_col='<CLOSE>'):
-    data['trix'] = data[close_col].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
-    data['trix'] = data['trix'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
-    data['trix'] = data['trix'].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
-    data['trix_signal'] = data['trix'].ewm(ignore_na=False, min_periods=0, com=signal_periods, adjust=True).mean()
+@instrumenta
+def trix(data, periods=14, signal_periods=9, close_col='<CLOSE>', return_new_only=False, compact=False):
+    trix = data[close_col].ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+    trix = trix.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+    trix = trix.ewm(ignore_na=False, min_periods=0, com=periods, adjust=True).mean()
+    trix_signal = trix.ewm(ignore_na=False, min_periods=0, com=signal_periods, adjust=True).mean()
         
-    return data
+    return agrega_columnas(data, {'trix': trix, 'trix_signal': trix_signal}, return_new_only, compact)
 
 """
 Ultimate Oscillator
@@ -657,39 +684,27 @@ Params:
 	high_col: the name of the HIGH values column
 	low_col: the name of the LOW values column
 	close_col: the name of the CLOSE values column
+	inclusive_window: if True the window ends at the current bar (conventional); by default it ends at the previous bar
+	return_new_only: if True only the new columns are returned (a DataFrame with the index of 'data'), for the caller to concatenate
+	compact: if True the new columns are float32 / the smallest integer type that fits (precision contract in modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'ultimate_oscillator' column added
 """
-def ultimate_oscillator(data, period_1=7,period_2=14, period_3=28, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
-    data['ultimate_oscillator'] = 0.
-    data['uo_bp'] = 0.
-    data['uo_tr'] = 0.
-    data['uo_avg_1'] = 0.
-    data['uo_avg_2'] = 0.
-    data['uo_avg_3'] = 0.
-
-    for index,row in data.iterrows():
-        if index > 0:
-                           
-            bp = row[close_col] - min(row[low_col], data.at[index-1, close_col])
-            tr = max(row[high_col], data.at[index-1, close_col]) - min(row[low_col], data.at[index-1, close_col])
-            
-            data.at[index,'uo_bp']=bp
-            data.at[index,'uo_tr']=tr
-	
-            if index >= period_1:
-                uo_avg_1 = sum(data['uo_bp'][index-period_1:index]) / sum(data['uo_tr'][index-period_1:index])
-                data.at[index,'uo_avg_1']=uo_avg_1
-            if index >= period_2:
-                uo_avg_2 = sum(data['uo_bp'][index-period_2:index]) / sum(data['uo_tr'][index-period_2:index])
-                data.at[index,'uo_avg_2']=uo_avg_2
-            if index >= period_3:
-                uo_avg_3 = sum(data['uo_bp'][index-period_3:index]) / sum(data['uo_tr'][index-period_3:index])
-                data.at[index,'uo_avg_3']=uo_avg_3
-                uo = (4 * uo_avg_1 + 2 * uo_avg_2 + uo_avg_3) / 7
-                data.at[index,'ultimate_oscillator']=uo
-
-    data = data.drop(['uo_bp', 'uo_tr', 'uo_avg_1', 'uo_avg_2', 'uo_avg_3'], axis=1)
+@instrumenta
+def ultimate_oscillator(data, period_1=7,period_2=14, period_3=28, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', inclusive_window=False, return_new_only=False, compact=False):
+    high, low, close = data[high_col].values, data[low_col].values, data[close_col].values
+    bp = np.zeros(len(data))
+    tr = np.zeros(len(data))
+    prev_close = close[:-1]
+    bp[1:] = close[1:] - np.minimum(low[1:], prev_close)
+    tr[1:] = np.maximum(high[1:], prev_close) - np.minimum(low[1:], prev_close)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        uo_avg_1 = _window(bp, period_1, 'sum', inclusive_window) / _window(tr, period_1, 'sum', inclusive_window)
+        uo_avg_2 = _window(bp, period_2, 'sum', inclusive_window) / _window(tr, period_2, 'sum', inclusive_window)
+        uo_avg_3 = _window(bp, period_3, 'sum', inclusive_window) / _window(tr, period_3, 'sum', inclusive_window)
+    uo = (4 * uo_avg_1 + 2 * uo_avg_2 + uo_avg_3) / 7
+    ultimate_oscillator = np.where(_window_ready(len(data), period_3, inclusive_window), uo, 0.)
         
-    return data   
+    return agrega_columnas(data, {'ultimate_oscillator': ultimate_oscillator}, return_new_only, compact)   
@@ -5,6 +5,9 @@ Indicadores FJF
 import numpy as np
 import pandas as pd
 
+from modules.columnas import agrega_columnas
+from modules.instrumentacion import instrumenta, reporta
+
 """
 AMPLITUD
 Params: 
@@ -12,30 +15,176 @@ Params:
     high_col: the name of the HIGH values column
     low_col: the name of the LOW values column
     close_col: the name of the CLOSE values column
+    nombre: nombre de la columna nueva ('amplitud' en los notebooks de v2)
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'amplitud' column added, relativa al precio de cierre
 """
-def calcula_amplitud(data, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
+@instrumenta
+def calcula_amplitud(data, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', nombre='amp_std', return_new_only=False, compact=False):
   """Agrega una columna (no relativa a Y) con la proporción que tiene la amplitud del precio."""
-  data['amp_std'] = (data[high_col] - data[low_col])/data[close_col]
-  return data
+  return agrega_columnas(data, {nombre: (data[high_col] - data[low_col])/data[close_col]}, return_new_only, compact)
 
 """
 ESTANDARIZACIÓN DEL VOLUMEN
 Params: 
     data: pandas DataFrame
     vol_col: the name of the VOLUME values column
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame with 'amplitud' column added
 """
-def estandariza_volumen(data, vol_col='<VOL>'):
+@instrumenta
+def estandariza_volumen(data, vol_col='<VOL>', return_new_only=False, compact=False):
   """Agrega una columna (no relativa a Y) con el volumen en forma estandarizada."""
-  mean_vl = data['<VOL>'].mean()
-  std_vl = data['<VOL>'].std()
-  data['vol_std'] = (data['<VOL>'] - mean_vl)/std_vl
-  return data
+  mean_vl, std_vl = _media_desvio(data[vol_col])
+  return agrega_columnas(data, {'vol_std': (data[vol_col] - mean_vl)/std_vl}, return_new_only, compact)
+
+def _media_desvio(vol):
+  """Media y desvío (n-1) de toda la serie del volumen, los que usa estandariza_volumen (el cálculo por bloques los saca de una primera pasada)."""
+  vol = pd.Series(vol)
+  return vol.mean(), vol.std()
+
+"""
+PRECIO CONTRA EL MERVAL
+Params: 
+    data: pandas DataFrame, con el cierre del merval de cada fecha ya unido (el merge por fecha de los notebooks)
+    merval_col: the name of the MERVAL CLOSE values column
+    close_col: the name of the CLOSE values column
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
+    
+Returns:
+    copy of 'data' DataFrame with 'pc_merval' column added (nulo en las fechas sin cierre del merval)
+"""
+@instrumenta
+def calcula_pc_merval(data, merval_col='<MERVAL>', close_col='<CLOSE>', return_new_only=False, compact=False):
+  """Agrega una columna con el precio expresado en puntos del merval."""
+  return agrega_columnas(data, {'pc_merval': data[close_col]/data[merval_col]}, return_new_only, compact)
+
+"""
+MEDIAS (MACD DE LOS NOTEBOOKS)
+Params: 
+    data: pandas DataFrame
+    close_col: the name of the CLOSE values column
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
+    
+Returns:
+    copy of 'data' DataFrame with 'exp1', 'exp2', 'macd', 'exp3' and 'histog' columns added: medias exponenciales de 12 y 26 días (adjust=False, arrancan con la media simple
+    de los primeros días), su diferencia, la señal de 9 días y el histograma. No es el macd de indicators_foreign (com en vez de span y adjust=True)
+"""
+@instrumenta
+def calcula_medias(data, close_col='<CLOSE>', return_new_only=False, compact=False):
+  """Igual que calcula_medias de los notebooks de v2: la media simple reemplaza los primeros 'period' cierres y la exponencial sigue desde ahí."""
+  y = data[close_col].values.astype(float)
+  nuevas = {}
+  for nombre, (period, inicio) in zip(('exp1', 'exp2'), _inicios_medias(y).items()):
+    nuevas[nombre] = np.full(len(y), np.nan)
+    if inicio is None:
+      continue
+    idx_start, smas = inicio
+    # Como la asignación de los notebooks, alineada por índice: si hubo nulos en el cierre las primeras filas quedan nulas
+    nuevas[nombre][idx_start:] = pd.Series(np.concatenate([smas, y[idx_start + period:]])).ewm(span=period, adjust=False).mean().values
+  nuevas['macd'] = nuevas['exp1'] - nuevas['exp2']
+  nuevas['exp3'] = pd.Series(nuevas['macd']).ewm(span=9, adjust=False).mean().values
+  nuevas['histog'] = nuevas['macd'] - nuevas['exp3']
+  return agrega_columnas(data, nuevas, return_new_only, compact)
+
+def _inicios_medias(y):
+  """
+  Para las medias de 12 y 26 días de calcula_medias: {period: (fila de inicio, las 'period' medias simples que reemplazan a los cierres desde ahí)}, o None si no hay ninguna media simple.
+  La fila de inicio sale de contar las medias simples nulas de toda la serie (con nulos en el cierre, no solo los primeros días), así que el cálculo por bloques la saca de una primera pasada
+  """
+  inicios = {}
+  for period in (12, 26):
+    sma = pd.Series(y, dtype=float).rolling(period, min_periods=period).mean()
+    if sma.isna().all():
+      inicios[period] = None
+      continue
+    idx_start = sma.isna().sum() + 1 - period
+    inicios[period] = (idx_start, sma.values[idx_start:idx_start + period])
+  return inicios
+
+def _pares_historia(columnas, lags, pares):
+  """Pares (columna, lag) a calcular: los pedidos, o todas las columnas con los lags 1..lags-1 (como el while de los notebooks)."""
+  if pares is not None:
+    return [(columna, int(lag)) for columna, lag in pares]
+  return [(columna, lag) for columna in columnas for lag in range(1, lags)]
+
+"""
+HISTORIA (VARIACIONES CONTRA LOS DÍAS ANTERIORES)
+Params:
+    data: pandas DataFrame
+    lags: se calculan los lags 1 a lags-1 de cada columna (como calcula_historia de los notebooks)
+    columnas: columnas de las que se calcula la variación. Si es None, las que están desde la séptima en adelante al momento de llamar (como en los notebooks)
+    pares: lista de (columna, lag) a calcular. Si se indica, reemplaza a columnas y lags y solo se calculan esos pares
+    como_array: si es True no arma un DataFrame: devuelve (matriz filas x pares, nombres) para pasarla directo al modelo
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
+
+Returns:
+    copy of 'data' DataFrame with 'var_<columna>_<lag>' columns added (valor / valor de lag días antes - 1), o (matriz, nombres) con como_array
+"""
+@instrumenta
+def calcula_historia(data, lags=15, columnas=None, pares=None, como_array=False, return_new_only=False, compact=False):
+  """Un solo array float de las columnas; los lags son una vista con strides (ventanas deslizantes invertidas, sin copiar) y solo se materializan los pares pedidos."""
+  if columnas is None:
+    columnas = list(data.columns[6:])
+  pares = _pares_historia(columnas, lags, pares)
+  usadas = list(dict.fromkeys(columna for columna, _ in pares))
+  nombres = ['var_%s_%s' % par for par in pares]
+  valores = data[usadas].to_numpy(dtype=float)
+  max_lag = max([lag for _, lag in pares], default=0)
+
+  # pasado[t, j, lag] = valores[t - lag, j] (nulo antes del primer día)
+  extendido = np.concatenate([np.full((max_lag, len(usadas)), np.nan), valores])
+  pasado = np.lib.stride_tricks.sliding_window_view(extendido, max_lag + 1, axis=0)[:, :, ::-1]
+
+  j = np.array([usadas.index(columna) for columna, _ in pares], dtype=int)
+  matriz = pasado[:, j, np.array([lag for _, lag in pares], dtype=int)]
+  with np.errstate(divide='ignore', invalid='ignore'):
+    np.divide(valores[:, j], matriz, out=matriz)
+  matriz -= 1
+  if como_array:
+    return (matriz.astype(np.float32) if compact else matriz), nombres
+  return agrega_columnas(data, dict(zip(nombres, matriz.T)), return_new_only, compact)
+
+"""
+CONTEO POR VENTANAS
+Params: 
+    valores: array con la serie de la que se toman los lags
+    lista_ventanas: ventanas (en días) para las que se cuentan los lags que cumplen cada condición
+    condicion: función (lags, filas) que recibe la matriz de lags (fila t, columna i-1 = valor de t-i) y el slice de filas, y devuelve una lista de matrices booleanas
+    bloque: cantidad de filas que se evalúan juntas (acota la memoria a bloque x ventana máxima)
+    
+Returns:
+    lista (una por condición) de diccionarios {ventana: número de lags 1..ventana que cumplen la condición}
+"""
+def _cuenta_ventanas(valores, lista_ventanas, condicion, bloque=2048):
+  """Arma los lags una sola vez para la ventana más grande y saca todas las ventanas de la misma suma acumulada."""
+  max_ventana = max(lista_ventanas)
+  filas = len(valores)
+  relleno = np.concatenate([np.full(max_ventana, np.nan), np.asarray(valores, dtype=float)])
+  lags = np.lib.stride_tricks.sliding_window_view(relleno, max_ventana)[:filas, ::-1]  # Vista, no copia
+
+  conteos = None
+  for desde in range(0, filas, bloque):
+    filas_bloque = slice(desde, min(desde + bloque, filas))
+    cumplen = condicion(lags[filas_bloque], filas_bloque)
+    if conteos is None:
+      conteos = [{ventana: np.zeros(filas, dtype=np.int64) for ventana in lista_ventanas} for _ in cumplen]
+    for conteo, cumple in zip(conteos, cumplen):
+      acumulado = np.cumsum(cumple, axis=1)
+      for ventana in lista_ventanas:
+        conteo[ventana][filas_bloque] = acumulado[:, ventana - 1]
+  if conteos is None:
+    conteos = [{ventana: np.zeros(0, dtype=np.int64) for ventana in lista_ventanas} for _ in condicion(lags, slice(0, 0))]
+  return conteos
 
 """
 CANALIDAD DEL CIERRE
@@ -44,65 +193,196 @@ Params:
     high_col: the name of the HIGH values column
     low_col: the name of the LOW values column
     close_col: the name of the CLOSE values column
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame con columnas de número de días en los que el cierre de Y estuvo entre el máximo y el mínimo de ese día, y número de días en los que el cierre de Y estuvo +-5% del cierre, en los últimos (5, 15, 30, 90, 180)
 """
-def calcula_canalidad_y(data, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', lista_ventanas = [5, 30, 90, 180]):
+@instrumenta
+def calcula_canalidad_y(data, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', lista_ventanas = [5, 30, 90, 180], return_new_only=False, compact=False):
+  high = data[high_col].values[:, None]
+  low = data[low_col].values[:, None]
+  close = data[close_col].values[:, None]
+
+  def condicion(lags, filas):
+    return [(lags < high[filas]) & (lags > low[filas]),
+            (lags < (close[filas] * 1.05)) & (lags > (close[filas] * 0.95))]
+
+  maxmin, cinco_pc = _cuenta_ventanas(data[close_col].values, lista_ventanas, condicion)
+  nuevas = {}
   for ventana in lista_ventanas: 
-    data['lag_y_1'] = data[close_col].shift(1)
-    colname_maxmin = "nu_dias_y_entre_max_min_%s" % (ventana)
-    data[colname_maxmin] = np.where((data['lag_y_1'] < data[high_col]) & (data['lag_y_1'] > data[low_col]), 1, 0)
-    colname_5pc = "nu_dias_y_entre_5pc_%s" % (ventana)
-    data[colname_5pc] = np.where((data['lag_y_1'] < (data[close_col] * 1.05)) & (data['lag_y_1'] > (data[close_col] * 0.95)), 1, 0)
-    data = data.drop(['lag_y_1'], axis=1)
-    i = 2
-    while i <= ventana:
-      colname_lag = "lag_y_%s" % (i)
-      data[colname_lag] = data[close_col].shift(i)
-      data[colname_maxmin] = data[colname_maxmin] + np.where((data[colname_lag] < data[high_col]) & (data[colname_lag] > data[low_col]), 1, 0)
-      data[colname_5pc] = data[colname_5pc] + np.where((data[colname_lag] < (data[close_col] * 1.05)) & (data[colname_lag] > (data[close_col] * 0.95)), 1, 0)
-      i = i + 1
-      data = data.drop([colname_lag], axis=1)
-  return data
+    nuevas["nu_dias_y_entre_max_min_%s" % (ventana)] = maxmin[ventana]
+    nuevas["nu_dias_y_entre_5pc_%s" % (ventana)] = cinco_pc[ventana]
+  return agrega_columnas(data, nuevas, return_new_only, compact)
 
 """
 CANALIDAD DEL HISTOGRAMA MACD
 Params: 
     data: pandas DataFrame
     histog_col: the name of the HISTOG values column
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame con columnas de número de días en (5, 30, 90, 180) los que el histograma MACD fue positivo, negativo e igual al del cierre
 """
-def calcula_canalidad_histog_macd(data, histog_col='macd_histog', lista_ventanas = [5, 30, 90, 180]):
-  for ventana in ventanas:
-    i = 1
-    data['lag_histog_1'] = data[histog_col].shift(1)
-    colname_nu_1 = "nu_dias_histog_entre_5pc_%s" % (ventana)
-    data[colname_nu_1] = np.where((data['lag_histog_1'] < (data[histog_col] * 1.05)) & (data['lag_histog_1'] > (data[histog_col] * 0.95)), 1, 0)
-
-    colname_nu_2 = "nu_dias_histog_positivo_%s" % (ventana)
-    data[colname_nu_2] = np.where((data['lag_histog_1']>0), 1, 0)
-
-    colname_nu_3 = "nu_dias_histog_negativo_%s" % (ventana)
-    data[colname_nu_3] = np.where((data['lag_histog_1']<0), 1, 0)
-
-    colname_nu_4 = "nu_dias_histog_mismo_signo_%s" % (ventana)
-    data[colname_nu_4] = np.where(((data['lag_histog_1']>0) & (data[histog_col]>0))|((data['lag_histog_1']<0) & (data[histog_col]<0)), 1, 0)
-
-    data = data.drop(['lag_histog_1'], axis=1)
-    i = 2
-    while i < (ventana+1):
-      colname = "lag_histog_%s" % (i)
-      data[colname] = data[histog_col].shift(i)
-      data[colname_nu_1] = data[colname_nu_1] + np.where((data[colname] < (data[histog_col] * 1.50)) & (data[colname] > (data[histog_col] * 0.50)), 1, 0)
-      data[colname_nu_2] = data[colname_nu_2] + np.where((data[colname]>0), 1, 0)
-      data[colname_nu_3] = data[colname_nu_3] + np.where((data[colname]<0), 1, 0)
-      data[colname_nu_4] = data[colname_nu_4] + np.where(((data[colname]>0) & (data[histog_col]>0))|((data[colname]<0) & (data[histog_col]<0)), 1, 0)
-      i = i + 1
-      data = data.drop([colname], axis=1)
-  return data
+@instrumenta
+def calcula_canalidad_histog_macd(data, histog_col='macd_histog', lista_ventanas = [5, 30, 90, 180], return_new_only=False, compact=False):
+  histog = data[histog_col].values[:, None]
+  # El lag 1 se compara contra +-5% del histograma y el resto contra +-50%
+  max_ventana = max(lista_ventanas)
+  factor_sup = np.full(max_ventana, 1.50)
+  factor_inf = np.full(max_ventana, 0.50)
+  factor_sup[0] = 1.05
+  factor_inf[0] = 0.95
+
+  def condicion(lags, filas):
+    h = histog[filas]
+    return [(lags < (h * factor_sup)) & (lags > (h * factor_inf)),
+            lags > 0,
+            lags < 0,
+            ((lags > 0) & (h > 0)) | ((lags < 0) & (h < 0))]
+
+  entre_5pc, positivo, negativo, mismo_signo = _cuenta_ventanas(data[histog_col].values, lista_ventanas, condicion)
+  nuevas = {}
+  for ventana in lista_ventanas:
+    nuevas["nu_dias_histog_entre_5pc_%s" % (ventana)] = entre_5pc[ventana]
+    nuevas["nu_dias_histog_positivo_%s" % (ventana)] = positivo[ventana]
+    nuevas["nu_dias_histog_negativo_%s" % (ventana)] = negativo[ventana]
+    nuevas["nu_dias_histog_mismo_signo_%s" % (ventana)] = mismo_signo[ventana]
+  return agrega_columnas(data, nuevas, return_new_only, compact)
+
+"""
+MOTOR DE TENDENCIAS
+Params: 
+    close: array con los precios de cierre
+    pos: posiciones (filas) de los picos desde los que nace cada tendencia
+    pendientes: pendiente de cada tendencia (precio por día)
+    lags: días después del pico en los que se confirma la tendencia
+    techos: True si las tendencias son techos, False si son pisos
+    desde: primera fila para la que se resumen las tendencias (las anteriores solo acumulan pasadas y pruebas)
+    bloque: cantidad de filas que se evalúan juntas (acota la memoria a bloque x picos)
+    devuelve_estado: si es True también devuelve las pasadas y pruebas acumuladas de cada tendencia al final de la serie
+    
+Returns:
+    array (filas x 5) con, para cada fila a partir de 'desde': número de pruebas del vivo más probado, precio proyectado del vivo más probado, del vivo más cercano y del muerto más cercano, y pendiente del vivo más probado
+"""
+def _tendencias_picos(close, pos, pendientes, lags, techos=True, desde=0, bloque=512, devuelve_estado=False):
+  """Proyecta todas las tendencias en arrays y resume, fila por fila, las vivas y las muertas."""
+  salida, nu_pass, nu_prueba = _recorre_tendencias(close, close[pos], pendientes, pos + lags, lags, techos, desde, np.zeros(len(pos)), np.zeros(len(pos)), bloque)
+  return (salida, nu_pass, nu_prueba) if devuelve_estado else salida
+
+def _recorre_tendencias(close, y_start, pendientes, inicio, lags, techos, desde, nu_pass, nu_prueba, bloque=512, origen=0):
+  """
+  Recorre las filas de close (close[i] es la fila origen + i) acumulando pasadas y pruebas desde nu_pass / nu_prueba y resume las que van desde 'desde'.
+  Con origen y el estado de un tramo anterior sigue una serie por tramos (indicators_stream.TendenciasAT.actualiza_bloque)
+  """
+  filas = origen + len(close)
+  salida = np.full((len(close), 5), np.nan)
+  if len(y_start) == 0:
+    return salida, nu_pass, nu_prueba
+  # Las filas anteriores a 'desde' solo importan por el estado que dejan: se recorren desde el primer inicio de tendencia
+  inicio_bloques = max(min(inicio.min(), desde), origen)
+  reporta(filas_recorridas=max(filas - inicio_bloques, 0))
+  for comienzo in range(inicio_bloques, filas, bloque):
+    t = np.arange(comienzo, min(comienzo + bloque, filas))
+    c = close[t - origen][:, None]
+    proy, pasa, prueba = _proyecta_tendencias(c, t, y_start, pendientes, inicio, lags, techos)
+
+    # Veces en las que cada tendencia fue superada y probada, acumuladas desde el primer bloque
+    if t[-1] < desde:
+      nu_pass = nu_pass + pasa.sum(axis=0)
+      nu_prueba = nu_prueba + prueba.sum(axis=0)
+      continue
+    acum_pass = nu_pass + np.cumsum(pasa, axis=0)
+    acum_prueba = nu_prueba + np.cumsum(prueba, axis=0)
+    nu_pass = acum_pass[-1]
+    nu_prueba = acum_prueba[-1]
+
+    evalua = t >= desde
+    if evalua.any():
+      salida[t[evalua] - origen] = _resume_tendencias(c[evalua], proy[evalua], acum_pass[evalua], acum_prueba[evalua], pendientes)
+  return salida, nu_pass, nu_prueba
+
+def _proyecta_tendencias(c, t, y_start, pendientes, inicio, lags, techos):
+  """Precio proyectado de cada tendencia en las filas t (nulo hasta el día en el que confirmamos que nació) y si ese día la superó o la probó."""
+  proy = (y_start + pendientes*lags) + pendientes*(t[:, None] - inicio)
+  proy[t[:, None] < inicio] = np.nan
+  if techos:
+    pasa = c > proy*1.005
+  else:
+    pasa = c < proy*0.995
+  prueba = (c > proy*0.995) & (c < proy*1.005)
+  return proy, pasa, prueba
+
+def _resume_tendencias(c, proy, acum_pass, acum_prueba, pendientes):
+  """Elige, en cada fila, el vivo más probado, el vivo más cercano y el muerto más cercano (ante empates, el pico más antiguo)."""
+  filas = np.arange(len(c))
+  muerto = acum_pass > 5
+  vivo = ~muerto & ~np.isnan(proy)
+  dist = np.abs(c - proy)
+
+  pruebas_vivo = np.where(~muerto & (acum_prueba > 0), acum_prueba, -1)
+  i_probado = pruebas_vivo.argmax(axis=1)
+  hay_probado = pruebas_vivo[filas, i_probado] > 0
+  i_vivo = np.where(vivo, dist, np.inf).argmin(axis=1)
+  hay_vivo = vivo.any(axis=1)
+  i_muerto = np.where(muerto, dist, np.inf).argmin(axis=1)
+  hay_muerto = muerto.any(axis=1)
+
+  resumen = np.full((len(c), 5), np.nan)
+  resumen[:, 0] = np.where(hay_probado, acum_prueba[filas, i_probado], np.nan)
+  resumen[:, 1] = np.where(hay_probado, proy[filas, i_probado], np.nan)
+  resumen[:, 2] = np.where(hay_vivo, proy[filas, i_vivo], np.nan)
+  resumen[:, 3] = np.where(hay_muerto, proy[filas, i_muerto], np.nan)
+  resumen[:, 4] = np.where(hay_probado, pendientes[i_probado], np.nan)
+  return resumen
+
+"""
+DETECCIÓN DE PICOS
+Params: 
+    data: pandas DataFrame
+    lista_lags: lista de lags (días antes y días después que no debe superarlo para considerar que un pico fue real)
+    close_col: the name of the CLOSE values column
+    
+Returns:
+    diccionario {lags: {'techos': posiciones, 'pisos': posiciones}} con las filas (posicionales) de cada pico, sin agregar columnas a 'data'
+"""
+@instrumenta
+def detecta_picos(data, lista_lags, close_col='<CLOSE>'):
+  """Detecta techos y pisos para todos los lags con máximos y mínimos deslizantes O(N), redondeando los precios una sola vez."""
+  close = data[close_col].values.astype(float)
+  redondeado = np.round(close, 2)
+  filas = len(close)
+  no_nulos = np.concatenate([[0], np.cumsum(~np.isnan(redondeado))])
+  t = np.arange(filas)
+
+  picos = {}
+  for lags in lista_lags:
+    # Un pico necesita al menos un precio conocido antes y otro después (como el max de pandas, ignora nulos)
+    hay_antes = no_nulos[t] - no_nulos[np.maximum(t - lags, 0)] > 0
+    hay_despues = no_nulos[np.minimum(t + lags + 1, filas)] - no_nulos[t + 1] > 0
+    maxb, maxf = _extremos_deslizantes(redondeado, lags)
+    minb, minf = _extremos_deslizantes(-redondeado, lags)
+    maxb, maxf, minb, minf = np.round(maxb, 2), np.round(maxf, 2), np.round(-minb, 2), np.round(-minf, 2)
+    techos = hay_antes & hay_despues & (close > maxb) & (close > maxf)
+    pisos = hay_antes & hay_despues & (close < minb) & (close < minf)
+    picos[lags] = {'techos': np.flatnonzero(techos), 'pisos': np.flatnonzero(pisos)}
+  return picos
+
+def _extremos_deslizantes(x, lags):
+  """Máximo de los 'lags' valores anteriores y de los 'lags' posteriores a cada fila (van Herk / Gil-Werman, nulos ignorados)."""
+  filas = len(x)
+  relleno = np.full(lags, -np.inf)
+  x = np.concatenate([relleno, np.where(np.isnan(x), -np.inf, x), relleno])
+  sobrante = (-len(x)) % lags
+  bloques = np.concatenate([x, np.full(sobrante, -np.inf)]).reshape(-1, lags)
+  prefijo = np.maximum.accumulate(bloques, axis=1).ravel()
+  sufijo = np.maximum.accumulate(bloques[:, ::-1], axis=1)[:, ::-1].ravel()
+  inicio = np.arange(len(x) - lags + 1)
+  ventana = np.maximum(sufijo[inicio], prefijo[inicio + lags - 1])  # máximo de x[i : i+lags]
+  return ventana[:filas], ventana[lags + 1:lags + 1 + filas]
 
 """
 ANALISIS TÉCNICO
@@ -111,167 +391,121 @@ Params:
     lags: días antes y días después que no debe superarlo para considerar que un pico fue real
     close_col: the name of the CLOSE values column
     date_col: the name of the FC values column
+    ultimas_filas: si se indica, solo calcula las columnas para las últimas N filas (las anteriores quedan nulas). Los picos de toda la historia se siguen usando como estado, sirve para predecir sin reconstruir la historia completa
+    picos: resultado de detecta_picos para reutilizar la detección entre varios lags (si no se pasa, se detectan acá), o de estado_AT_tendencias sobre las primeras filas de data:
+        con ese estado solo se detectan picos y se recorren tendencias desde donde termina, así que con ultimas_filas el costo no depende del largo de la historia
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
     
 Returns:
     copy of 'data' DataFrame con columnas de análisis técnico
 """
-def calcula_AT_tendencias(data, lags, close_col='<CLOSE>', date_col='<FC>'):
+@instrumenta
+def calcula_AT_tendencias(data, lags, close_col='<CLOSE>', date_col='<FC>', ultimas_filas=None, picos=None, return_new_only=False, compact=False):
   
-  # Construye las columnas para determinar si es un pico
-  i = 1
-  while i < (lags+1):
-      colname = 'p%sb' % (i)                                                  
-      data[colname] = round(data[close_col].shift(i),2)
-      j = i * -1
-      colname = 'p%sf' % (-j)                                                  
-      data[colname] = round(data[close_col].shift(j),2)
-      i = i + 1
-
-  # Determina si es un pico  
-  data['maxb'] = round(data.filter(regex=(".*b")).max(axis=1),2)
-  data['maxf']= round(data.filter(regex=(".*f")).max(axis=1),2)
-  data['minb'] = round(data.filter(regex=(".*b")).min(axis=1),2)
-  data['minf'] = round(data.filter(regex=(".*f")).min(axis=1),2)
-  data['T'] = np.where((data[close_col]>data['maxb']) & (data[close_col]>data['maxf']), 1, 0)
-  data['P'] = np.where((data[close_col]<data['minb']) & (data[close_col]<data['minf']), 1, 0)
-
-  techos = data[(data['T']==1)].copy()
-  techos['m'] = (techos[close_col].shift(1) - techos[close_col])/(techos[date_col].shift(1) - techos[date_col]).dt.days
-  techos.name = 'techos'
-  pisos = data[(data['P']==1)].copy()
-  pisos['m'] = (pisos[close_col].shift(1) - pisos[close_col])/(pisos[date_col].shift(1) - pisos[date_col]).dt.days
-  pisos.name = 'pisos'
-  data_list = [techos, pisos]
-
-  for data_picos in data_list:  # En cada data (techos y pisos)
-    name = data_picos.name
-    dias = len(data)
-    print(data_picos.name, " - Número de picos: ", data_picos.iloc[1:].shape[0])
-    iterrow_actual = 1
-    for index, row in data_picos.iloc[1:].iterrows(): # Para cada pico detectado (fila del data) a partir del segundo (porque el primero no tiene anterior, no tiene tendencia)
-      print(data_picos.name, ": Desarrollo el pico ", iterrow_actual)
-      iterrow_actual = iterrow_actual+1
-      y_start = row[close_col]
-      pendiente = row['m']
-      if (dias < np.where(data[date_col]==row[date_col])[0] + lags):
-        continue    
-      serie = [] # Crea la serie que va a contener el precio proyectado
-      serie = np.append(serie, np.repeat(np.nan, (np.where(data[date_col]==row[date_col])[0] + lags))) # Appendea nulos hasta el día en el que confirmamos que nació una tendencia
-      i = np.where(data[date_col]==row[date_col])[0] + lags
-      while (i < dias):
-        dia = i - (np.where(data[date_col]==row[date_col])[0] + lags)
-        serie = np.append(serie, (y_start + pendiente*lags) + pendiente*dia)
-        i = i + 1 # Appendea el precio proyectado hasta el final
-
-      colname = '%s_%s_proy' % (name, index)  # Precio proyectado
-      data[colname] = serie # Construye la columna de toda la serie
-
-      # Construyo columna con veces en la que el pico fue superado
-      colname_pass = '%s_%s_pass' % (name, index) # Pico pasado
-      if name == 'techos':
-        data[colname_pass] = np.where(data[close_col]>(data[colname])*1.005, 1, 0)
-      elif name == 'pisos':
-        data[colname_pass] = np.where(data[close_col]<(data[colname])*0.995, 1, 0)
-      data[colname_pass] = data[colname_pass].cumsum()
-
-      # Construyo columna con veces en la que el pico fue probado
-      colname_prueba = '%s_%s_prueba' % (name, index)  
-      data[colname_prueba] = np.where((data[close_col]>data[colname]*0.995)&(data[close_col]<data[colname]*1.005), 1, 0)
-      data[colname_prueba] = data[colname_prueba].cumsum()
-
-      # Construyo columna con pendiente del pico
-      colname_pendiente = '%s_%s_pendiente' % (name, index)  
-      data[colname_pendiente] = row['m']
-
-      # Creo la combinacion y elimino cada uno
-      colname_comb = '%s_%s' % (name, index)
-      data[colname_comb] = data[[colname, colname_pass, colname_prueba, colname_pendiente]].values.tolist()
-      del data[colname]
-      del data[colname_pass]
-      del data[colname_prueba]
-      del data[colname_pendiente]
-
-  # Creo el objeto por cada techo o piso individual
-  names_techos = data.filter(regex=("(techos)(.*)")).columns
-  names_pisos = data.filter(regex=("(pisos)(.*)")).columns
-
-  print("Filas: ", data.shape[0])
-  j = 0
-  for index, row in data.iterrows():  # Por cada fila del data original (por cada precio)
-    j = j + 1
-    if (j % 1000 == 0):
-      print("Voy por la fila ", j)
-
-    # Genero las rows vacías con las variables agregadas
-    nu_pruebas_techo_vivo_mas_probado = np.nan    
-    precio_proyectado_techo_vivo_mas_probado = np.nan
-    precio_proyectado_techo_vivo_mas_cercano = np.nan
-    precio_proyectado_techo_muerto_mas_cercano = np.nan
-    tendencia_techo_vivo_mas_probado = np.nan
-
-    nu_pruebas_piso_vivo_mas_probado = np.nan
-    precio_proyectado_piso_vivo_mas_probado = np.nan
-    precio_proyectado_piso_vivo_mas_cercano = np.nan
-    precio_proyectado_piso_muerto_mas_cercano = np.nan
-    tendencia_piso_vivo_mas_probado = np.nan
-
-    # Voy a recorrer cada tendencia proyectada para definir cuáles van, en caso de que corresponda lo asigno a estas variables agregadas
-
-    i = 0
-    while i < len(row.index): # Por cada uno de los picos de los que se puede armar tendencia
-      if (row.index[i] in names_techos):  # Si es un techo
-        if row[i][1]>5: # Si está muerto
-          if abs(row[close_col]-row[i][0]) < abs(row[close_col]-precio_proyectado_techo_muerto_mas_cercano) or np.isnan(precio_proyectado_techo_muerto_mas_cercano): # Si está muerto y proyecta precio más cercano que el actual
-            precio_proyectado_techo_muerto_mas_cercano = row[i][0]
-            
-        else: # Si está vivo
-          if row[i][2] > nu_pruebas_techo_vivo_mas_probado or (np.isnan(nu_pruebas_techo_vivo_mas_probado) and row[i][2]>0): # Si fue más probado que el actual
-            nu_pruebas_techo_vivo_mas_probado = row[i][2]
-            precio_proyectado_techo_vivo_mas_probado = row[i][0]
-            tendencia_techo_vivo_mas_probado = row[i][3]
-
-          if (np.isnan(precio_proyectado_techo_vivo_mas_cercano)) or (abs(row[close_col]-row[i][0]) < abs(row[close_col]-precio_proyectado_techo_vivo_mas_cercano)): # Si, sin haber muerto, proyecta un techo más alto que el actual
-            precio_proyectado_techo_vivo_mas_cercano = row[i][0]
-
-      elif (row.index[i] in names_pisos):
-        if row[i][1]>5: # Si está muerto
-          if abs(row[close_col]-row[i][0]) < abs(row[close_col]-precio_proyectado_piso_muerto_mas_cercano) or np.isnan(precio_proyectado_piso_muerto_mas_cercano): # Si proyecta precio más cercano que el actual
-            precio_proyectado_piso_muerto_mas_cercano = row[i][0]
-            
-        else: # Si está vivo
-          if row[i][2] > nu_pruebas_piso_vivo_mas_probado or (np.isnan(nu_pruebas_piso_vivo_mas_probado) and row[i][2]>0): # Si fue más probado que el actual
-            nu_pruebas_piso_vivo_mas_probado = row[i][2]
-            precio_proyectado_piso_vivo_mas_probado = row[i][0]
-            tendencia_piso_vivo_mas_probado = row[i][3]
-
-          if (np.isnan(precio_proyectado_piso_vivo_mas_cercano)) or (abs(row[close_col]-row[i][0]) < abs(row[close_col]-precio_proyectado_piso_vivo_mas_cercano)): # Si, sin haber muerto, proyecta un techo más alto que el actual
-            precio_proyectado_piso_vivo_mas_cercano = row[i][0]
-      i = i + 1
-        
-    data.loc[index,'nu_pruebas_techo_vivo_mas_probado_'f"{lags}"] = nu_pruebas_techo_vivo_mas_probado
-    data.loc[index,'precio_proyectado_techo_vivo_mas_probado_'f"{lags}"] = (precio_proyectado_techo_vivo_mas_probado - row[close_col])/row[close_col]
-    data.loc[index,'precio_proyectado_techo_vivo_mas_cercano_'f"{lags}"] = (precio_proyectado_techo_vivo_mas_cercano - row[close_col])/row[close_col]
-    data.loc[index,'precio_proyectado_techo_muerto_mas_cercano_'f"{lags}"] = (precio_proyectado_techo_muerto_mas_cercano - row[close_col])/row[close_col]
-    data.loc[index,'tendencia_techo_vivo_mas_probado_'f"{lags}"] = tendencia_techo_vivo_mas_probado/row[close_col]
-
-    data.loc[index,'nu_pruebas_piso_vivo_mas_probado_'f"{lags}"] = nu_pruebas_piso_vivo_mas_probado
-    data.loc[index,'precio_proyectado_piso_vivo_mas_probado_'f"{lags}"] = (precio_proyectado_piso_vivo_mas_probado - row[close_col])/row[close_col]
-    data.loc[index,'precio_proyectado_piso_vivo_mas_cercano_'f"{lags}"] = (precio_proyectado_piso_vivo_mas_cercano - row[close_col])/row[close_col]
-    data.loc[index,'precio_proyectado_piso_muerto_mas_cercano_'f"{lags}"] = (precio_proyectado_piso_muerto_mas_cercano - row[close_col])/row[close_col]
-    data.loc[index,'tendencia_piso_vivo_mas_probado_'f"{lags}"] = tendencia_piso_vivo_mas_probado/row[close_col]
-
-  # Elimino todas las que construí excepto estas
-  i = 1
-  while i < (lags+1):
-      colname = 'p%sb' % (i)                                                  
-      data = data.drop(colname, axis=1)
-      j = i * -1
-      colname = 'p%sf' % (-j)                                                  
-      data = data.drop(colname, axis=1)
-      i = i + 1
-
-  ultimas_drop = ['maxb', 'maxf', 'minb', 'minf', 'T', 'P']
-  data = data.drop(ultimas_drop, axis=1)
-  data = data.drop(names_techos, axis=1)
-  data = data.drop(names_pisos, axis=1)
-  return data
+  # Determina los picos (techos y pisos) con la ventana de lags
+  if picos is None or lags not in picos:
+    picos = detecta_picos(data, [lags], close_col)
+  close = data[close_col].values.astype(float)
+  filas = len(data)
+  desde = 0 if ultimas_filas is None else max(filas - ultimas_filas, 0)
+  estado = picos[lags] if 'filas' in picos[lags] else None
+  if estado is not None and desde < estado['filas']:
+    raise ValueError("El estado de picos cubre las primeras %s filas: solo se pueden calcular las siguientes (ultimas_filas <= %s)" % (estado['filas'], filas - estado['filas']))
+  origen = 0 if estado is None else estado['filas']
+  nuevos = picos[lags] if estado is None else _picos_nuevos(data, lags, close_col, origen)
+
+  resultados = {}
+  for name in ('techos', 'pisos'):  # En cada tipo de pico (techos y pisos)
+    # Con estado, las tendencias nuevas nacen del último pico del estado o de los nuevos
+    pos = nuevos[name] if estado is None else np.concatenate([estado[name][-1:], nuevos[name]]).astype(np.int64)
+    reporta(**{'picos_' + name: max(len(pos) - 1, 0)})
+    pk = data.iloc[pos]
+    m = ((pk[close_col].shift(1) - pk[close_col])/(pk[date_col].shift(1) - pk[date_col]).dt.days).values
+    # El primer pico no tiene anterior (no tiene tendencia) y los que se confirman después del final no proyectan nada
+    validos = np.arange(len(pos)) >= 1
+    validos &= (pos + lags) <= filas
+    reporta(**{'tendencias_' + name: int(validos.sum())})
+    pos, m = pos[validos], m[validos]
+    nu_pass, nu_prueba = np.zeros(len(pos)), np.zeros(len(pos))
+    if estado is not None:
+      anteriores = estado[name][1:]
+      pos, m = np.concatenate([anteriores, pos]), np.concatenate([estado['pendientes'][name], m])
+      nu_pass, nu_prueba = np.concatenate([estado['pasadas'][name], nu_pass]), np.concatenate([estado['pruebas'][name], nu_prueba])
+    resultados[name] = np.full((filas, 5), np.nan)
+    resultados[name][origen:] = _recorre_tendencias(close[origen:], close[pos], m, pos + lags, lags, name == 'techos', desde, nu_pass, nu_prueba, origen=origen)[0]
+
+  # Un solo bloque de 10 columnas: pruebas tal cual, precios proyectados y pendiente relativos al cierre
+  bloque = np.empty((filas, 10))
+  for i, name in enumerate(('techos', 'pisos')):
+    resultado = resultados[name]
+    bloque[:, 5*i] = resultado[:, 0]
+    bloque[:, 5*i + 1:5*i + 4] = (resultado[:, 1:4] - close[:, None])/close[:, None]
+    bloque[:, 5*i + 4] = resultado[:, 4]/close
+
+  nombres = []
+  for tipo in ('techo', 'piso'):
+    nombres += ['nu_pruebas_%s_vivo_mas_probado_%s' % (tipo, lags),
+                'precio_proyectado_%s_vivo_mas_probado_%s' % (tipo, lags),
+                'precio_proyectado_%s_vivo_mas_cercano_%s' % (tipo, lags),
+                'precio_proyectado_%s_muerto_mas_cercano_%s' % (tipo, lags),
+                'tendencia_%s_vivo_mas_probado_%s' % (tipo, lags)]
+  return agrega_columnas(data, dict(zip(nombres, bloque.T)), return_new_only, compact)
+
+def _picos_nuevos(data, lags, close_col, origen):
+  """Picos de las filas que el estado no confirmó (desde origen - lags): se detectan sobre las filas desde origen - 2*lags, que ya tienen toda su ventana anterior."""
+  inicio = max(origen - 2*lags, 0)
+  picos = detecta_picos(data.iloc[inicio:], [lags], close_col)[lags]
+  return {name: pos[pos + inicio >= origen - lags] + inicio for name, pos in picos.items()}
+
+"""
+ESTADO DEL ANALISIS TÉCNICO
+Params: 
+    data: pandas DataFrame con la historia
+    lista_lags: lags para los que se arma el estado
+    close_col: the name of the CLOSE values column
+    date_col: the name of the FC values column
+    
+Returns:
+    diccionario {lags: {'techos': posiciones, 'pisos': posiciones, 'filas': len(data), 'pendientes', 'pasadas', 'pruebas': {'techos': array, 'pisos': array}}} con los picos ya confirmados
+    (los que tienen su ventana posterior completa) y la pendiente, las pasadas y las pruebas acumuladas de cada tendencia. Se pasa como picos a calcula_AT_tendencias sobre la misma historia con filas nuevas
+"""
+def estado_AT_tendencias(data, lista_lags=[360, 120, 90, 60, 30, 15, 8, 4], close_col='<CLOSE>', date_col='<FC>'):
+  """Una sola detección para todos los lags y el mismo motor de tendencias, recorriendo toda la historia sin resumir ninguna fila."""
+  close = data[close_col].values.astype(float)
+  filas = len(data)
+  estado = {}
+  for lags, picos in detecta_picos(data, lista_lags, close_col).items():
+    estado[lags] = {'filas': filas, 'pendientes': {}, 'pasadas': {}, 'pruebas': {}}
+    for name, pos in picos.items():
+      pos = pos[pos + lags <= filas - 1]
+      pk = data.iloc[pos]
+      m = ((pk[close_col].shift(1) - pk[close_col])/(pk[date_col].shift(1) - pk[date_col]).dt.days).values[1:]
+      _, nu_pass, nu_prueba = _tendencias_picos(close, pos[1:], m, lags, techos=(name == 'techos'), desde=filas, devuelve_estado=True)
+      estado[lags][name] = pos
+      estado[lags]['pendientes'][name], estado[lags]['pasadas'][name], estado[lags]['pruebas'][name] = m, nu_pass, nu_prueba
+  return estado
+
+"""
+ANALISIS TÉCNICO PARA VARIOS LAGS
+Params: 
+    data: pandas DataFrame
+    lista_lags: lista de lags para los que se calculan las columnas de análisis técnico
+    close_col: the name of the CLOSE values column
+    date_col: the name of the FC values column
+    ultimas_filas: ver calcula_AT_tendencias
+    picos: resultado de estado_AT_tendencias sobre las primeras filas de data (ver calcula_AT_tendencias). Si no se pasa, los picos de todos los lags se detectan acá
+    return_new_only: si es True devuelve solo las columnas nuevas (DataFrame con el índice de data) para que quien llama las concatene
+    compact: si es True las columnas nuevas son float32 / el entero más chico que alcanza (contrato de precisión en modules/columnas.py)
+    
+Returns:
+    copy of 'data' DataFrame con columnas de análisis técnico para cada lag
+"""
+@instrumenta
+def calcula_AT_tendencias_lags(data, lista_lags=[360, 120, 90, 60, 30, 15, 8, 4], close_col='<CLOSE>', date_col='<FC>', ultimas_filas=None, picos=None, return_new_only=False, compact=False):
+  """Detecta los picos de todos los lags en una pasada y reutiliza esas posiciones en el cálculo de tendencias de cada lag."""
+  if picos is None:
+    picos = detecta_picos(data, lista_lags, close_col)
+  bloques = [calcula_AT_tendencias(data, lags, close_col, date_col, ultimas_filas, picos, return_new_only=True) for lags in lista_lags]
+  nuevas = {nombre: columna.values for bloque in bloques for nombre, columna in bloque.items()}
+  return agrega_columnas(data, nuevas, return_new_only, compact)
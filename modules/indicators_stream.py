@@ -0,0 +1,1263 @@
+"""
+Indicadores FJF e indicators_foreign en streaming (una barra por vez)
+"""
+
+import operator
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from modules.indicators_mios import _pares_historia, detecta_picos, _tendencias_picos, _recorre_tendencias
+from modules.indicators_foreign import _true_range, on_balance_volume, price_volume_trend, acc_dist, ease_of_movement, negative_volume_index, positive_volume_index, williams_ad
+
+"""
+AMPLITUD (streaming)
+Params:
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    close_col: the name of the CLOSE values column
+    nombre: nombre de la columna nueva, como en calcula_amplitud
+
+Returns:
+    actualiza(barra) devuelve un diccionario con 'amp_std' (o nombre) para la barra nueva, igual que calcula_amplitud
+"""
+class Amplitud:
+  """Versión por barra de calcula_amplitud (no necesita estado)."""
+
+  def __init__(self, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', nombre='amp_std'):
+    self.high_col = high_col
+    self.low_col = low_col
+    self.close_col = close_col
+    self.nombre = nombre
+
+  def semilla(self, data):
+    return self
+
+  def actualiza(self, barra):
+    return {self.nombre: (barra[self.high_col] - barra[self.low_col])/barra[self.close_col]}
+
+"""
+PRECIO CONTRA EL MERVAL (streaming)
+Params:
+    merval_col: the name of the MERVAL CLOSE values column
+    close_col: the name of the CLOSE values column
+
+Returns:
+    actualiza(barra) devuelve un diccionario con 'pc_merval' para la barra nueva, igual que calcula_pc_merval
+"""
+class PcMerval:
+  """Versión por barra de calcula_pc_merval (no necesita estado)."""
+
+  def __init__(self, merval_col='<MERVAL>', close_col='<CLOSE>'):
+    self.merval_col = merval_col
+    self.close_col = close_col
+
+  def semilla(self, data):
+    return self
+
+  def actualiza(self, barra):
+    return {'pc_merval': np.float64(barra[self.close_col])/np.float64(barra[self.merval_col])}
+
+"""
+ESTANDARIZACIÓN DEL VOLUMEN (streaming)
+Params:
+    vol_col: the name of the VOLUME values column
+
+Returns:
+    actualiza(barra) devuelve un diccionario con 'vol_std' para la barra nueva, estandarizado con la media y el desvío de toda la historia vista hasta esa barra (lo mismo que estandariza_volumen sobre la historia hasta ese día)
+"""
+class VolumenEstandarizado:
+  """Mantiene media y desvío del volumen con el algoritmo de Welford."""
+
+  def __init__(self, vol_col='<VOL>'):
+    self.vol_col = vol_col
+    self.n = 0
+    self.media = 0.
+    self.m2 = 0.
+
+  def semilla(self, data):
+    vol = data[self.vol_col].dropna().values.astype(float)
+    self.n = len(vol)
+    self.media = vol.mean() if self.n else 0.
+    self.m2 = ((vol - self.media)**2).sum()
+    return self
+
+  def actualiza(self, barra):
+    vol = float(barra[self.vol_col])
+    if not np.isnan(vol):
+      self.n = self.n + 1
+      delta = vol - self.media
+      self.media = self.media + delta/self.n
+      self.m2 = self.m2 + delta*(vol - self.media)
+    std = np.sqrt(self.m2/(self.n - 1)) if self.n > 1 else np.nan
+    return {'vol_std': (vol - self.media)/std}
+
+"""
+BUFFER CIRCULAR
+Params:
+    largo: cantidad de valores que se guardan (la ventana más grande)
+
+Returns:
+    buffer con los últimos 'largo' valores, ordenados como lags (lag 1 primero, nulos si todavía no hay historia)
+"""
+class _BufferCircular:
+  """Ring buffer de largo fijo: agregar es O(1) y leer los lags no copia la historia."""
+
+  def __init__(self, largo):
+    self.largo = largo
+    self.valores = np.full(largo, np.nan)
+    self.pos = 0
+    self._orden = np.arange(largo)
+
+  def agrega(self, valor):
+    self.valores[self.pos] = valor
+    self.pos = (self.pos + 1) % self.largo
+
+  def lags(self):
+    return self.valores[(self.pos - 1 - self._orden) % self.largo]
+
+"""
+CANALIDAD DEL CIERRE (streaming)
+Params:
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    close_col: the name of the CLOSE values column
+    lista_ventanas: ventanas (en días) de los conteos
+
+Returns:
+    actualiza(barra) devuelve un diccionario con las columnas de calcula_canalidad_y para la barra nueva
+"""
+class CanalidadY:
+  """Cuenta sobre un buffer circular con los últimos cierres (tantos como la ventana más grande)."""
+
+  def __init__(self, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', lista_ventanas=[5, 30, 90, 180]):
+    self.high_col = high_col
+    self.low_col = low_col
+    self.close_col = close_col
+    self.lista_ventanas = lista_ventanas
+    self.buffer = _BufferCircular(max(lista_ventanas))
+
+  def semilla(self, data):
+    self.buffer = _BufferCircular(max(self.lista_ventanas))
+    for valor in data[self.close_col].values[-self.buffer.largo:]:
+      self.buffer.agrega(valor)
+    return self
+
+  def actualiza(self, barra):
+    lags = self.buffer.lags()
+    high, low, close = barra[self.high_col], barra[self.low_col], barra[self.close_col]
+    maxmin = np.cumsum((lags < high) & (lags > low))
+    cinco_pc = np.cumsum((lags < (close * 1.05)) & (lags > (close * 0.95)))
+    self.buffer.agrega(close)
+
+    fila = {}
+    for ventana in self.lista_ventanas:
+      fila["nu_dias_y_entre_max_min_%s" % (ventana)] = int(maxmin[ventana - 1])
+      fila["nu_dias_y_entre_5pc_%s" % (ventana)] = int(cinco_pc[ventana - 1])
+    return fila
+
+"""
+CANALIDAD DEL HISTOGRAMA MACD (streaming)
+Params:
+    histog_col: the name of the HISTOG values column
+    lista_ventanas: ventanas (en días) de los conteos
+
+Returns:
+    actualiza(barra) devuelve un diccionario con las columnas de calcula_canalidad_histog_macd para la barra nueva
+"""
+class CanalidadHistogMacd:
+  """Cuenta sobre un buffer circular con los últimos valores del histograma."""
+
+  def __init__(self, histog_col='macd_histog', lista_ventanas=[5, 30, 90, 180]):
+    self.histog_col = histog_col
+    self.lista_ventanas = lista_ventanas
+    self.buffer = _BufferCircular(max(lista_ventanas))
+    # El lag 1 se compara contra +-5% del histograma y el resto contra +-50%, como en calcula_canalidad_histog_macd
+    self.factor_sup = np.full(self.buffer.largo, 1.50)
+    self.factor_inf = np.full(self.buffer.largo, 0.50)
+    self.factor_sup[0] = 1.05
+    self.factor_inf[0] = 0.95
+
+  def semilla(self, data):
+    self.buffer = _BufferCircular(max(self.lista_ventanas))
+    for valor in data[self.histog_col].values[-self.buffer.largo:]:
+      self.buffer.agrega(valor)
+    return self
+
+  def actualiza(self, barra):
+    lags = self.buffer.lags()
+    h = barra[self.histog_col]
+    entre_5pc = np.cumsum((lags < (h * self.factor_sup)) & (lags > (h * self.factor_inf)))
+    positivo = np.cumsum(lags > 0)
+    negativo = np.cumsum(lags < 0)
+    mismo_signo = np.cumsum(((lags > 0) & (h > 0)) | ((lags < 0) & (h < 0)))
+    self.buffer.agrega(h)
+
+    fila = {}
+    for ventana in self.lista_ventanas:
+      fila["nu_dias_histog_entre_5pc_%s" % (ventana)] = int(entre_5pc[ventana - 1])
+      fila["nu_dias_histog_positivo_%s" % (ventana)] = int(positivo[ventana - 1])
+      fila["nu_dias_histog_negativo_%s" % (ventana)] = int(negativo[ventana - 1])
+      fila["nu_dias_histog_mismo_signo_%s" % (ventana)] = int(mismo_signo[ventana - 1])
+    return fila
+
+"""
+HISTORIA (streaming)
+Params:
+    columnas: columnas de las que se calcula la variación
+    lags: se calculan los lags 1 a lags-1 de cada columna
+    pares: lista de (columna, lag), como en calcula_historia
+
+Returns:
+    actualiza(barra) devuelve las columnas 'var_<columna>_<lag>' de calcula_historia para la barra nueva
+"""
+class Historia:
+  """Un buffer circular (filas x columnas) con los últimos valores (tantos como el lag más grande): cada barra es una sola división de todos los pares."""
+
+  def __init__(self, columnas=None, lags=15, pares=None):
+    self.pares = _pares_historia(columnas, lags, pares)
+    self.largo = max([lag for _, lag in self.pares], default=1)
+    self.usadas = list(dict.fromkeys(columna for columna, _ in self.pares))
+    self.nombres = ['var_%s_%s' % par for par in self.pares]
+    self.j = np.array([self.usadas.index(columna) for columna, _ in self.pares], dtype=int)
+    self.lag = np.array([lag for _, lag in self.pares], dtype=int)
+    self._reinicia()
+
+  def _reinicia(self):
+    self.valores = np.full((self.largo, len(self.usadas)), np.nan)
+    self.pos = 0
+
+  def _agrega(self, fila):
+    self.valores[self.pos] = fila
+    self.pos = (self.pos + 1) % self.largo
+
+  def semilla(self, data):
+    self._reinicia()
+    for fila in data[self.usadas].to_numpy(dtype=float)[-self.largo:]:
+      self._agrega(fila)
+    return self
+
+  def actualiza(self, barra):
+    actual = np.array([barra[columna] for columna in self.usadas], dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      var = actual[self.j]/self.valores[(self.pos - self.lag) % self.largo, self.j] - 1
+    self._agrega(actual)
+    return dict(zip(self.nombres, var))
+
+def _tendencias_fila(close, t, tend, lags, techos):
+  """
+  _proyecta_tendencias y _resume_tendencias para una sola fila (la barra nueva de TendenciasAT.actualiza), con arrays de una dimensión: las mismas operaciones elemento a elemento
+  (mismo resultado bit a bit) con menos llamadas a numpy. Acumula las pasadas y pruebas de la fila en tend
+  """
+  pendientes = tend['pendientes']
+  proy = (tend['y_start'] + pendientes*lags) + pendientes*(t - tend['inicio'])
+  proy[t < tend['inicio']] = np.nan
+  arriba = proy*1.005
+  abajo = proy*0.995
+  nu_pass = tend['nu_pass'] = tend['nu_pass'] + (close > arriba if techos else close < abajo)
+  nu_prueba = tend['nu_prueba'] = tend['nu_prueba'] + ((close > abajo) & (close < arriba))
+
+  muerto = nu_pass > 5
+  dist = np.abs(close - proy)
+  resumen = np.full(5, np.nan)
+  pruebas_vivo = np.where(~muerto & (nu_prueba > 0), nu_prueba, -1)
+  i_probado = pruebas_vivo.argmax()
+  if pruebas_vivo[i_probado] > 0:
+    resumen[0] = nu_prueba[i_probado]
+    resumen[1] = proy[i_probado]
+    resumen[4] = pendientes[i_probado]
+  vivo = ~muerto & ~np.isnan(proy)
+  if vivo.any():
+    resumen[2] = proy[np.where(vivo, dist, np.inf).argmin()]
+  if muerto.any():
+    resumen[3] = proy[np.where(muerto, dist, np.inf).argmin()]
+  return resumen
+
+"""
+ANALISIS TÉCNICO (streaming)
+Params:
+    lags: días antes y días después que no debe superarlo para considerar que un pico fue real
+    close_col: the name of the CLOSE values column
+    date_col: the name of the FC values column
+
+Returns:
+    actualiza(barra) devuelve un diccionario con las diez columnas de calcula_AT_tendencias para la barra nueva. Un pico se confirma 'lags' barras después de ocurrido y desde esa barra su tendencia entra en la lista.
+    actualiza_bloque(data) hace lo mismo para varias barras de una vez (un array por columna), para seguir una serie larga por tramos
+"""
+class TendenciasAT:
+  """Mantiene la lista de tendencias (vivas y muertas) con sus pasadas y pruebas, y los últimos 2*lags+1 cierres para confirmar picos."""
+
+  def __init__(self, lags, close_col='<CLOSE>', date_col='<FC>'):
+    self.lags = lags
+    self.close_col = close_col
+    self.date_col = date_col
+    self._reinicia()
+
+  def _reinicia(self):
+    self.filas = 0
+    self.closes = deque(maxlen=2*self.lags + 1)
+    # Los mismos cierres redondeados a 2 decimales, como los compara detecta_picos
+    self.redondeados = deque(maxlen=2*self.lags + 1)
+    self.fechas = deque(maxlen=2*self.lags + 1)
+    self.tendencias = {}
+    for name in ('techos', 'pisos'):
+      self.tendencias[name] = {'ultimo_pico': None, 'y_start': np.zeros(0), 'pendientes': np.zeros(0),
+                               'inicio': np.zeros(0, dtype=np.int64), 'nu_pass': np.zeros(0), 'nu_prueba': np.zeros(0)}
+
+  def semilla(self, data):
+    """Arma el estado con toda la historia de una vez (mismo motor que calcula_AT_tendencias)."""
+    self._reinicia()
+    close = data[self.close_col].values.astype(float)
+    filas = len(close)
+    picos = detecta_picos(data, [self.lags], self.close_col)[self.lags]
+    for name in ('techos', 'pisos'):
+      # Solo los picos ya confirmados: los de las últimas 'lags' barras se confirman en actualiza
+      pos = picos[name][picos[name] + self.lags <= filas - 1]
+      if len(pos) == 0:
+        continue
+      pk = data.iloc[pos]
+      m = ((pk[self.close_col].shift(1) - pk[self.close_col])/(pk[self.date_col].shift(1) - pk[self.date_col]).dt.days).values
+      _, nu_pass, nu_prueba = _tendencias_picos(close, pos[1:], m[1:], self.lags, techos=(name == 'techos'), desde=filas, devuelve_estado=True)
+      self.tendencias[name] = {'ultimo_pico': (close[pos[-1]], pd.Timestamp(pk[self.date_col].iloc[-1])),
+                               'y_start': close[pos[1:]], 'pendientes': m[1:], 'inicio': pos[1:] + self.lags,
+                               'nu_pass': nu_pass, 'nu_prueba': nu_prueba}
+    self.filas = filas
+    self.closes.extend(close[-(2*self.lags + 1):])
+    self.redondeados.extend(np.round(close[-(2*self.lags + 1):], 2))
+    self.fechas.extend(pd.Timestamp(fecha) for fecha in data[self.date_col].values[-(2*self.lags + 1):])
+    return self
+
+  def _nuevo_pico(self, name, pos, valor, fecha):
+    """Lo mismo que _nuevos_picos con un solo pico, sin armar índices de fechas."""
+    tend = self.tendencias[name]
+    if tend['ultimo_pico'] is None:
+      tend['ultimo_pico'] = (valor, fecha)
+      return
+    anterior, fecha_anterior = tend['ultimo_pico']
+    tend['y_start'] = np.append(tend['y_start'], valor)
+    tend['pendientes'] = np.append(tend['pendientes'], (anterior - valor)/(fecha_anterior - fecha).days)
+    tend['inicio'] = np.append(tend['inicio'], pos + self.lags)
+    tend['nu_pass'] = np.append(tend['nu_pass'], 0.)
+    tend['nu_prueba'] = np.append(tend['nu_prueba'], 0.)
+    tend['ultimo_pico'] = (valor, fecha)
+
+  def _nuevos_picos(self, name, pos, valores, fechas):
+    """Agrega las tendencias de los picos confirmados (en orden): cada una nace del pico anterior, el último de la lista o el primero de estos."""
+    tend = self.tendencias[name]
+    if len(pos) == 0:
+      return
+    if tend['ultimo_pico'] is not None:
+      anteriores = np.concatenate([[tend['ultimo_pico'][0]], valores[:-1]])
+      fechas_anteriores = pd.DatetimeIndex([tend['ultimo_pico'][1]] + list(fechas[:-1]))
+    else:  # El primer pico no tiene anterior, no tiene tendencia
+      anteriores, fechas_anteriores = valores[:-1], pd.DatetimeIndex(list(fechas[:-1]))
+      tend['ultimo_pico'] = (valores[0], fechas[0])
+      pos, valores, fechas = pos[1:], valores[1:], fechas[1:]
+    if len(pos):
+      pendientes = (anteriores - valores)/np.asarray((fechas_anteriores - pd.DatetimeIndex(list(fechas))).days)
+      tend['y_start'] = np.concatenate([tend['y_start'], valores])
+      tend['pendientes'] = np.concatenate([tend['pendientes'], pendientes])
+      tend['inicio'] = np.concatenate([tend['inicio'], pos + self.lags])
+      tend['nu_pass'] = np.concatenate([tend['nu_pass'], np.zeros(len(pos))])
+      tend['nu_prueba'] = np.concatenate([tend['nu_prueba'], np.zeros(len(pos))])
+      tend['ultimo_pico'] = (valores[-1], fechas[-1])
+
+  def _confirma_pico(self):
+    """Revisa si la barra de hace 'lags' días fue un techo o un piso (ya tiene su ventana posterior completa)."""
+    candidato = self.filas - 1 - self.lags
+    if candidato < 1:
+      return
+    ventana = np.fromiter(self.redondeados, float, len(self.redondeados))
+    k = len(ventana) - 1 - self.lags
+    antes = ventana[:k]
+    despues = ventana[k + 1:]
+    # fmax / fmin ignoran los nulos como nanmax / nanmin: el resultado es nulo solo si son todos nulos
+    max_antes, max_despues, min_antes, min_despues = np.round([np.fmax.reduce(antes), np.fmax.reduce(despues), np.fmin.reduce(antes), np.fmin.reduce(despues)], 2)
+    if max_antes != max_antes or max_despues != max_despues:
+      return
+    valor = self.closes[k]
+    if (valor > max_antes) & (valor > max_despues):
+      self._nuevo_pico('techos', candidato, valor, self.fechas[k])
+    if (valor < min_antes) & (valor < min_despues):
+      self._nuevo_pico('pisos', candidato, valor, self.fechas[k])
+
+  def _avanza(self, close, redondeado, fecha):
+    """Suma el cierre de la barra nueva y confirma el pico de hace 'lags' barras. Devuelve la fila de la barra."""
+    self.closes.append(close)
+    self.redondeados.append(redondeado)
+    self.fechas.append(fecha)
+    self.filas = self.filas + 1
+    self._confirma_pico()
+    return self.filas - 1
+
+  def actualiza(self, barra):
+    close = float(barra[self.close_col])
+    t = self._avanza(close, np.round(close, 2), pd.Timestamp(barra[self.date_col]))
+
+    resumen = {}
+    for name in ('techos', 'pisos'):
+      tend = self.tendencias[name]
+      if len(tend['y_start']) == 0:
+        resumen[name] = np.full(5, np.nan)
+        continue
+      resumen[name] = _tendencias_fila(close, t, tend, self.lags, techos=(name == 'techos'))
+    return self._columnas(close, resumen)
+
+  def actualiza_bloque(self, data):
+    """
+    Igual que llamar actualiza con cada fila de data, pero vectorizado: los picos que se confirman en el bloque salen de detecta_picos sobre los últimos cierres más el bloque
+    (solo los que ya tienen su ventana posterior completa) y las tendencias se recorren con el mismo motor que calcula_AT_tendencias, partiendo de las pasadas y pruebas acumuladas
+    """
+    close = data[self.close_col].values.astype(float)
+    fechas = [pd.Timestamp(fecha) for fecha in data[self.date_col].values]
+    filas = len(close)
+    cola = np.array(self.closes, dtype=float)
+    origen = self.filas - len(cola)
+    todos = np.concatenate([cola, close])
+    todas_fechas = list(self.fechas) + fechas
+    picos = detecta_picos(pd.DataFrame({self.close_col: todos}), [self.lags], self.close_col)[self.lags]
+
+    resumen = {}
+    for name in ('techos', 'pisos'):
+      # Los de antes de self.filas - lags ya se confirmaron, y los de las últimas 'lags' filas todavía no tienen su ventana posterior
+      locales = picos[name][(picos[name] + origen + self.lags >= self.filas) & (picos[name] + origen + self.lags <= self.filas + filas - 1)]
+      self._nuevos_picos(name, locales + origen, todos[locales], [todas_fechas[i] for i in locales])
+      tend = self.tendencias[name]
+      resumen[name], tend['nu_pass'], tend['nu_prueba'] = _recorre_tendencias(close, tend['y_start'], tend['pendientes'], tend['inicio'], self.lags, name == 'techos',
+                                                                              self.filas, tend['nu_pass'], tend['nu_prueba'], origen=self.filas)
+    self.filas = self.filas + filas
+    self.closes.extend(close[-(2*self.lags + 1):])
+    self.redondeados.extend(np.round(close[-(2*self.lags + 1):], 2))
+    self.fechas.extend(fechas[-(2*self.lags + 1):])
+    return self._columnas(close, resumen)
+
+  def _columnas(self, close, resumen):
+    """Las diez columnas de calcula_AT_tendencias: pruebas tal cual, precios proyectados y pendiente relativos al cierre. Con el resumen de una fila (actualiza) son escalares."""
+    lags = self.lags
+    techo = resumen['techos']
+    piso = resumen['pisos']
+    return {'nu_pruebas_techo_vivo_mas_probado_'f"{lags}": techo[..., 0],
+            'precio_proyectado_techo_vivo_mas_probado_'f"{lags}": (techo[..., 1] - close)/close,
+            'precio_proyectado_techo_vivo_mas_cercano_'f"{lags}": (techo[..., 2] - close)/close,
+            'precio_proyectado_techo_muerto_mas_cercano_'f"{lags}": (techo[..., 3] - close)/close,
+            'tendencia_techo_vivo_mas_probado_'f"{lags}": techo[..., 4]/close,
+            'nu_pruebas_piso_vivo_mas_probado_'f"{lags}": piso[..., 0],
+            'precio_proyectado_piso_vivo_mas_probado_'f"{lags}": (piso[..., 1] - close)/close,
+            'precio_proyectado_piso_vivo_mas_cercano_'f"{lags}": (piso[..., 2] - close)/close,
+            'precio_proyectado_piso_muerto_mas_cercano_'f"{lags}": (piso[..., 3] - close)/close,
+            'tendencia_piso_vivo_mas_probado_'f"{lags}": piso[..., 4]/close}
+
+def _primeros_por_segmento(valores, extremo, inicios, segmento):
+  """Posición del primer máximo (extremo np.maximum) o mínimo (np.minimum) de cada segmento no vacío, como argmax / argmin de cada uno por separado."""
+  es_extremo = valores == extremo.reduceat(valores, inicios)[segmento]
+  posiciones = np.minimum.reduceat(np.where(es_extremo, np.arange(len(valores)), len(valores)), inicios)
+  # Solo con nulos (un cierre nulo) no hay extremo: cualquier posición da el mismo resultado nulo
+  return np.minimum(posiciones, len(valores) - 1)
+
+"""
+ANALISIS TÉCNICO DE VARIOS LAGS (streaming)
+Params:
+    lista_lags: lags de las tendencias, como en calcula_AT_tendencias_lags
+    close_col: the name of the CLOSE values column
+    date_col: the name of the FC values column
+
+Returns:
+    actualiza(barra) devuelve las diez columnas de calcula_AT_tendencias de cada lag para la barra nueva, lo mismo que un TendenciasAT por lag
+"""
+class TendenciasATLags:
+  """
+  Un TendenciasAT por lag confirma los picos y arma las tendencias nuevas; las tendencias de todos los lags (techos y pisos) se guardan además en arrays concatenados, con sus pasadas
+  y pruebas, y la barra nueva se resume con una sola pasada de numpy (máximos y mínimos por segmento) en vez de una por lag. Las pasadas y pruebas de los TendenciasAT de adentro no se actualizan
+  """
+
+  def __init__(self, lista_lags=[360, 120, 90, 60, 30, 15, 8, 4], close_col='<CLOSE>', date_col='<FC>'):
+    self.lista_lags = lista_lags
+    self.close_col = close_col
+    self.date_col = date_col
+    self.por_lag = [TendenciasAT(lags, close_col, date_col) for lags in lista_lags]
+    nombres = ('nu_pruebas_%s_vivo_mas_probado_%s', 'precio_proyectado_%s_vivo_mas_probado_%s', 'precio_proyectado_%s_vivo_mas_cercano_%s',
+               'precio_proyectado_%s_muerto_mas_cercano_%s', 'tendencia_%s_vivo_mas_probado_%s')
+    self.nombres = [nombre % (tipo, lags) for lags in lista_lags for tipo in ('techo', 'piso') for nombre in nombres]
+    self._concatena(np.zeros(0), np.zeros(0))
+
+  def _concatena(self, nu_pass, nu_prueba):
+    """Arma los arrays de todos los segmentos (lag, techos / pisos) desde los TendenciasAT; las tendencias nuevas de cada segmento arrancan sin pasadas ni pruebas."""
+    self.segmentos = [(tendencias.tendencias[name], tendencias.lags, name == 'techos') for tendencias in self.por_lag for name in ('techos', 'pisos')]
+    largos = np.array([len(tend['y_start']) for tend, _, _ in self.segmentos], dtype=int)
+    if len(nu_pass):
+      # Las nuevas van al final de su segmento (np.insert respeta el orden de las que caen en la misma posición)
+      fines = np.cumsum(self.largos)
+      donde = np.repeat(fines, largos - self.largos)
+      nu_pass = np.insert(nu_pass, donde, 0.)
+      nu_prueba = np.insert(nu_prueba, donde, 0.)
+    else:
+      nu_pass = np.concatenate([tend['nu_pass'] for tend, _, _ in self.segmentos])
+      nu_prueba = np.concatenate([tend['nu_prueba'] for tend, _, _ in self.segmentos])
+    self.largos = largos
+    self.nu_pass = nu_pass
+    self.nu_prueba = nu_prueba
+    self.y_start = np.concatenate([tend['y_start'] for tend, _, _ in self.segmentos])
+    self.pendientes = np.concatenate([tend['pendientes'] for tend, _, _ in self.segmentos])
+    self.inicio = np.concatenate([tend['inicio'] for tend, _, _ in self.segmentos]).astype(np.int64)
+    self.lags_tendencia = np.repeat([lags for _, lags, _ in self.segmentos], largos)
+    self.techos = np.repeat([techos for _, _, techos in self.segmentos], largos)
+    # Solo los segmentos con tendencias entran en las reducciones
+    self.con_tendencias = np.flatnonzero(largos > 0)
+    self.inicios = (np.cumsum(largos) - largos)[self.con_tendencias]
+    self.segmento = np.repeat(np.arange(len(self.con_tendencias)), largos[self.con_tendencias])
+
+  def semilla(self, data):
+    for tendencias in self.por_lag:
+      tendencias.semilla(data)
+    self._concatena(np.zeros(0), np.zeros(0))
+    return self
+
+  def actualiza(self, barra):
+    close = float(barra[self.close_col])
+    redondeado = np.round(close, 2)
+    fecha = pd.Timestamp(barra[self.date_col])
+    t = [tendencias._avanza(close, redondeado, fecha) for tendencias in self.por_lag][0]
+    if any(len(tend['y_start']) != largo for (tend, _, _), largo in zip(self.segmentos, self.largos)):
+      self._concatena(self.nu_pass, self.nu_prueba)
+
+    resumen = np.full((len(self.segmentos), 5), np.nan)
+    if len(self.con_tendencias):
+      # Las mismas operaciones que _proyecta_tendencias y _resume_tendencias, elemento a elemento
+      pendientes = self.pendientes
+      proy = (self.y_start + pendientes*self.lags_tendencia) + pendientes*(t - self.inicio)
+      proy[t < self.inicio] = np.nan
+      arriba = proy*1.005
+      abajo = proy*0.995
+      self.nu_pass = self.nu_pass + np.where(self.techos, close > arriba, close < abajo)
+      self.nu_prueba = self.nu_prueba + ((close > abajo) & (close < arriba))
+
+      muerto = self.nu_pass > 5
+      vivo = ~muerto & ~np.isnan(proy)
+      dist = np.abs(close - proy)
+      pruebas_vivo = np.where(~muerto & (self.nu_prueba > 0), self.nu_prueba, -1)
+      i_probado = _primeros_por_segmento(pruebas_vivo, np.maximum, self.inicios, self.segmento)
+      hay_probado = pruebas_vivo[i_probado] > 0
+      i_vivo = _primeros_por_segmento(np.where(vivo, dist, np.inf), np.minimum, self.inicios, self.segmento)
+      i_muerto = _primeros_por_segmento(np.where(muerto, dist, np.inf), np.minimum, self.inicios, self.segmento)
+
+      filas = np.full((len(self.con_tendencias), 5), np.nan)
+      filas[:, 0] = np.where(hay_probado, self.nu_prueba[i_probado], np.nan)
+      filas[:, 1] = np.where(hay_probado, proy[i_probado], np.nan)
+      filas[:, 2] = np.where(np.logical_or.reduceat(vivo, self.inicios), proy[i_vivo], np.nan)
+      filas[:, 3] = np.where(np.logical_or.reduceat(muerto, self.inicios), proy[i_muerto], np.nan)
+      filas[:, 4] = np.where(hay_probado, pendientes[i_probado], np.nan)
+      resumen[self.con_tendencias] = filas
+    # Como TendenciasAT._columnas: pruebas tal cual, precios proyectados y pendiente relativos al cierre
+    resumen[:, 1:4] = (resumen[:, 1:4] - close)/close
+    resumen[:, 4] = resumen[:, 4]/close
+    return dict(zip(self.nombres, resumen.ravel()))
+
+"""
+MEDIA EXPONENCIAL (online)
+Params:
+    com: center of mass, como en pandas ewm (para un span, com = (span - 1)/2)
+    min_periods: cantidad mínima de observaciones para devolver un valor
+    adjust: como en pandas ewm
+
+Returns:
+    actualiza(x) devuelve la media exponencial (ignore_na=False) incluyendo x, con la misma recursión que pandas (mismo resultado bit a bit)
+"""
+class _Ewm:
+  """Guarda el promedio ponderado y el peso acumulado de la historia: cada valor nuevo cuesta O(1)."""
+
+  def __init__(self, com, min_periods=0, adjust=True):
+    self.factor = 1. - 1. / (1. + com)
+    self.nuevo = 1. if adjust else 1. / (1. + com)
+    self.adjust = adjust
+    self.min_periods = min_periods
+    self.promedio = np.float64(np.nan)
+    self.peso = 1.
+    self.nobs = 0
+
+  def semilla(self, valores):
+    self.promedio = np.float64(np.nan)
+    self.peso = 1.
+    self.nobs = 0
+    valor = np.nan
+    for x in np.asarray(valores, dtype=float).tolist():
+      valor = self.actualiza(x)
+    return valor
+
+  def actualiza(self, x):
+    x = np.float64(x)
+    observado = x == x
+    self.nobs = self.nobs + observado
+    if self.promedio == self.promedio:
+      self.peso = self.peso * self.factor
+      if observado:
+        if self.promedio != x:
+          self.promedio = (self.peso * self.promedio + self.nuevo * x) / (self.peso + self.nuevo)
+        self.peso = self.peso + self.nuevo if self.adjust else 1.
+    elif observado:
+      self.promedio = x
+    return self.promedio if self.nobs >= self.min_periods else np.nan
+
+"""
+EMA (online)
+Params:
+    period: smoothing period
+    column: the name of the column with values for calculating EMA
+
+Returns:
+    actualiza(barra) devuelve {'ema[period]': valor}, igual que ema
+"""
+class Ema:
+  """Versión online de indicators_foreign.ema."""
+
+  def __init__(self, period=0, column='<CLOSE>'):
+    self.period = period
+    self.column = column
+    self.ewm = _Ewm(period, min_periods=period)
+
+  def semilla(self, data):
+    self.ewm.semilla(data[self.column].values)
+    return self
+
+  def actualiza(self, barra):
+    return {'ema' + str(self.period): self.ewm.actualiza(barra[self.column])}
+
+"""
+MACD (online)
+Params:
+    period_long: the longer period EMA
+    period_short: the shorter period EMA
+    period_signal: signal line EMA
+    column: the name of the column with values for calculating MACD
+
+Returns:
+    actualiza(barra) devuelve 'macd_val', 'macd_signal_line' y 'macd_histog', igual que macd
+"""
+class Macd:
+  """Dos EMA y la línea de señal, cada una con su estado."""
+
+  def __init__(self, period_long=26, period_short=12, period_signal=9, column='<CLOSE>'):
+    self.column = column
+    self.ema_long = _Ewm(period_long, min_periods=period_long)
+    self.ema_short = _Ewm(period_short, min_periods=period_short)
+    self.signal = _Ewm(period_signal)
+
+  def semilla(self, data):
+    valores = data[self.column].values
+    self.ema_long.semilla(valores)
+    self.ema_short.semilla(valores)
+    self.signal.semilla(_ewm_batch(valores, self.ema_short) - _ewm_batch(valores, self.ema_long))
+    return self
+
+  def actualiza(self, barra):
+    macd_val = self.ema_short.actualiza(barra[self.column]) - self.ema_long.actualiza(barra[self.column])
+    signal = self.signal.actualiza(macd_val)
+    return {'macd_val': macd_val, 'macd_signal_line': signal, 'macd_histog': macd_val - signal}
+
+"""
+MEDIAS (streaming)
+Params:
+    close_col: the name of the CLOSE values column
+    inicios: los de indicators_mios._inicios_medias sobre toda la serie del ticker. Con nulos en el cierre calcula_medias corre la semilla de la media simple según los nulos de toda la serie:
+        con los inicios de una primera pasada el resultado es igual aunque el cierre tenga nulos. Si es None, se toman los primeros cierres (igual mientras el cierre no tenga nulos)
+
+Returns:
+    actualiza(barra) devuelve 'exp1', 'exp2', 'macd', 'exp3' y 'histog', igual que calcula_medias
+"""
+class Medias:
+  """Las tres medias exponenciales (adjust=False) de calcula_medias, cada una con su estado; exp1 y exp2 arrancan con la media simple de los primeros 12 y 26 cierres."""
+
+  def __init__(self, close_col='<CLOSE>', inicios=None):
+    self.close_col = close_col
+    self.inicios = inicios
+    self._reinicia()
+
+  def _reinicia(self):
+    self.filas = 0
+    self.primeros = []
+    self.medias = [(12, _Ewm(5.5, adjust=False)), (26, _Ewm(12.5, adjust=False))]
+    self.exp3 = _Ewm(4., adjust=False)
+
+  def semilla(self, data):
+    self._reinicia()
+    for valor in data[self.close_col].values.tolist():
+      self.actualiza({self.close_col: valor})
+    return self
+
+  def actualiza(self, barra):
+    y = np.float64(barra[self.close_col])
+    if len(self.primeros) < 26:
+      self.primeros.append(y)
+    exp = []
+    for period, ewm in self.medias:
+      if self.inicios is not None:
+        inicio = self.inicios[period]
+        if inicio is None or self.filas < inicio[0]:
+          exp.append(ewm.actualiza(np.nan))
+        else:
+          exp.append(ewm.actualiza(inicio[1][self.filas - inicio[0]] if self.filas < inicio[0] + period else y))
+      elif len(self.primeros) < period:
+        exp.append(ewm.actualiza(np.nan))
+      elif len(self.primeros) == period and ewm.nobs == 0:
+        # La media simple con el mismo rolling de pandas que calcula_medias (mismo redondeo)
+        exp.append(ewm.actualiza(pd.Series(self.primeros[:period]).rolling(period).mean().iloc[-1]))
+      else:
+        exp.append(ewm.actualiza(y))
+    self.filas = self.filas + 1
+    macd = exp[0] - exp[1]
+    exp3 = self.exp3.actualiza(macd)
+    return {'exp1': exp[0], 'exp2': exp[1], 'macd': macd, 'exp3': exp3, 'histog': macd - exp3}
+
+def _ewm_batch(valores, ewm):
+  """Serie completa de una media exponencial con los mismos parámetros que 'ewm' (para armar las entradas de otra en la semilla)."""
+  return pd.Series(valores, dtype=float).ewm(ignore_na=False, min_periods=ewm.min_periods, alpha=1. - ewm.factor, adjust=ewm.adjust).mean().values
+
+"""
+TRIX (online)
+Params:
+    periods: the period over which to calculate the indicator value
+    signal_periods: the period for signal moving average
+    close_col: the name of the CLOSE values column
+
+Returns:
+    actualiza(barra) devuelve 'trix' y 'trix_signal', igual que trix
+"""
+class Trix:
+  """Tres medias exponenciales encadenadas y la señal."""
+
+  def __init__(self, periods=14, signal_periods=9, close_col='<CLOSE>'):
+    self.close_col = close_col
+    self.ewms = [_Ewm(periods) for _ in range(3)]
+    self.signal = _Ewm(signal_periods)
+
+  def semilla(self, data):
+    valores = data[self.close_col].values
+    for ewm in self.ewms:
+      siguiente = _ewm_batch(valores, ewm)
+      ewm.semilla(valores)
+      valores = siguiente
+    self.signal.semilla(valores)
+    return self
+
+  def actualiza(self, barra):
+    valor = barra[self.close_col]
+    for ewm in self.ewms:
+      valor = ewm.actualiza(valor)
+    return {'trix': valor, 'trix_signal': self.signal.actualiza(valor)}
+
+"""
+RSI (online)
+Params:
+    periods: period for calculating RSI (compara contra el cierre de hace 'periods' barras)
+    close_col: the name of the CLOSE values column
+
+Returns:
+    actualiza(barra) devuelve {'rsi': valor}, igual que rsi
+"""
+class Rsi:
+  """Buffer con los últimos 'periods' cierres y las medias de subas y bajas."""
+
+  def __init__(self, periods=14, close_col='<CLOSE>'):
+    self.periods = periods
+    self.close_col = close_col
+    self.closes = deque(maxlen=max(periods, 1))
+    self.filas = 0
+    self.ewm_u = _Ewm(periods)
+    self.ewm_d = _Ewm(periods)
+
+  def semilla(self, data):
+    close = data[self.close_col].values.astype(float)
+    change = np.zeros(len(close))
+    change[self.periods:] = close[self.periods:] - (close[:-self.periods] if self.periods > 0 else close)
+    self.ewm_u.semilla(np.where(change > 0, change, 0.))
+    self.ewm_d.semilla(np.where(change < 0, -change, 0.))
+    self.closes = deque(close[-max(self.periods, 1):].tolist(), maxlen=max(self.periods, 1))
+    self.filas = len(close)
+    return self
+
+  def actualiza(self, barra):
+    close = float(barra[self.close_col])
+    change = 0.
+    if self.periods == 0:
+      change = close - close
+    elif self.filas >= self.periods:
+      change = close - self.closes[0]
+    self.closes.append(close)
+    self.filas = self.filas + 1
+    u = self.ewm_u.actualiza(change if change > 0 else 0.)
+    d = self.ewm_d.actualiza(-change if change < 0 else 0.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      return {'rsi': u / (u + d)}
+
+"""
+AVERAGE TRUE RANGE (online)
+Params:
+    trend_periods: the over which to calculate ATR
+    open_col, high_col, low_col, close_col: the names of the OPEN/HIGH/LOW/CLOSE values columns
+
+Returns:
+    actualiza(barra) devuelve 'atr' y 'true_range', igual que average_true_range(drop_tr=False)
+"""
+class Atr:
+  """Cierre anterior y la media exponencial del true range."""
+
+  def __init__(self, trend_periods=14, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
+    self.cols = (open_col, high_col, low_col, close_col)
+    self.prev_close = None
+    self.ewm = _Ewm(trend_periods)
+
+  def semilla(self, data):
+    open_col, high_col, low_col, close_col = self.cols
+    self.ewm.semilla(_true_range(data, open_col, high_col, low_col, close_col))
+    self.prev_close = float(data[close_col].values[-1]) if len(data) else None
+    return self
+
+  def actualiza(self, barra):
+    true_range = _true_range_barra(barra, self.prev_close, *self.cols)
+    self.prev_close = float(barra[self.cols[3]])
+    return {'true_range': true_range, 'atr': self.ewm.actualiza(true_range)}
+
+def _true_range_barra(barra, prev_close, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
+  """True range de una barra (mismas operaciones que indicators_foreign._true_range)."""
+  prices = [barra[high_col], barra[low_col], barra[close_col], barra[open_col]]
+  highest = np.amax(prices)
+  lowest = np.amin(prices)
+  if prev_close is None:
+    return highest - lowest
+  return np.amax([highest - lowest, np.abs(highest - prev_close), np.abs(lowest - prev_close)])
+
+"""
+DIRECTIONAL MOVEMENT INDEX (online)
+Params:
+    periods: period for calculating ADX
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    close_col: the name of the CLOSE values column (para el true range)
+
+Returns:
+    actualiza(barra) devuelve 'di_plus', 'di_minus', 'dxi' y 'adx', igual que directional_movement_index
+"""
+class Dmi:
+  """Máximo, mínimo y cierre anteriores, y las tres medias exponenciales del DMI."""
+
+  def __init__(self, periods=14, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
+    self.high_col = high_col
+    self.low_col = low_col
+    self.close_col = close_col
+    self.prev = None
+    self.ewm_plus = _Ewm(periods)
+    self.ewm_minus = _Ewm(periods)
+    self.ewm_adx = _Ewm(periods)
+
+  def semilla(self, data):
+    if len(data) == 0:
+      return self
+    true_range = data['true_range'].values if 'true_range' in data.columns else _true_range(data, high_col=self.high_col, low_col=self.low_col, close_col=self.close_col)
+    high, low = data[self.high_col].values, data[self.low_col].values
+    m_plus = np.zeros(len(data))
+    m_minus = np.zeros(len(data))
+    m_plus[1:] = high[1:] - high[:-1]
+    m_minus[1:] = low[1:] - low[:-1]
+    di_plus_in = np.where((m_plus > m_minus) & (m_plus > 0), m_plus, 0.) / true_range
+    di_minus_in = np.where((m_minus > m_plus) & (m_minus > 0), m_minus, 0.) / true_range
+    di_plus = _ewm_batch(di_plus_in, self.ewm_plus)
+    di_minus = _ewm_batch(di_minus_in, self.ewm_minus)
+    self.ewm_plus.semilla(di_plus_in)
+    self.ewm_minus.semilla(di_minus_in)
+    dxi = np.abs(di_plus - di_minus) / (di_plus + di_minus)
+    dxi[:1] = 1.
+    self.ewm_adx.semilla(dxi)
+    self.prev = (high[-1], low[-1], float(data[self.close_col].values[-1]))
+    return self
+
+  def actualiza(self, barra):
+    high, low = barra[self.high_col], barra[self.low_col]
+    if self.prev is None:
+      true_range = _true_range_barra(barra, None, high_col=self.high_col, low_col=self.low_col, close_col=self.close_col)
+      m_plus = m_minus = 0.
+    else:
+      true_range = _true_range_barra(barra, self.prev[2], high_col=self.high_col, low_col=self.low_col, close_col=self.close_col)
+      m_plus = high - self.prev[0]
+      m_minus = low - self.prev[1]
+    primera = self.prev is None
+    self.prev = (high, low, float(barra[self.close_col]))
+    dm_plus = m_plus if (m_plus > m_minus) and (m_plus > 0) else 0.
+    dm_minus = m_minus if (m_minus > m_plus) and (m_minus > 0) else 0.
+    di_plus = self.ewm_plus.actualiza(dm_plus / true_range)
+    di_minus = self.ewm_minus.actualiza(dm_minus / true_range)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      dxi = 1. if primera else np.abs(di_plus - di_minus) / (di_plus + di_minus)
+    return {'di_plus': di_plus, 'di_minus': di_minus, 'dxi': dxi, 'adx': self.ewm_adx.actualiza(dxi)}
+
+"""
+INDICADORES ACUMULADOS CON MEDIA EXPONENCIAL (online)
+Params:
+    trend_periods / periods: período de la media exponencial, como en la función batch
+    high_col, low_col, close_col, vol_col: the names of the HIGH/LOW/CLOSE/VOL values columns
+
+Returns:
+    actualiza(barra) devuelve las mismas columnas que on_balance_volume, price_volume_trend, acc_dist, chaikin_oscillator, ease_of_movement, negative_volume_index y positive_volume_index
+"""
+class _Acumulado(ABC):
+  """Base de los indicadores que acumulan un valor por barra y lo suavizan: guarda la barra anterior, el acumulado y las medias."""
+
+  nombre = None
+  nombre_ema = None
+
+  def __init__(self, periods, close_col='<CLOSE>', vol_col='<VOL>', high_col='<HIGH>', low_col='<LOW>'):
+    self.close_col = close_col
+    self.vol_col = vol_col
+    self.high_col = high_col
+    self.low_col = low_col
+    self.prev = None
+    self.acumulado = 0.
+    self.ewm = _Ewm(periods)
+
+  @abstractmethod
+  def _batch(self, data):
+    """Serie batch del indicador acumulado (la que se suaviza)."""
+
+  @abstractmethod
+  def _paso(self, barra):
+    """Valor acumulado nuevo a partir de self.prev y self.acumulado."""
+
+  def semilla(self, data):
+    if len(data) == 0:
+      return self
+    serie = self._batch(data.copy())
+    self.ewm.semilla(serie)
+    self.acumulado = float(serie[-1])
+    self.prev = data.iloc[-1]
+    return self
+
+  def actualiza(self, barra):
+    self.acumulado = self._paso(barra)
+    self.prev = barra
+    return {self.nombre: self.acumulado, self.nombre_ema: self.ewm.actualiza(self.acumulado)}
+
+class Obv(_Acumulado):
+  """Versión online de on_balance_volume."""
+
+  def __init__(self, trend_periods=21, close_col='<CLOSE>', vol_col='<VOL>'):
+    super().__init__(trend_periods, close_col=close_col, vol_col=vol_col)
+    self.nombre, self.nombre_ema = 'obv', 'obv_ema' + str(trend_periods)
+
+  def _batch(self, data):
+    return on_balance_volume(data, close_col=self.close_col, vol_col=self.vol_col)['obv'].values
+
+  def _paso(self, barra):
+    if self.prev is None:
+      return barra[self.vol_col]
+    if barra[self.close_col] > self.prev[self.close_col]:
+      return self.acumulado + barra[self.vol_col]
+    if barra[self.close_col] < self.prev[self.close_col]:
+      return self.acumulado + (-barra[self.vol_col])
+    return self.acumulado + 0.
+
+class Pvt(_Acumulado):
+  """Versión online de price_volume_trend."""
+
+  def __init__(self, trend_periods=21, close_col='<CLOSE>', vol_col='<VOL>'):
+    super().__init__(trend_periods, close_col=close_col, vol_col=vol_col)
+    self.nombre, self.nombre_ema = 'pvt', 'pvt_ema' + str(trend_periods)
+
+  def _batch(self, data):
+    return price_volume_trend(data, close_col=self.close_col, vol_col=self.vol_col)['pvt'].values
+
+  def _paso(self, barra):
+    if self.prev is None:
+      return barra[self.vol_col]
+    last_close = self.prev[self.close_col]
+    return self.acumulado + (barra[self.vol_col] * (barra[self.close_col] - last_close) / last_close)
+
+class AccDist(_Acumulado):
+  """Versión online de acc_dist (el valor de cada barra no se acumula, solo se suaviza)."""
+
+  def __init__(self, trend_periods=21, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', vol_col='<VOL>'):
+    super().__init__(trend_periods, close_col=close_col, vol_col=vol_col, high_col=high_col, low_col=low_col)
+    self.nombre, self.nombre_ema = 'acc_dist', 'acc_dist_ema' + str(trend_periods)
+
+  def _batch(self, data):
+    return acc_dist(data, high_col=self.high_col, low_col=self.low_col, close_col=self.close_col, vol_col=self.vol_col)['acc_dist'].values
+
+  def _paso(self, barra):
+    high, low, close = barra[self.high_col], barra[self.low_col], barra[self.close_col]
+    if high != low:
+      return ((close - low) - (high - close)) / (high - low) * barra[self.vol_col]
+    return 0.
+
+class ChaikinOscillator:
+  """Versión online de chaikin_oscillator: acumulado de money flow volume y dos medias."""
+
+  def __init__(self, periods_short=3, periods_long=10, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', vol_col='<VOL>'):
+    self.cols = (high_col, low_col, close_col, vol_col)
+    self.acumulado = 0.
+    self.ewm_short = _Ewm(periods_short)
+    self.ewm_long = _Ewm(periods_long)
+
+  def semilla(self, data):
+    high, low, close, vol = (data[col].values for col in self.cols)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      val = ((close - low) - (high - close)) / (high - low) * vol
+    ac = np.cumsum(np.where(high != low, val, 0.))
+    self.ewm_short.semilla(ac)
+    self.ewm_long.semilla(ac)
+    self.acumulado = float(ac[-1]) if len(ac) else 0.
+    return self
+
+  def actualiza(self, barra):
+    high, low, close, vol = (barra[col] for col in self.cols)
+    if high != low:
+      self.acumulado = self.acumulado + ((close - low) - (high - close)) / (high - low) * vol
+    else:
+      self.acumulado = self.acumulado + 0.
+    return {'ch_osc': self.ewm_short.actualiza(self.acumulado) - self.ewm_long.actualiza(self.acumulado)}
+
+class EaseOfMovement(_Acumulado):
+  """Versión online de ease_of_movement (el valor de cada barra no se acumula, solo se suaviza)."""
+
+  def __init__(self, period=14, high_col='<HIGH>', low_col='<LOW>', vol_col='<VOL>'):
+    super().__init__(period, vol_col=vol_col, high_col=high_col, low_col=low_col)
+    self.nombre, self.nombre_ema = 'emv', 'emv_ema_' + str(period)
+
+  def _batch(self, data):
+    return ease_of_movement(data, high_col=self.high_col, low_col=self.low_col, vol_col=self.vol_col)['emv'].values
+
+  def _paso(self, barra):
+    high, low = barra[self.high_col], barra[self.low_col]
+    midpoint_move = 0.
+    if self.prev is not None:
+      midpoint_move = (high + low) / 2 - (self.prev[self.high_col] + self.prev[self.low_col]) / 2
+    diff = high - low
+    if diff == 0:
+      diff = 0.000000001
+    vol = barra[self.vol_col]
+    if vol == 0:
+      vol = 1
+    return midpoint_move / ((vol / 100000000) / (diff))
+
+class _VolumeIndex(_Acumulado):
+  """Base de NVI y PVI: el índice se mueve solo los días en que mueve(volumen, volumen anterior), que el volumen baja (NVI) o sube (PVI)."""
+
+  def __init__(self, periods, mueve, close_col='<CLOSE>', vol_col='<VOL>'):
+    super().__init__(periods, close_col=close_col, vol_col=vol_col)
+    self.mueve = mueve
+
+  def _paso(self, barra):
+    if self.prev is None:
+      return 1000.
+    prev_close = self.prev[self.close_col]
+    if self.mueve(barra[self.vol_col], self.prev[self.vol_col]):
+      return self.acumulado + (barra[self.close_col] - prev_close / prev_close * self.acumulado)
+    return self.acumulado
+
+class Nvi(_VolumeIndex):
+  """Versión online de negative_volume_index."""
+
+  def __init__(self, periods=255, close_col='<CLOSE>', vol_col='<VOL>'):
+    super().__init__(periods, operator.lt, close_col=close_col, vol_col=vol_col)
+    self.nombre, self.nombre_ema = 'nvi', 'nvi_ema'
+
+  def _batch(self, data):
+    return negative_volume_index(data, close_col=self.close_col, vol_col=self.vol_col)['nvi'].values
+
+class Pvi(_VolumeIndex):
+  """Versión online de positive_volume_index."""
+
+  def __init__(self, periods=255, close_col='<CLOSE>', vol_col='<VOL>'):
+    super().__init__(periods, operator.gt, close_col=close_col, vol_col=vol_col)
+    self.nombre, self.nombre_ema = 'pvi', 'pvi_ema'
+
+  def _batch(self, data):
+    return positive_volume_index(data, close_col=self.close_col, vol_col=self.vol_col)['pvi'].values
+
+"""
+WILLIAMS ACCUMULATION/DISTRIBUTION (online)
+Params:
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    close_col: the name of the CLOSE values column
+
+Returns:
+    actualiza(barra) devuelve {'williams_ad': valor}, igual que williams_ad
+"""
+class WilliamsAd:
+  """Cierre anterior y el acumulado."""
+
+  def __init__(self, high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>'):
+    self.high_col = high_col
+    self.low_col = low_col
+    self.close_col = close_col
+    self.prev_close = None
+    self.acumulado = 0.
+
+  def semilla(self, data):
+    if len(data):
+      self.acumulado = float(williams_ad(data, self.high_col, self.low_col, self.close_col, return_new_only=True)['williams_ad'].values[-1])
+      self.prev_close = float(data[self.close_col].values[-1])
+    return self
+
+  def actualiza(self, barra):
+    today = float(barra[self.close_col])
+    ad = 0.
+    if self.prev_close is not None:
+      if today > self.prev_close:
+        ad = today - np.minimum(self.prev_close, barra[self.low_col])
+      elif today < self.prev_close:
+        ad = today - np.maximum(self.prev_close, barra[self.high_col])
+    self.prev_close = today
+    self.acumulado = self.acumulado + ad
+    return {'williams_ad': self.acumulado}
+
+"""
+CHAIKIN VOLATILITY (online)
+Params:
+    ema_periods: period for smoothing Highest High and Lowest Low difference
+    change_periods: the period for calculating the difference between Highest High and Lowest Low
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+
+Returns:
+    actualiza(barra) devuelve {'chaikin_volatility': valor}, igual que chaikin_volatility
+"""
+class ChaikinVolatility:
+  """Media exponencial del rango y buffer con sus últimos 'change_periods' valores."""
+
+  def __init__(self, ema_periods=10, change_periods=10, high_col='<HIGH>', low_col='<LOW>'):
+    self.change_periods = change_periods
+    self.high_col = high_col
+    self.low_col = low_col
+    self.ewm = _Ewm(ema_periods)
+    self.emas = deque(maxlen=change_periods + 1)
+
+  def semilla(self, data):
+    ch_vol_hl = (data[self.high_col] - data[self.low_col]).values
+    emas = _ewm_batch(ch_vol_hl, self.ewm)
+    self.ewm.semilla(ch_vol_hl)
+    self.emas = deque(emas[-(self.change_periods + 1):].tolist(), maxlen=self.change_periods + 1)
+    return self
+
+  def actualiza(self, barra):
+    self.emas.append(self.ewm.actualiza(barra[self.high_col] - barra[self.low_col]))
+    if len(self.emas) <= self.change_periods:
+      return {'chaikin_volatility': 0.}
+    prev_value = self.emas[0]
+    if prev_value == 0:
+      prev_value = 0.0001
+    return {'chaikin_volatility': (self.emas[-1] - prev_value)/prev_value}
+
+"""
+MASS INDEX (online)
+Params:
+    period: cantidad de barras que se suman
+    ema_period: período de las medias exponenciales del rango
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    inclusive_window: como en mass_index: si es True la ventana termina en la barra actual, por defecto en la anterior
+
+Returns:
+    actualiza(barra) devuelve {'mass_index': valor}, igual que mass_index
+"""
+class MassIndex:
+  """Dos medias exponenciales encadenadas y un buffer circular con los últimos 'period' cocientes."""
+
+  def __init__(self, period=25, ema_period=9, high_col='<HIGH>', low_col='<LOW>', inclusive_window=False):
+    self.period = period
+    self.high_col = high_col
+    self.low_col = low_col
+    self.inclusive_window = inclusive_window
+    self.ema = _Ewm(ema_period)
+    self.ema_ema = _Ewm(ema_period)
+    self.divs = deque(maxlen=period)
+
+  def semilla(self, data):
+    high_low = (data[self.high_col] - data[self.low_col] + 0.000001).values
+    ema = _ewm_batch(high_low, self.ema)
+    self.ema.semilla(high_low)
+    div = ema / _ewm_batch(ema, self.ema_ema)
+    self.ema_ema.semilla(ema)
+    self.divs = deque(div[-self.period:].tolist(), maxlen=self.period)
+    return self
+
+  def actualiza(self, barra):
+    if not self.inclusive_window:
+      valor = np.sum(self.divs) if len(self.divs) == self.period else 0.
+    ema = self.ema.actualiza(barra[self.high_col] - barra[self.low_col] + 0.000001)
+    self.divs.append(ema / self.ema_ema.actualiza(ema))
+    if self.inclusive_window:
+      valor = np.sum(self.divs) if len(self.divs) == self.period else 0.
+    return {'mass_index': valor}
+
+"""
+BOLLINGER BANDS (online)
+Params:
+    trend_periods: the over which to calculate BB
+    close_col: the name of the CLOSE values column
+    inclusive_window: como en bollinger_bands: si es True la ventana termina en la barra actual, por defecto en la anterior
+
+Returns:
+    actualiza(barra) devuelve 'bol_bands_middle', 'bol_bands_upper' y 'bol_bands_lower', igual que bollinger_bands
+"""
+class BollingerBands:
+  """Media exponencial del cierre y buffer con los últimos 'trend_periods' cierres."""
+
+  def __init__(self, trend_periods=20, close_col='<CLOSE>', inclusive_window=False):
+    self.trend_periods = trend_periods
+    self.close_col = close_col
+    self.inclusive_window = inclusive_window
+    self.ewm = _Ewm(trend_periods)
+    self.closes = deque(maxlen=trend_periods)
+
+  def semilla(self, data):
+    close = data[self.close_col].values.astype(float)
+    self.ewm.semilla(close)
+    self.closes = deque(close[-self.trend_periods:].tolist(), maxlen=self.trend_periods)
+    return self
+
+  def actualiza(self, barra):
+    middle_band = self.ewm.actualiza(barra[self.close_col])
+    if self.inclusive_window:
+      self.closes.append(float(barra[self.close_col]))
+    std = 0.
+    if len(self.closes) == self.trend_periods:
+      ventana = np.array(self.closes)
+      std = np.sqrt(ventana.var() + np.square(ventana.mean() - middle_band))
+    if not self.inclusive_window:
+      self.closes.append(float(barra[self.close_col]))
+    d = 2
+    return {'bol_bands_middle': middle_band, 'bol_bands_upper': middle_band + (d * std), 'bol_bands_lower': middle_band - (d * std)}
+
+"""
+SIN NULOS (streaming)
+Params:
+    columnas: columnas que no pueden ser nulas
+    indicadores: lista de indicadores de este módulo que solo ven las barras sin nulos
+
+Returns:
+    actualiza(barra) devuelve lo que devuelven los indicadores, o un diccionario vacío si la barra tiene nulos en columnas: el df.dropna() de los notebooks
+    (los indicadores de adentro cuentan lags, ventanas y picos sobre las barras que quedan)
+"""
+class SinNulos:
+  """Filtra las barras antes de pasarlas a los indicadores de adentro, que se actualizan en orden como en servicio.EstadoTickers."""
+
+  def __init__(self, columnas, indicadores):
+    self.columnas = columnas
+    self.indicadores = indicadores
+
+  def semilla(self, data):
+    limpio = data.dropna(subset=self.columnas)
+    for indicador in self.indicadores:
+      indicador.semilla(limpio)
+    return self
+
+  def actualiza(self, barra):
+    if any(pd.isna(barra[columna]) for columna in self.columnas):
+      return {}
+    fila = dict(barra)
+    nuevas = {}
+    for indicador in self.indicadores:
+      calculado = indicador.actualiza(fila)
+      fila.update(calculado)
+      nuevas.update(calculado)
+    return nuevas
@@ -0,0 +1,197 @@
+"""
+Instrumentación de los indicadores: cada llamada reporta un evento (tiempo, filas, contadores y memoria) a los sinks registrados. Sin sinks no se mide nada
+"""
+
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+import tracemalloc
+
+import pandas as pd
+
+_sinks = []
+_ticker = contextvars.ContextVar('ticker', default=None)
+_evento_actual = contextvars.ContextVar('evento_actual', default=None)
+_medicion = contextvars.ContextVar('medicion', default=None)
+
+"""
+REGISTRO DE SINKS
+Params:
+    sink: cualquier función que recibe un evento (diccionario con funcion, ticker, filas, inicio y fin (time.time), segundos, pico_memoria_bytes, profundidad, externa y los contadores que reporte la función). externa indica que es la llamada más externa de su ticker. Si el sink tiene el atributo memoria = True se mide con tracemalloc la memoria adicional máxima de cada llamada
+
+Returns:
+    el mismo sink (agrega_sink) o nada (quita_sink)
+"""
+def agrega_sink(sink):
+  """Registra el sink para todas las llamadas siguientes."""
+  _sinks.append(sink)
+  return sink
+
+def quita_sink(sink):
+  if sink in _sinks:
+    _sinks.remove(sink)
+
+@contextlib.contextmanager
+def instrumentado(*sinks):
+  """Registra los sinks solo dentro del bloque with."""
+  for sink in sinks:
+    agrega_sink(sink)
+  try:
+    yield sinks[0] if len(sinks) == 1 else sinks
+  finally:
+    for sink in sinks:
+      quita_sink(sink)
+
+@contextlib.contextmanager
+def ticker_actual(ticker):
+  """Marca los eventos del bloque with con el ticker (lo usa el cálculo por ticker)."""
+  token = _ticker.set(ticker)
+  try:
+    yield
+  finally:
+    _ticker.reset(token)
+
+def reporta(**contadores):
+  """Suma contadores (ej. picos=12) al evento de la llamada instrumentada en curso. Sin sinks no hace nada."""
+  evento = _evento_actual.get()
+  if evento is not None:
+    for nombre, valor in contadores.items():
+      evento[nombre] = evento.get(nombre, 0) + valor
+
+"""
+INSTRUMENTA
+Params:
+    funcion: función de indicador (su primer argumento es el DataFrame)
+
+Returns:
+    la función envuelta: con sinks registrados emite un evento por llamada, sin sinks solo agrega una comparación
+"""
+def instrumenta(funcion):
+  """Decorador de los indicadores. Las llamadas anidadas miden su pico con tracemalloc.reset_peak y se lo pasan a la de afuera, que no lo pierde."""
+
+  @functools.wraps(funcion)
+  def envuelta(*args, **kwargs):
+    if not _sinks:
+      return funcion(*args, **kwargs)
+
+    padre = _evento_actual.get()
+    data = args[0] if args else kwargs.get('data')
+    ticker = _ticker.get()
+    evento = {'funcion': funcion.__name__, 'ticker': ticker,
+              'filas': len(data) if hasattr(data, '__len__') else None,
+              'profundidad': 0 if padre is None else padre['profundidad'] + 1,
+              'externa': padre is None or padre['ticker'] != ticker,
+              'inicio': None, 'fin': None, 'segundos': None, 'pico_memoria_bytes': None}
+
+    # Memoria: no se toca un tracemalloc que haya prendido otro (ej. el benchmark)
+    medicion_padre = _medicion.get()
+    mide_memoria = any(getattr(sink, 'memoria', False) for sink in _sinks) and (medicion_padre is not None or not tracemalloc.is_tracing())
+    if mide_memoria:
+      inicia = not tracemalloc.is_tracing()
+      if inicia:
+        tracemalloc.start()
+      else:
+        medicion_padre['pico'] = max(medicion_padre['pico'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+      medicion = {'pico': 0}
+      base = tracemalloc.get_traced_memory()[0]
+      token_medicion = _medicion.set(medicion)
+
+    token = _evento_actual.set(evento)
+    evento['inicio'] = time.time()
+    inicio = time.perf_counter()
+    try:
+      return funcion(*args, **kwargs)
+    finally:
+      evento['segundos'] = time.perf_counter() - inicio
+      evento['fin'] = evento['inicio'] + evento['segundos']
+      _evento_actual.reset(token)
+      if mide_memoria:
+        _medicion.reset(token_medicion)
+        pico = max(tracemalloc.get_traced_memory()[1], medicion['pico'])
+        evento['pico_memoria_bytes'] = pico - base
+        if inicia:
+          tracemalloc.stop()
+        else:
+          medicion_padre['pico'] = max(medicion_padre['pico'], pico)
+      for sink in list(_sinks):
+        sink(evento)
+
+  return envuelta
+
+"""
+SINK DE LOGGING
+Params:
+    logger: logger donde se escriben los eventos (por defecto 'modules.instrumentacion')
+    nivel: nivel de logging de los mensajes
+
+Returns:
+    sink que escribe una línea por evento
+"""
+class SinkLogging:
+  """Una línea por llamada con la función, el ticker, las filas, el tiempo y los contadores."""
+
+  memoria = False
+
+  def __init__(self, logger=None, nivel=logging.INFO):
+    self.logger = logger or logging.getLogger('modules.instrumentacion')
+    self.nivel = nivel
+
+  def __call__(self, evento):
+    extras = ' '.join('%s=%s' % (k, v) for k, v in evento.items() if k not in ('funcion', 'ticker', 'filas', 'inicio', 'fin', 'segundos', 'profundidad', 'externa', 'pico_memoria_bytes'))
+    self.logger.log(self.nivel, "%s%s ticker=%s filas=%s %.4fs %s", '  '*evento['profundidad'], evento['funcion'],
+                    evento['ticker'], evento['filas'], evento['segundos'], extras)
+
+"""
+SINK EN MEMORIA
+Params:
+    memoria: si es True mide la memoria adicional máxima de cada llamada (más lento)
+
+Returns:
+    sink que guarda los eventos en una lista (atributo eventos) y los devuelve como DataFrame con a_dataframe()
+"""
+class SinkMemoria:
+  """Colector de eventos para analizarlos después."""
+
+  def __init__(self, memoria=False):
+    self.memoria = memoria
+    self.eventos = []
+
+  def __call__(self, evento):
+    self.eventos.append(dict(evento))
+
+  def a_dataframe(self):
+    return pd.DataFrame(self.eventos)
+
+"""
+RESUMEN POR TICKER
+Params:
+    memoria: si es True mide la memoria adicional máxima de cada llamada
+
+Returns:
+    sink que acumula, para cada ticker y función, llamadas, filas, segundos y pico de memoria. Solo cuenta la llamada más externa de cada ticker (para no sumar dos veces el tiempo de las anidadas). resumen() lo devuelve como DataFrame
+"""
+class ResumenTickers:
+  """Tiempos por ticker, para ver qué ticker o qué función domina la construcción de la base."""
+
+  def __init__(self, memoria=False):
+    self.memoria = memoria
+    self.acumulado = {}
+
+  def __call__(self, evento):
+    if not evento['externa']:
+      return
+    clave = (evento['ticker'], evento['funcion'])
+    fila = self.acumulado.setdefault(clave, {'llamadas': 0, 'filas': 0, 'segundos': 0., 'pico_memoria_bytes': 0})
+    fila['llamadas'] += 1
+    fila['filas'] += evento['filas'] or 0
+    fila['segundos'] += evento['segundos']
+    fila['pico_memoria_bytes'] = max(fila['pico_memoria_bytes'], evento['pico_memoria_bytes'] or 0)
+
+  def resumen(self):
+    if not self.acumulado:
+      return pd.DataFrame(columns=['llamadas', 'filas', 'segundos', 'pico_memoria_bytes'])
+    resumen = pd.DataFrame(list(self.acumulado.values()), index=pd.MultiIndex.from_tuples(list(self.acumulado), names=['ticker', 'funcion']))
+    return resumen.sort_values('segundos', ascending=False)
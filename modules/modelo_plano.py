@@ -0,0 +1,254 @@
+"""
+Modelos XGBoost en arrays planos: se exportan una vez (con xgboost instalado) y se cargan con numpy por mmap, sin pickle ni xgboost/sklearn
+
+Formato (una carpeta por modelo):
+    modelo.json: features (en orden), objetivo, margen base, cantidad de árboles y versión del formato
+    feature.npy, umbral.npy, si.npy, no.npy, faltante.npy, valor.npy: un elemento por nodo de todos los árboles (índices globales). feature es -1 en las hojas
+    raiz.npy: nodo raíz de cada árbol
+
+Uso:
+    python -m modules.modelo_plano v2/model_alza.dat v2/model_alza --compara
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+VERSION = 1
+ARRAYS = ['feature', 'umbral', 'si', 'no', 'faltante', 'valor', 'raiz']
+OBJETIVOS = ('binary:logistic', 'binary:logitraw', 'reg:squarederror', 'reg:linear')
+
+def _aplana(arboles, features):
+  """
+  Pasa los árboles del dump json de xgboost (get_dump(dump_format='json')) a arrays por nodo.
+  Los nodeid de cada árbol se corren por el offset del árbol; los nodeid que no aparecen (nodos podados) quedan como hojas en 0 y nunca se visitan
+  """
+  indice = {nombre: i for i, nombre in enumerate(features)}
+  nodos_por_arbol = []
+  for arbol in arboles:
+    nodos = {}
+    pendientes = [json.loads(arbol) if isinstance(arbol, str) else arbol]
+    while pendientes:
+      nodo = pendientes.pop()
+      nodos[nodo['nodeid']] = nodo
+      pendientes.extend(nodo.get('children', []))
+    nodos_por_arbol.append(nodos)
+
+  total = sum(max(nodos) + 1 for nodos in nodos_por_arbol)
+  planos = {'feature': np.full(total, -1, dtype=np.int32), 'umbral': np.zeros(total, dtype=np.float32),
+            'si': np.zeros(total, dtype=np.int32), 'no': np.zeros(total, dtype=np.int32),
+            'faltante': np.zeros(total, dtype=np.int32), 'valor': np.zeros(total, dtype=np.float32),
+            'raiz': np.zeros(len(nodos_por_arbol), dtype=np.int32)}
+  offset = 0
+  for t, nodos in enumerate(nodos_por_arbol):
+    planos['raiz'][t] = offset
+    for nodeid, nodo in nodos.items():
+      i = offset + nodeid
+      if 'leaf' in nodo:
+        planos['valor'][i] = nodo['leaf']
+        continue
+      split = nodo['split']
+      planos['feature'][i] = indice[split] if split in indice else int(split.lstrip('f'))
+      planos['umbral'][i] = nodo['split_condition']
+      planos['si'][i] = offset + nodo['yes']
+      planos['no'][i] = offset + nodo['no']
+      planos['faltante'][i] = offset + nodo['missing']
+    offset = offset + max(nodos) + 1
+  return planos
+
+def _booster(modelo):
+  """Booster de un XGBClassifier / XGBRegressor o de un Booster."""
+  return modelo.get_booster() if hasattr(modelo, 'get_booster') else modelo
+
+def _float_xgb(valor):
+  """Número de la configuración json de xgboost: '5E-1' hasta la 1.x, '[5E-1]' (un vector de un elemento) desde la 2.0."""
+  if isinstance(valor, str):
+    valor = valor.strip().strip('[]').split(',')[0]
+  return float(valor)
+
+def _carga_pickle(ruta):
+  """
+  Modelo pickleado. Los .dat de v2 son de xgboost < 1.0 y el pickle de un xgboost más nuevo no los abre: en ese caso se toma el modelo binario
+  que guarda el pickle y se carga con Booster.load_model (el formato binario viejo lo leen las versiones 1.x, no las 2.0 en adelante)
+  """
+  import pickle
+  import xgboost as xgb
+  try:
+    with open(ruta, 'rb') as f:
+      return pickle.load(f)
+  except xgb.core.XGBoostError:
+    pass
+  estados = []
+  setstate = xgb.core.Booster.__setstate__
+  xgb.core.Booster.__setstate__ = lambda booster, estado: estados.append(estado)
+  try:
+    with open(ruta, 'rb') as f:
+      pickle.load(f)
+  finally:
+    xgb.core.Booster.__setstate__ = setstate
+  booster = xgb.Booster()
+  booster.load_model(bytearray(estados[0]['handle']))
+  booster.feature_names = estados[0].get('feature_names')
+  return booster
+
+def _margen_base(base_score, objetivo):
+  """El base_score de xgboost está en la escala de la predicción: para binary:logistic el margen es su logit."""
+  if objetivo == 'binary:logistic':
+    return float(np.log(base_score/(1 - base_score)))
+  return float(base_score)
+
+"""
+EXPORTA MODELO
+Params:
+    modelo: XGBClassifier / XGBRegressor, Booster de xgboost o ruta al .dat pickleado (necesita xgboost instalado, solo acá)
+    carpeta: carpeta donde se guardan los arrays y el json
+    arboles: cantidad de árboles a usar. Si es None, los de la mejor iteración si el modelo se entrenó con early stopping (como predict_proba de xgboost >= 1.4), si no todos
+
+Returns:
+    diccionario de metadatos guardado en modelo.json
+"""
+def exporta_modelo(modelo, carpeta, arboles=None):
+  """Lee features, objetivo y base_score de la configuración del booster y los árboles del dump json."""
+  if isinstance(modelo, str):
+    modelo = _carga_pickle(modelo)
+  booster = _booster(modelo)
+  dump = booster.get_dump(dump_format='json')
+  features = list(booster.feature_names) if booster.feature_names is not None else ['f%d' % i for i in range(booster.num_features())]
+
+  objetivo = getattr(modelo, 'objective', None)
+  base_score = 0.5
+  if hasattr(booster, 'save_config'):
+    config = json.loads(booster.save_config())
+    objetivo = config['learner']['objective']['name']
+    base_score = _float_xgb(config['learner']['learner_model_param']['base_score'])
+  objetivo = objetivo or 'binary:logistic'
+  if objetivo not in OBJETIVOS:
+    raise ValueError("Objetivo no soportado: %s" % objetivo)
+
+  if arboles is None:
+    mejor = booster.attr('best_iteration')
+    arboles = int(mejor) + 1 if mejor is not None else len(dump)
+  planos = _aplana(dump[:arboles], features)
+
+  os.makedirs(carpeta, exist_ok=True)
+  for nombre in ARRAYS:
+    np.save(os.path.join(carpeta, nombre + '.npy'), planos[nombre])
+  metadatos = {'version': VERSION, 'features': features, 'objetivo': objetivo,
+               'margen_base': _margen_base(base_score, objetivo), 'arboles': arboles}
+  with open(os.path.join(carpeta, 'modelo.json'), 'w') as f:
+    json.dump(metadatos, f, indent=1)
+  return metadatos
+
+"""
+MODELO PLANO
+Params:
+    carpeta: carpeta generada por exporta_modelo
+    mmap: si es True los arrays se leen por mmap (no se cargan enteros a memoria, la carga es casi instantánea)
+
+Returns:
+    objeto con predict_proba(X) y predict(X) (como el XGBClassifier para binary:logistic) y feature_names_in_ con el orden de las columnas
+"""
+class ModeloPlano:
+  """Evaluador de los árboles con numpy: todas las filas y todos los árboles bajan un nivel por paso (tantos pasos como la profundidad máxima)."""
+
+  def __init__(self, carpeta, mmap=True):
+    with open(os.path.join(carpeta, 'modelo.json')) as f:
+      metadatos = json.load(f)
+    if metadatos['version'] != VERSION:
+      raise ValueError("Versión de formato %s, se esperaba %s" % (metadatos['version'], VERSION))
+    self.feature_names_in_ = np.array(metadatos['features'], dtype=object)
+    self.objetivo = metadatos['objetivo']
+    self.margen_base = metadatos['margen_base']
+    for nombre in ARRAYS:
+      setattr(self, nombre, np.load(os.path.join(carpeta, nombre + '.npy'), mmap_mode='r' if mmap else None))
+
+  def _matriz(self, X):
+    """Matriz float32 con las columnas en el orden del modelo (xgboost compara en float32). Un DataFrame se reordena por nombre."""
+    if hasattr(X, 'columns'):
+      X = X[list(self.feature_names_in_)].to_numpy(dtype=np.float32)
+    return np.asarray(X, dtype=np.float32).reshape(-1, len(self.feature_names_in_))
+
+  def margen(self, X):
+    """Suma de las hojas de todos los árboles más el margen base (la predicción antes de la sigmoidea)."""
+    X = self._matriz(X)
+    filas = np.arange(len(X))[:, None]
+    pos = np.broadcast_to(np.asarray(self.raiz), (len(X), len(self.raiz))).copy()
+    feature = np.asarray(self.feature)
+    while True:
+      f = feature[pos]
+      internos = f >= 0
+      if not internos.any():
+        break
+      x = X[filas, np.maximum(f, 0)]
+      siguiente = np.where(np.isnan(x), self.faltante[pos], np.where(x < self.umbral[pos], self.si[pos], self.no[pos]))
+      pos = np.where(internos, siguiente, pos)
+    return np.asarray(self.valor)[pos].sum(axis=1, dtype=np.float32) + np.float32(self.margen_base)
+
+  def predict_proba(self, X):
+    """Probabilidades (n, 2) para binary:logistic, como XGBClassifier.predict_proba."""
+    margen = self.margen(X).astype(float)
+    if self.objetivo != 'binary:logistic':
+      raise ValueError("predict_proba solo para binary:logistic (el objetivo es %s)" % self.objetivo)
+    p = 1/(1 + np.exp(-margen))
+    return np.column_stack([1 - p, p])
+
+  def predict(self, X):
+    """Clase (binary:logistic, umbral 0.5) o valor predicho (regresión / logitraw)."""
+    if self.objetivo == 'binary:logistic':
+      return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+    return self.margen(X)
+
+"""
+COMPARA CON XGBOOST
+Params:
+    modelo: el modelo exportado, como en exporta_modelo (necesita xgboost)
+    carpeta: carpeta generada por exporta_modelo
+    X: matriz o DataFrame con las columnas del modelo. Si es None se arman filas con los umbrales de los splits del modelo (cada valor cae justo en un umbral, a un lado o es nulo, así se recorren las dos ramas y la de faltantes)
+    filas: cantidad de filas a armar si X es None
+    semilla: semilla de las filas armadas
+
+Returns:
+    diferencia absoluta máxima entre el margen de ModeloPlano y el de Booster.predict(output_margin=True) con los mismos árboles
+"""
+def compara_con_xgboost(modelo, carpeta, X=None, filas=1000, semilla=0):
+  """Usa el mismo booster que exporta_modelo y corta en la misma cantidad de árboles."""
+  import xgboost as xgb
+  if isinstance(modelo, str):
+    modelo = _carga_pickle(modelo)
+  booster = _booster(modelo)
+  plano = ModeloPlano(carpeta, mmap=False)
+  features = list(plano.feature_names_in_)
+  if X is None:
+    rng = np.random.default_rng(semilla)
+    X = rng.normal(size=(filas, len(features))).astype(np.float32)
+    for j in range(len(features)):
+      umbrales = plano.umbral[plano.feature == j]
+      if len(umbrales):
+        X[:, j] = rng.choice(umbrales, filas) * rng.choice(np.array([1, 1 - 1e-3, 1 + 1e-3], dtype=np.float32), filas)
+    X[rng.random(X.shape) < 0.1] = np.nan
+  else:
+    X = plano._matriz(X)
+  with open(os.path.join(carpeta, 'modelo.json')) as f:
+    arboles = json.load(f)['arboles']
+  esperado = booster.predict(xgb.DMatrix(X, feature_names=features), output_margin=True, iteration_range=(0, arboles))
+  return float(np.max(np.abs(plano.margen(X) - esperado)))
+
+def carga_modelo_plano(carpeta, mmap=True):
+  """Atajo de ModeloPlano(carpeta, mmap)."""
+  return ModeloPlano(carpeta, mmap)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Exporta un modelo XGBoost pickleado a arrays planos")
+  parser.add_argument('modelo', help="ruta al .dat pickleado")
+  parser.add_argument('carpeta', help="carpeta de salida")
+  parser.add_argument('--arboles', type=int, default=None)
+  parser.add_argument('--compara', action='store_true', help="compara el margen con Booster.predict sobre filas armadas con los umbrales del modelo")
+  args = parser.parse_args(argv)
+  print(json.dumps(exporta_modelo(args.modelo, args.carpeta, args.arboles), indent=1))
+  if args.compara:
+    print("Diferencia máxima del margen contra xgboost: %.3g" % compara_con_xgboost(args.modelo, args.carpeta))
+
+if __name__ == '__main__':
+  main()
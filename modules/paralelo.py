@@ -0,0 +1,68 @@
+"""
+Cálculo de features en paralelo: un proceso por ticker
+"""
+
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from modules.almacen import guarda_features
+from modules.instrumentacion import ticker_actual
+from modules.pipeline import calcula_features, une_tickers
+
+def _calcula_ticker(carga, ticker, features, ticker_col, almacen=None):
+  """Trabajo de un ticker (corre en el proceso hijo): carga la base, calcula los features y agrega la columna del ticker. Con almacén, escribe ahí y devuelve solo la cantidad de filas nuevas."""
+  data = carga(ticker)
+  with ticker_actual(ticker):
+    data = calcula_features(data, features)
+  if ticker_col not in data.columns:
+    data.insert(0, ticker_col, ticker)
+  if almacen is not None:
+    return guarda_features(data, almacen, ticker_col).get(ticker, 0)
+  return data
+
+"""
+FEATURES EN PARALELO
+Params:
+    tickers: lista de tickers
+    features: lista de features para calcula_features (ver pipeline.calcula_features)
+    carga: función ticker -> DataFrame con los precios del ticker. Tiene que estar definida a nivel de módulo (se manda a los procesos)
+    ticker_col: the name of the TICKER values column
+    procesos: cantidad de procesos (por defecto, todos los cores)
+    en_vuelo: cantidad máxima de tickers en proceso o esperando ser juntados a la vez (por defecto, el doble de procesos). Acota la memoria de los resultados que todavía no se juntaron
+    une: si es True devuelve una sola base con todos los tickers, si es False la lista de DataFrames
+    almacen: carpeta de un almacén de features (ver almacen.guarda_features). Si se indica, cada proceso escribe su ticker ahí y los datos no vuelven al proceso principal
+
+Returns:
+    (base, errores): base con los tickers que se calcularon bien, en el orden de 'tickers', y diccionario ticker: traceback con los que fallaron. Con almacén, base es un diccionario ticker: filas nuevas escritas
+"""
+def calcula_features_tickers(tickers, features, carga, ticker_col='<TICKER>', procesos=None, en_vuelo=None, une=True, almacen=None):
+  """Manda los tickers al pool de a 'en_vuelo' por vez; un error en un ticker no frena al resto."""
+  procesos = procesos or os.cpu_count() or 1
+  en_vuelo = max(en_vuelo or 2*procesos, 1)
+  tickers = list(tickers)
+  resultados = [None]*len(tickers)
+  errores = {}
+
+  with ProcessPoolExecutor(max_workers=procesos) as pool:
+    pendientes = {}
+    siguiente = 0
+    while siguiente < len(tickers) or pendientes:
+      while siguiente < len(tickers) and len(pendientes) < en_vuelo:
+        futuro = pool.submit(_calcula_ticker, carga, tickers[siguiente], features, ticker_col, almacen)
+        pendientes[futuro] = siguiente
+        siguiente = siguiente + 1
+      listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+      for futuro in listos:
+        i = pendientes.pop(futuro)
+        try:
+          resultados[i] = futuro.result()
+        except Exception:
+          errores[tickers[i]] = traceback.format_exc()
+
+  if almacen is not None:
+    return {ticker: filas for ticker, filas in zip(tickers, resultados) if filas is not None}, errores
+  resultados = [df for df in resultados if df is not None]
+  if une:
+    return (une_tickers(resultados, ticker_col) if resultados else None), errores
+  return resultados, errores
@@ -0,0 +1,335 @@
+"""
+Pipeline de features: se declara qué indicadores se quieren (con sus parámetros) y se calculan resolviendo dependencias, cada intermedio una sola vez
+"""
+
+import inspect
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from modules import indicators_foreign as foreign
+from modules import indicators_mios as mios
+from modules.columnas import agrega_columnas
+from modules.instrumentacion import instrumenta, ticker_actual
+
+"""
+NODO DEL PIPELINE
+Params:
+    funcion: función que recibe data y los parámetros y devuelve data con las columnas agregadas
+    columnas: función de los parámetros (completos) que devuelve la lista de columnas que agrega
+    dependencias: función de los parámetros (completos) que devuelve la lista de features (nombre, parámetros) que tienen que estar en data antes de correr
+    calentamiento: función de los parámetros (completos) que devuelve cuántas filas anteriores necesita cada fila para salir igual que con toda la historia (sin contar las de sus dependencias).
+        None (por defecto) si depende de toda la historia: medias exponenciales, acumulados, estandarización con la media de toda la serie y tendencias AT (el cálculo por bloques los sigue con estado)
+    aproximado: para los que no tienen calentamiento exacto pero sí uno acotado con una tolerancia (medias exponenciales), función de los parámetros y de filas_ewm (com -> filas) que devuelve
+        cuántas filas anteriores necesita. None si ni así se acota (acumulados, estandarización, tendencias AT)
+
+Returns:
+    namedtuple con los cinco campos
+"""
+Nodo = namedtuple('Nodo', ['funcion', 'columnas', 'dependencias', 'calentamiento', 'aproximado'], defaults=[None, None])
+
+def _filas_ventana(periods, inclusive_window):
+  """Filas anteriores que usa una ventana de indicators_foreign (la no inclusiva termina en la fila anterior)."""
+  return periods - 1 if inclusive_window else periods
+
+def _sin_dependencias(params):
+  return []
+
+def agrega_true_range(data, open_col='<OPEN>', high_col='<HIGH>', low_col='<LOW>', close_col='<CLOSE>', return_new_only=False, compact=False):
+  """Agrega la columna 'true_range' (intermedio compartido por average_true_range y directional_movement_index)."""
+  return agrega_columnas(data, {'true_range': foreign._true_range(data, open_col, high_col, low_col, close_col)}, return_new_only, compact)
+
+"""
+REGISTRO DE FEATURES
+Cada entrada es nombre: Nodo. Los nombres son los de las funciones de indicators_foreign e indicators_mios (más 'true_range')
+"""
+FEATURES = {
+  # indicators_foreign
+  'ema': Nodo(foreign.ema, lambda p: ['ema' + str(p['period'])], _sin_dependencias, aproximado=lambda p, w: max(w(p['period']), p['period'])),
+  'macd': Nodo(foreign.macd, lambda p: ['macd_val', 'macd_signal_line', 'macd_histog'],
+               lambda p: [('ema', {'period': p['period_long'], 'column': p['column']}),
+                          ('ema', {'period': p['period_short'], 'column': p['column']})],
+               aproximado=lambda p, w: w(p['period_signal'])),
+  'acc_dist': Nodo(foreign.acc_dist, lambda p: ['acc_dist', 'acc_dist_ema' + str(p['trend_periods'])], _sin_dependencias),
+  'on_balance_volume': Nodo(foreign.on_balance_volume, lambda p: ['obv', 'obv_ema' + str(p['trend_periods'])], _sin_dependencias),
+  'price_volume_trend': Nodo(foreign.price_volume_trend, lambda p: ['pvt', 'pvt_ema' + str(p['trend_periods'])], _sin_dependencias),
+  'true_range': Nodo(agrega_true_range, lambda p: ['true_range'], _sin_dependencias, calentamiento=lambda p: 1),
+  'average_true_range': Nodo(foreign.average_true_range, lambda p: ['atr'] + ([] if p['drop_tr'] else ['true_range']),
+                             lambda p: [('true_range', {'open_col': p['open_col'], 'high_col': p['high_col'], 'low_col': p['low_col'], 'close_col': p['close_col']})],
+                             aproximado=lambda p, w: w(p['trend_periods'])),
+  'bollinger_bands': Nodo(foreign.bollinger_bands, lambda p: ['bol_bands_middle', 'bol_bands_upper', 'bol_bands_lower'], _sin_dependencias,
+                          aproximado=lambda p, w: max(w(p['trend_periods']), _filas_ventana(p['trend_periods'], p['inclusive_window']))),
+  'chaikin_oscillator': Nodo(foreign.chaikin_oscillator, lambda p: ['ch_osc'], _sin_dependencias),
+  'typical_price': Nodo(foreign.typical_price, lambda p: ['typical_price'], _sin_dependencias, calentamiento=lambda p: 0),
+  'ease_of_movement': Nodo(foreign.ease_of_movement, lambda p: ['emv', 'emv_ema_' + str(p['period'])], _sin_dependencias, aproximado=lambda p, w: w(p['period']) + 1),
+  'mass_index': Nodo(foreign.mass_index, lambda p: ['mass_index'], _sin_dependencias,
+                     aproximado=lambda p, w: 2*w(p['ema_period']) + _filas_ventana(p['period'], p['inclusive_window'])),
+  'directional_movement_index': Nodo(foreign.directional_movement_index, lambda p: ['di_plus', 'di_minus', 'dxi', 'adx'],
+                                     lambda p: [('true_range', {'high_col': p['high_col'], 'low_col': p['low_col']})],
+                                     aproximado=lambda p, w: 2*w(p['periods']) + 1),
+  'money_flow_index': Nodo(foreign.money_flow_index, lambda p: ['money_flow_index'], lambda p: [('typical_price', {})],
+                           calentamiento=lambda p: _filas_ventana(p['periods'], p['inclusive_window']) + 1),
+  'negative_volume_index': Nodo(foreign.negative_volume_index, lambda p: ['nvi', 'nvi_ema'], _sin_dependencias),
+  'positive_volume_index': Nodo(foreign.positive_volume_index, lambda p: ['pvi', 'pvi_ema'], _sin_dependencias),
+  'momentum': Nodo(foreign.momentum, lambda p: ['momentum'], _sin_dependencias, calentamiento=lambda p: p['periods']),
+  'rsi': Nodo(foreign.rsi, lambda p: ['rsi'], _sin_dependencias, aproximado=lambda p, w: w(p['periods']) + p['periods']),
+  'chaikin_volatility': Nodo(foreign.chaikin_volatility, lambda p: ['chaikin_volatility'], _sin_dependencias,
+                             aproximado=lambda p, w: w(p['ema_periods']) + p['change_periods']),
+  'williams_ad': Nodo(foreign.williams_ad, lambda p: ['williams_ad'], _sin_dependencias),
+  'williams_r': Nodo(foreign.williams_r, lambda p: ['williams_r'], _sin_dependencias,
+                     calentamiento=lambda p: p['periods'] - 1 if p['inclusive_window'] else p['periods'] + 1),
+  'trix': Nodo(foreign.trix, lambda p: ['trix', 'trix_signal'], _sin_dependencias, aproximado=lambda p, w: 3*w(p['periods']) + w(p['signal_periods'])),
+  'ultimate_oscillator': Nodo(foreign.ultimate_oscillator, lambda p: ['ultimate_oscillator'], _sin_dependencias,
+                              calentamiento=lambda p: _filas_ventana(max(p['period_1'], p['period_2'], p['period_3']), p['inclusive_window']) + 1),
+  # indicators_mios
+  'calcula_amplitud': Nodo(mios.calcula_amplitud, lambda p: [p['nombre']], _sin_dependencias, calentamiento=lambda p: 0),
+  'calcula_pc_merval': Nodo(mios.calcula_pc_merval, lambda p: ['pc_merval'], _sin_dependencias, calentamiento=lambda p: 0),
+  'calcula_medias': Nodo(mios.calcula_medias, lambda p: ['exp1', 'exp2', 'macd', 'exp3', 'histog'], _sin_dependencias, aproximado=lambda p, w: w(12.5) + 26 + w(4)),
+  'estandariza_volumen': Nodo(mios.estandariza_volumen, lambda p: ['vol_std'], _sin_dependencias),
+  'calcula_historia': Nodo(mios.calcula_historia, lambda p: _columnas_historia(p), _sin_dependencias,
+                           calentamiento=lambda p: max([lag for _, lag in mios._pares_historia(p['columnas'], p['lags'], p['pares'])], default=0)),
+  'calcula_canalidad_y': Nodo(mios.calcula_canalidad_y,
+                              lambda p: [col % ventana for ventana in p['lista_ventanas'] for col in ('nu_dias_y_entre_max_min_%s', 'nu_dias_y_entre_5pc_%s')],
+                              _sin_dependencias, calentamiento=lambda p: max(p['lista_ventanas'])),
+  'calcula_canalidad_histog_macd': Nodo(mios.calcula_canalidad_histog_macd,
+                                        lambda p: [col % ventana for ventana in p['lista_ventanas'] for col in ('nu_dias_histog_entre_5pc_%s', 'nu_dias_histog_positivo_%s', 'nu_dias_histog_negativo_%s', 'nu_dias_histog_mismo_signo_%s')],
+                                        lambda p: [('macd', {})] if p['histog_col'] == 'macd_histog' else [],
+                                        calentamiento=lambda p: max(p['lista_ventanas'])),
+  'calcula_AT_tendencias': Nodo(mios.calcula_AT_tendencias, lambda p: _columnas_AT([p['lags']]), _sin_dependencias),
+  'calcula_AT_tendencias_lags': Nodo(mios.calcula_AT_tendencias_lags, lambda p: _columnas_AT(p['lista_lags']), _sin_dependencias),
+}
+
+def _columnas_AT(lista_lags):
+  """Columnas que agrega calcula_AT_tendencias para cada lag."""
+  columnas = []
+  for lags in lista_lags:
+    for tipo in ('techo', 'piso'):
+      columnas += ['nu_pruebas_%s_vivo_mas_probado_%s' % (tipo, lags),
+                   'precio_proyectado_%s_vivo_mas_probado_%s' % (tipo, lags),
+                   'precio_proyectado_%s_vivo_mas_cercano_%s' % (tipo, lags),
+                   'precio_proyectado_%s_muerto_mas_cercano_%s' % (tipo, lags),
+                   'tendencia_%s_vivo_mas_probado_%s' % (tipo, lags)]
+  return columnas
+
+def _columnas_historia(params):
+  """Columnas de calcula_historia. En el pipeline hay que indicar columnas o pares (las 'desde la séptima' dependen de data)."""
+  if params['pares'] is None and params['columnas'] is None:
+    raise ValueError("calcula_historia en el pipeline necesita columnas o pares")
+  return ['var_%s_%s' % par for par in mios._pares_historia(params['columnas'], params['lags'], params['pares'])]
+
+def _normaliza(feature):
+  """Acepta 'nombre' o ('nombre', {parámetros}) y devuelve (nombre, parámetros completos con los defaults de la función)."""
+  nombre, params = (feature, {}) if isinstance(feature, str) else feature
+  if nombre not in FEATURES:
+    raise KeyError("Feature desconocido: %s" % nombre)
+  firma = {k: v for k, v in inspect.signature(FEATURES[nombre].funcion).parameters.items() if k not in ('data', 'return_new_only', 'compact')}
+  desconocidos = set(params) - set(firma)
+  if desconocidos:
+    raise TypeError("%s no tiene los parámetros %s" % (nombre, sorted(desconocidos)))
+  faltan = [k for k, v in firma.items() if v.default is inspect.Parameter.empty and k not in params]
+  if faltan:
+    raise TypeError("%s necesita los parámetros %s" % (nombre, faltan))
+  completos = {k: v.default for k, v in firma.items() if v.default is not inspect.Parameter.empty}
+  completos.update(params)
+  return nombre, completos
+
+def _clave(nombre, params):
+  """Clave hasheable de un feature (las listas se pasan a tuplas)."""
+  return (nombre, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())))
+
+"""
+PLAN DE FEATURES
+Params:
+    features: lista de features pedidos, cada uno 'nombre' o ('nombre', {parámetros})
+
+Returns:
+    lista ordenada (dependencias primero, sin repetidos) de tuplas (nombre, parámetros completos, pedido) donde pedido indica si el usuario lo pidió o es un intermedio
+"""
+def plan_features(features):
+  """Resuelve las dependencias del registro con una búsqueda en profundidad: cada nodo aparece una sola vez, después de sus dependencias."""
+  plan = []
+  indices = {}
+  en_curso = set()
+
+  def visita(nombre, params, pedido):
+    clave = _clave(nombre, params)
+    if clave in indices:
+      if pedido:
+        i = indices[clave]
+        plan[i] = (plan[i][0], plan[i][1], True)
+      return
+    if clave in en_curso:
+      raise ValueError("Dependencia circular en %s" % nombre)
+    en_curso.add(clave)
+    for dependencia in FEATURES[nombre].dependencias(params):
+      visita(*_normaliza(dependencia), False)
+    en_curso.discard(clave)
+    indices[clave] = len(plan)
+    plan.append((nombre, params, pedido))
+
+  for feature in features:
+    visita(*_normaliza(feature), True)
+  return plan
+
+"""
+FILAS DE UNA MEDIA EXPONENCIAL
+Params:
+    com: center of mass de la media (como en pandas ewm, alfa = 1/(1+com))
+    tolerancia: diferencia máxima admitida con la media de toda la historia, relativa al mayor valor absoluto de la entrada
+
+Returns:
+    cantidad de filas anteriores a partir de la cual la media (adjust=True, o adjust=False contando desde su primer valor) cumple la tolerancia: lo que pesa la historia descartada es (1-alfa)^filas del total,
+    y la diferencia queda acotada por 2 * (1-alfa)^filas * max|x|
+"""
+def filas_ewm(com, tolerancia):
+  """Despeja filas de 2 * (1-alfa)^filas <= tolerancia."""
+  if com <= 0:
+    return 0
+  return int(np.ceil(np.log(tolerancia/2)/np.log(com/(1 + com))))
+
+def _usados(plan, columnas):
+  """Claves de los nodos del plan que hay que calcular: los pedidos y las dependencias de los que se calculan, salvo los que ya tienen todas sus columnas en data."""
+  columnas = set(columnas)
+  usados = set()
+  dependencias = set()
+  for nombre, params, pedido in reversed(plan):
+    clave = _clave(nombre, params)
+    if (pedido or clave in dependencias) and not all(columna in columnas for columna in FEATURES[nombre].columnas(params)):
+      usados.add(clave)
+      dependencias.update(_clave(*_normaliza(dependencia)) for dependencia in FEATURES[nombre].dependencias(params))
+  return usados
+
+"""
+CALENTAMIENTO DE FEATURES
+Params:
+    features: lista de features pedidos, como en calcula_features
+    columnas: columnas que ya trae data (los features que ya están no se calculan, y tampoco hace falta calentar sus dependencias)
+    tolerancia: si es None el calentamiento es exacto (mismo resultado bit a bit). Si se indica, los features con medias exponenciales se aceptan con el calentamiento
+        que deja cada media exponencial a menos de tolerancia (relativa al mayor valor absoluto de su entrada, ver filas_ewm) de la calculada con toda la historia.
+        Donde se encadenan medias (macd, trix, mass_index...) los errores se suman, y los cocientes (rsi, chaikin_volatility...) los amplifican
+
+Returns:
+    cantidad de filas anteriores que necesita cada fila para que los features pedidos salgan idénticos (o dentro de la tolerancia) a calcularlos con toda la historia (el calentamiento de un feature más el mayor de sus dependencias).
+    ValueError si alguno depende de toda la historia
+"""
+def calentamiento_features(features, columnas=(), tolerancia=None):
+  """Recorre el plan en orden (las dependencias primero), así el calentamiento de cada dependencia ya está calculado cuando se lo necesita. Los intermedios que solo usan features que ya están en data no cuentan (no se calculan)."""
+  columnas = set(columnas)
+  plan = plan_features(features)
+  usados = _usados(plan, columnas)
+  filas = {}
+  sin_limite = []
+  for nombre, params, pedido in plan:
+    nodo = FEATURES[nombre]
+    if _clave(nombre, params) not in usados:
+      filas[_clave(nombre, params)] = 0
+      continue
+    propio = nodo.calentamiento(params) if nodo.calentamiento is not None else None
+    if propio is None and tolerancia is not None and nodo.aproximado is not None:
+      propio = nodo.aproximado(params, lambda com: filas_ewm(com, tolerancia))
+    if propio is None:
+      sin_limite.append(nombre)
+      continue
+    previas = [filas.get(_clave(*_normaliza(dependencia))) for dependencia in nodo.dependencias(params)]
+    filas[_clave(nombre, params)] = None if None in previas else propio + max(previas, default=0)
+  if sin_limite:
+    aproximables = sorted({nombre for nombre in sin_limite if FEATURES[nombre].aproximado is not None}) if tolerancia is None else []
+    raise ValueError("Estos features dependen de toda la historia y no se pueden calcular por bloques: %s%s" % (sorted(set(sin_limite)),
+                     "" if not aproximables else " (%s se pueden calcular con una tolerancia)" % aproximables))
+  return max(filas.values(), default=0)
+
+"""
+CALCULA FEATURES
+Params:
+    data: pandas DataFrame con las columnas de precios
+    features: lista de features pedidos, cada uno 'nombre' o ('nombre', {parámetros}). Ej: ['rsi', ('macd', {'period_signal': 5}), ('calcula_AT_tendencias_lags', {'lista_lags': [30, 8]})]
+
+    ticker_col: si se indica, data es un panel (formato largo) con varios tickers en esa columna y cada ticker se calcula por separado
+    return_new_only: si es True devuelve solo las columnas de los features pedidos (DataFrame con el índice de data)
+    compact: si es True las columnas de los features son float32 / el entero más chico que alcanza. Los intermedios se calculan siempre en float64, se compacta solo al final
+
+Returns:
+    copy of 'data' DataFrame con las columnas de los features pedidos. Los intermedios (ema de un macd, true_range, typical_price...) se calculan una vez y no quedan si nadie los pidió
+"""
+@instrumenta
+def calcula_features(data, features, ticker_col=None, return_new_only=False, compact=False):
+  """Corre el plan en orden: cada nodo devuelve solo sus columnas nuevas, que se juntan y se pegan a data una sola vez al final. Un nodo cuyas columnas ya están en data no se recalcula, ni los intermedios que solo él usaba."""
+  if ticker_col is not None:
+    return calcula_por_ticker(data, calcula_features, ticker_col, features=features, return_new_only=return_new_only, compact=compact)
+  plan = plan_features(features)
+  usados = _usados(plan, data.columns)
+  origen = {}
+  temporales = set()
+  pedidas = set()
+  calculadas = {}
+  for nombre, params, pedido in plan:
+    nodo = FEATURES[nombre]
+    columnas = nodo.columnas(params)
+    clave = _clave(nombre, params)
+    # Una columna de una dependencia declarada (ej. true_range de average_true_range con drop_tr=False) es la misma, no un choque
+    de_dependencias = {columna for dependencia in nodo.dependencias(params) for columna in FEATURES[dependencia[0]].columnas(_normaliza(dependencia)[1])}
+    for columna in columnas:
+      if columna in de_dependencias:
+        continue
+      if origen.get(columna, clave) != clave:
+        raise ValueError("La columna %s la generan dos features distintos: %s y %s" % (columna, origen[columna][0], nombre))
+      origen[columna] = clave
+    if pedido:
+      pedidas.update(columnas)
+    else:
+      temporales.update(columnas)
+    if clave not in usados or all(columna in calculadas for columna in columnas):
+      continue
+    # Los intermedios que usa el nodo se le pegan a su entrada (solo los que necesita)
+    entrada = data
+    necesarias = [columna for dependencia in nodo.dependencias(params) for columna in FEATURES[dependencia[0]].columnas(_normaliza(dependencia)[1])
+                  if columna in calculadas and columna not in data.columns]
+    if necesarias:
+      entrada = agrega_columnas(data, {columna: calculadas[columna] for columna in necesarias})
+    nuevas = nodo.funcion(entrada, return_new_only=True, **params)
+    for columna in nuevas.columns:
+      calculadas[columna] = nuevas[columna].values
+  quedan = {columna: valores for columna, valores in calculadas.items() if columna in pedidas or columna not in temporales}
+  return agrega_columnas(data, quedan, return_new_only, compact)
+
+"""
+CÁLCULO POR TICKER (PANEL)
+Params:
+    data: pandas DataFrame en formato largo, con las filas de cada ticker en orden cronológico (los tickers pueden estar intercalados)
+    funcion: cualquier función de indicators_foreign, indicators_mios o calcula_features (recibe data y devuelve data con columnas agregadas)
+    ticker_col: the name of the TICKER values column
+    params: parámetros de la función
+
+Returns:
+    copy of 'data' DataFrame con las columnas de la función, calculadas dentro de cada ticker (las ventanas, lags y medias exponenciales arrancan de cero en cada uno) y con las filas en el orden original.
+    Es un despachador por ticker, no un cálculo agrupado: los indicadores no saben de tickers y corren una vez por cada uno (el costo de Python crece con la cantidad de tickers, no con las filas),
+    así que el resultado de cada ticker es exactamente el de la función sobre ese ticker solo
+"""
+def calcula_por_ticker(data, funcion, ticker_col='<TICKER>', **params):
+  """Aplica la función a cada ticker (marcando sus eventos de instrumentación con el ticker) y une los resultados con una sola concatenación (no se copia la base entera por cada ticker)."""
+  grupos = data.groupby(ticker_col, sort=False, dropna=False).indices
+  if len(grupos) <= 1:
+    with ticker_actual(next(iter(grupos), None)):
+      return funcion(data.copy(), **params)
+  partes = []
+  for ticker, posiciones in grupos.items():
+    with ticker_actual(ticker):
+      partes.append(funcion(data.iloc[posiciones].copy(), **params))
+  orden = np.concatenate(list(grupos.values()))
+  return pd.concat(partes).iloc[np.argsort(orden, kind='stable')]
+
+"""
+UNIÓN DE TICKERS
+Params:
+    bases: diccionario ticker: DataFrame (o lista de DataFrames que ya tienen la columna del ticker)
+    ticker_col: the name of the TICKER values column
+
+Returns:
+    DataFrame en formato largo con todos los tickers, armado con una sola concatenación (reemplaza el base = base.append(df) dentro del loop de tickers)
+"""
+def une_tickers(bases, ticker_col='<TICKER>'):
+  """Agrega la columna del ticker si hace falta y concatena una sola vez."""
+  if isinstance(bases, dict):
+    bases = [df.assign(**{ticker_col: ticker}) if ticker_col not in df.columns else df for ticker, df in bases.items()]
+  return pd.concat(list(bases))
@@ -0,0 +1,267 @@
+"""
+Cálculo de features por bloques, para bases que no entran en memoria (ej. barras de un minuto de todo el universo): la entrada se lee de a bloques de un parquet,
+cada bloque se calcula con las filas de calentamiento que necesitan los features (las últimas de cada ticker del bloque anterior) y la salida se escribe bloque a bloque.
+Los features que dependen de toda la historia (medias exponenciales, acumulados, tendencias AT) se siguen con el estado de los indicadores de indicators_stream de cada ticker:
+el primer bloque de cada ticker se calcula por lotes y siembra el estado, y los siguientes se actualizan fila a fila. estandariza_volumen y calcula_medias usan además un resumen
+de toda la serie del ticker (la media y el desvío del volumen, los inicios de las medias simples) que se arma en una primera pasada que lee solo esa columna.
+El resultado es idéntico, bit a bit, al de calcula_features sobre la base entera. Con una tolerancia, las medias exponenciales se calculan en cambio con calentamiento (ver
+pipeline.calentamiento_features): más rápido, porque no se recorre fila a fila, pero ya no idéntico
+
+Uso:
+    python -m modules.por_bloques minutos.parquet features.parquet --features features.json --ticker_col ticker
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from modules import indicators_mios as mios
+from modules import indicators_stream as stream
+from modules.instrumentacion import ticker_actual
+from modules.pipeline import FEATURES, calcula_features, calentamiento_features, plan_features, _clave, _normaliza
+
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = None
+
+def _requiere_pyarrow():
+  if pa is None:
+    raise ImportError("El cálculo por bloques necesita pyarrow (pip install pyarrow)")
+
+def _lee_bloques(entradas, filas_bloque, columnas):
+  """Bloques (DataFrames) de los parquets en orden. pyarrow lee de a row group, así que la memoria de la lectura es la de un row group más un bloque."""
+  for entrada in entradas:
+    for lote in pq.ParquetFile(entrada).iter_batches(batch_size=filas_bloque, columns=columnas):
+      yield lote.to_pandas()
+
+"""
+VOLUMEN ESTANDARIZADO CON TODA LA SERIE
+Params:
+    vol_col: the name of the VOLUME values column
+    media, desvio: los de indicators_mios._media_desvio sobre el volumen de toda la serie del ticker
+
+Returns:
+    actualiza_bloque(data) devuelve {'vol_std': valores}, igual que estandariza_volumen sobre toda la serie
+"""
+class _VolumenGlobal:
+  """La media y el desvío vienen de la primera pasada: cada bloque se estandariza solo."""
+
+  def __init__(self, vol_col, media, desvio):
+    self.vol_col = vol_col
+    self.media = media
+    self.desvio = desvio
+
+  def semilla(self, data):
+    return self
+
+  def actualiza_bloque(self, data):
+    return {'vol_std': ((data[self.vol_col] - self.media)/self.desvio).values}
+
+# Features que se siguen con estado en vez de calentamiento: los indicadores de cada ticker, a partir de los parámetros del feature
+CON_ESTADO = {'ema': lambda p: [stream.Ema(p['period'], p['column'])],
+              'macd': lambda p: [stream.Macd(p['period_long'], p['period_short'], p['period_signal'], p['column'])],
+              'acc_dist': lambda p: [stream.AccDist(p['trend_periods'], p['high_col'], p['low_col'], p['close_col'], p['vol_col'])],
+              'on_balance_volume': lambda p: [stream.Obv(p['trend_periods'], p['close_col'], p['vol_col'])],
+              'price_volume_trend': lambda p: [stream.Pvt(p['trend_periods'], p['close_col'], p['vol_col'])],
+              'average_true_range': lambda p: [stream.Atr(p['trend_periods'], p['open_col'], p['high_col'], p['low_col'], p['close_col'])],
+              'bollinger_bands': lambda p: [stream.BollingerBands(p['trend_periods'], p['close_col'], p['inclusive_window'])],
+              'chaikin_oscillator': lambda p: [stream.ChaikinOscillator(p['periods_short'], p['periods_long'], p['high_col'], p['low_col'], p['close_col'], p['vol_col'])],
+              'ease_of_movement': lambda p: [stream.EaseOfMovement(p['period'], p['high_col'], p['low_col'], p['vol_col'])],
+              'mass_index': lambda p: [stream.MassIndex(p['period'], p['ema_period'], p['high_col'], p['low_col'], p['inclusive_window'])],
+              'directional_movement_index': lambda p: [stream.Dmi(p['periods'], p['high_col'], p['low_col'])],
+              'negative_volume_index': lambda p: [stream.Nvi(p['periods'], p['close_col'], p['vol_col'])],
+              'positive_volume_index': lambda p: [stream.Pvi(p['periods'], p['close_col'], p['vol_col'])],
+              'rsi': lambda p: [stream.Rsi(p['periods'], p['close_col'])],
+              'chaikin_volatility': lambda p: [stream.ChaikinVolatility(p['ema_periods'], p['change_periods'], p['high_col'], p['low_col'])],
+              'williams_ad': lambda p: [stream.WilliamsAd(p['high_col'], p['low_col'], p['close_col'])],
+              'trix': lambda p: [stream.Trix(p['periods'], p['signal_periods'], p['close_col'])],
+              'calcula_AT_tendencias': lambda p: [stream.TendenciasAT(p['lags'], p['close_col'], p['date_col'])],
+              'calcula_AT_tendencias_lags': lambda p: [stream.TendenciasAT(lags, p['close_col'], p['date_col']) for lags in p['lista_lags']]}
+
+# Features con estado que usan un resumen de toda la serie del ticker: la columna que se lee en la primera pasada, el resumen y los indicadores que lo usan
+CON_RESUMEN = {'estandariza_volumen': (lambda p: p['vol_col'], mios._media_desvio, lambda p, resumen: [_VolumenGlobal(p['vol_col'], *resumen)]),
+               'calcula_medias': (lambda p: p['close_col'], lambda valores: mios._inicios_medias(valores.astype(float)),
+                                  lambda p, resumen: [stream.Medias(p['close_col'], resumen)])}
+
+def _con_estado(features, columnas, tolerancia):
+  """
+  Nodos del plan que se siguen con estado: los que hay que calcular y no tienen calentamiento (con tolerancia, tampoco uno aproximado). Sus dependencias no cuentan,
+  el estado sale de las columnas de la entrada (los que ya están en la entrada no se calculan, como en calcula_features)
+  """
+  columnas = set(columnas)
+  con_estado = []
+  dependencias = set()
+  for nombre, params, pedido in reversed(plan_features(features)):
+    nodo = FEATURES[nombre]
+    if not (pedido or _clave(nombre, params) in dependencias) or all(columna in columnas for columna in nodo.columnas(params)):
+      continue
+    if nodo.calentamiento is None and (tolerancia is None or nodo.aproximado is None) and (nombre in CON_ESTADO or nombre in CON_RESUMEN):
+      if params.get('ultimas_filas') is not None or params.get('picos') is not None:
+        raise ValueError("%s por bloques calcula todas las filas, no acepta ultimas_filas ni picos" % nombre)
+      con_estado.insert(0, (nombre, params))
+      continue
+    dependencias.update(_clave(*_normaliza(dependencia)) for dependencia in nodo.dependencias(params))
+  return con_estado
+
+def _resumenes(entradas, filas_bloque, con_estado, ticker_col):
+  """Primera pasada: lee solo ticker_col y las columnas de los features con resumen, y devuelve el resumen de cada ticker para cada uno. La memoria es la de esas columnas enteras."""
+  con_resumen = [(nombre, params) for nombre, params in con_estado if nombre in CON_RESUMEN]
+  if not con_resumen:
+    return {}
+  leer = list(dict.fromkeys(CON_RESUMEN[nombre][0](params) for nombre, params in con_resumen))
+  series = {}
+  for bloque in _lee_bloques(entradas, filas_bloque, leer + ([] if ticker_col is None or ticker_col in leer else [ticker_col])):
+    grupos = {None: np.arange(len(bloque))} if ticker_col is None else bloque.groupby(ticker_col, sort=False, dropna=False).indices
+    for ticker, posiciones in grupos.items():
+      for columna in leer:
+        series.setdefault((ticker, columna), []).append(bloque[columna].values[posiciones])
+  resumenes = {}
+  for (ticker, columna), partes in series.items():
+    valores = np.concatenate(partes)
+    for nombre, params in con_resumen:
+      if CON_RESUMEN[nombre][0](params) == columna:
+        resumenes[(ticker, _clave(nombre, params))] = CON_RESUMEN[nombre][1](valores)
+  return resumenes
+
+def _indicadores(ticker, con_estado, resumenes):
+  """Los indicadores de un ticker nuevo: (columnas del feature, indicadores, si se siembran con el primer bloque calculado por lotes) por cada feature con estado."""
+  indicadores = []
+  for nombre, params in con_estado:
+    if nombre in CON_RESUMEN:
+      indicadores.append((FEATURES[nombre].columnas(params), CON_RESUMEN[nombre][2](params, resumenes[(ticker, _clave(nombre, params))]), False))
+    else:
+      indicadores.append((FEATURES[nombre].columnas(params), CON_ESTADO[nombre](params), True))
+  return indicadores
+
+def _actualiza(indicador, actual, barras):
+  """Las columnas del indicador para las filas de actual: por bloque si el indicador lo permite, si no fila a fila."""
+  if hasattr(indicador, 'actualiza_bloque'):
+    return indicador.actualiza_bloque(actual)
+  salidas = [indicador.actualiza(barra) for barra in barras]
+  return {columna: np.array([salida[columna] for salida in salidas], dtype=float) for columna in salidas[0]}
+
+def _orden_columnas(features, columnas, conservar, return_new_only):
+  """Columnas de la salida en el orden de calcula_features: las de la entrada (o solo las que se conservan) y las nuevas en el orden del plan."""
+  nuevas = []
+  for nombre, params, pedido in plan_features(features):
+    if pedido:
+      nuevas += [columna for columna in FEATURES[nombre].columnas(params) if columna not in columnas and columna not in nuevas]
+  return (conservar if return_new_only else list(columnas)) + nuevas
+
+def _calcula_bloque(bloque, features, con_estado, ticker_col, colas, estados, resumenes, calentamiento, orden):
+  """
+  Calcula un bloque: cada ticker con su cola (las últimas filas del bloque anterior, con las columnas de los features con estado) adelante, y se descartan las filas de la cola.
+  Los features con estado se agregan antes desde el estado del ticker; en su primer bloque los que se siembran se calculan por lotes con el resto (pedidos, para que queden en la cola).
+  Actualiza colas con las últimas 'calentamiento' filas de cada ticker y devuelve el bloque calculado en el orden de sus filas
+  """
+  if ticker_col is None:
+    grupos = {None: np.arange(len(bloque))}
+  else:
+    grupos = bloque.groupby(ticker_col, sort=False, dropna=False).indices
+  pedidos = list(features) + con_estado
+  partes = []
+  for ticker, posiciones in grupos.items():
+    actual = bloque.iloc[posiciones]
+    with ticker_actual(ticker):
+      nuevo = ticker not in estados
+      if nuevo:
+        estados[ticker] = _indicadores(ticker, con_estado, resumenes)
+      columnas_estado = {}
+      barras = None
+      for columnas, indicadores, se_siembra in estados[ticker]:
+        if nuevo and se_siembra:
+          continue
+        for indicador in indicadores:
+          if barras is None and not hasattr(indicador, 'actualiza_bloque'):
+            barras = actual.to_dict('records')
+          salida = _actualiza(indicador, actual, barras)
+          columnas_estado.update({columna: salida[columna] for columna in columnas if columna in salida and columna not in actual.columns})
+      if columnas_estado:
+        actual = pd.concat([actual, pd.DataFrame(columnas_estado, index=actual.index)], axis=1)
+      cola = colas.get(ticker)
+      entrada = actual if cola is None or len(cola) == 0 else pd.concat([cola, actual])
+      calculado = calcula_features(entrada, pedidos)
+      if nuevo:
+        for columnas, indicadores, se_siembra in estados[ticker]:
+          if se_siembra:
+            for indicador in indicadores:
+              indicador.semilla(actual)
+    columnas_cola = list(bloque.columns) + [columna for columnas, _, _ in estados[ticker] for columna in columnas if columna not in bloque.columns]
+    colas[ticker] = calculado[columnas_cola].iloc[max(len(calculado) - calentamiento, 0):]
+    partes.append(calculado[orden].iloc[len(entrada) - len(actual):])
+  if len(partes) == 1:
+    return partes[0]
+  orden_filas = np.concatenate(list(grupos.values()))
+  return pd.concat(partes).iloc[np.argsort(orden_filas, kind='stable')]
+
+"""
+FEATURES POR BLOQUES
+Params:
+    entrada: ruta a un parquet (o lista de rutas, que se leen en orden) con las columnas de precios. Las filas de cada ticker tienen que estar en orden cronológico (los tickers pueden estar intercalados, ej. ordenado por fecha)
+    salida: ruta del parquet que se escribe
+    features: lista de features pedidos, como en pipeline.calcula_features. Los que dependen de toda la historia se siguen con estado (ver CON_ESTADO y CON_RESUMEN)
+    filas_bloque: cantidad de filas de entrada por bloque
+    ticker_col: si se indica, la entrada es un panel con varios tickers en esa columna y cada ticker se calcula por separado (como calcula_features con ticker_col)
+    columnas: columnas de la entrada a leer. Si es None, todas
+    return_new_only: si es True se escriben solo las columnas de los features pedidos, más ticker_col y date_col para identificar las filas
+    tolerancia: si es None la salida es idéntica a la de calcula_features. Si se indica, las medias exponenciales se calculan con el calentamiento de pipeline.calentamiento_features
+        en vez de fila a fila con estado: más rápido, con diferencias acotadas por la tolerancia. Los acumulados, estandariza_volumen y las tendencias AT siguen con estado
+    date_col: columna de fecha de la entrada, que se conserva con return_new_only (si está)
+
+Returns:
+    diccionario con las filas escritas, la cantidad de bloques y las filas de calentamiento por ticker. La memoria queda acotada por un bloque calculado más calentamiento filas de entrada
+    y el estado de los features con estado por ticker (más, en la primera pasada de estandariza_volumen y calcula_medias, la columna que leen entera)
+"""
+def calcula_features_por_bloques(entrada, salida, features, filas_bloque=1000000, ticker_col=None, columnas=None, return_new_only=False, tolerancia=None, date_col='<FC>'):
+  """Lee, calcula y escribe de a un bloque: el ParquetWriter fija el esquema con el primer bloque y cada bloque siguiente se escribe como un row group más."""
+  _requiere_pyarrow()
+  entradas = [entrada] if isinstance(entrada, str) else list(entrada)
+  disponibles = pq.read_schema(entradas[0]).names if columnas is None else list(columnas)
+  con_estado = _con_estado(features, disponibles, tolerancia)
+  calentamiento = calentamiento_features(features, disponibles + [columna for nombre, params in con_estado for columna in FEATURES[nombre].columnas(params)], tolerancia)
+  conservar = [columna for columna in (ticker_col, date_col) if columna is not None and columna in disponibles]
+  orden = _orden_columnas(features, disponibles, conservar, return_new_only)
+  resumenes = _resumenes(entradas, filas_bloque, con_estado, ticker_col)
+  colas = {}
+  estados = {}
+  escritor = None
+  leidas = 0
+  bloques = 0
+  try:
+    for bloque in _lee_bloques(entradas, filas_bloque, columnas):
+      # Índice global: las filas de la cola y las del bloque no repiten etiquetas
+      bloque.index = pd.RangeIndex(leidas, leidas + len(bloque))
+      leidas += len(bloque)
+      calculado = _calcula_bloque(bloque, features, con_estado, ticker_col, colas, estados, resumenes, calentamiento, orden)
+      tabla = pa.Table.from_pandas(calculado, preserve_index=False)
+      if escritor is None:
+        escritor = pq.ParquetWriter(salida, tabla.schema)
+      escritor.write_table(tabla.cast(escritor.schema))
+      bloques += 1
+  finally:
+    if escritor is not None:
+      escritor.close()
+  return {'filas': leidas, 'bloques': bloques, 'calentamiento': calentamiento}
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Calcula features por bloques de un parquet a otro")
+  parser.add_argument('entrada', nargs='+', help="parquet(s) de entrada, en orden")
+  parser.add_argument('salida', help="parquet de salida")
+  parser.add_argument('--features', required=True, help="json con la lista de features para calcula_features")
+  parser.add_argument('--filas_bloque', type=int, default=1000000)
+  parser.add_argument('--ticker_col', default=None)
+  parser.add_argument('--return_new_only', action='store_true')
+  parser.add_argument('--tolerancia', type=float, default=None, help="calcula las medias exponenciales con calentamiento y esta tolerancia en vez de con estado (más rápido, no idéntico)")
+  parser.add_argument('--date_col', default='<FC>')
+  args = parser.parse_args(argv)
+  with open(args.features) as f:
+    features = [feature if isinstance(feature, str) else tuple(feature) for feature in json.load(f)]
+  print(json.dumps(calcula_features_por_bloques(args.entrada, args.salida, features, args.filas_bloque, args.ticker_col,
+                                                return_new_only=args.return_new_only, tolerancia=args.tolerancia, date_col=args.date_col)))
+
+if __name__ == '__main__':
+  main()
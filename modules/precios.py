@@ -0,0 +1,117 @@
+"""
+Precios diarios (OHLCV) con cache local: solo se descargan las fechas que faltan
+"""
+
+import json
+import os
+
+import pandas as pd
+
+try:
+  import yfinance as yf
+except ImportError:
+  yf = None
+
+COLUMNAS = ['fc', 'ticker', 'y', 'vl', 'high', 'low']
+
+"""
+DESCARGA
+Params:
+    ticker: ticker de Yahoo Finance (ej: 'GGAL.BA', '^MERV')
+    fc_empieza: primera fecha (incluida)
+    fc_termina: última fecha (no incluida)
+
+Returns:
+    DataFrame con las columnas fc, ticker, y, vl, high, low (mismo formato que la descarga de los notebooks)
+"""
+def descarga(ticker, fc_empieza, fc_termina):
+  """Descarga de Yahoo Finance con yfinance."""
+  if yf is None:
+    raise ImportError("La descarga necesita yfinance (pip install yfinance); sin conexión usar FuenteLocal")
+  base = yf.download(ticker, start=fc_empieza, end=fc_termina, auto_adjust=False, progress=False)
+  if isinstance(base.columns, pd.MultiIndex):
+    base.columns = base.columns.get_level_values(0)
+  base = base[['Close', 'Volume', 'High', 'Low']]
+  base.insert(loc=0, column='Ticker', value=ticker)
+  base.reset_index(level=0, inplace=True)
+  base.columns = COLUMNAS
+  return base
+
+"""
+FUENTE LOCAL
+Params:
+    carpeta: carpeta con un archivo <ticker>.csv por ticker, con las columnas fc, ticker, y, vl, high, low
+
+Returns:
+    fuente con la misma firma que descarga (ticker, fc_empieza, fc_termina), para trabajar sin conexión o con datos fijos
+"""
+class FuenteLocal:
+  """Lee los precios de archivos csv (se puede mandar a otros procesos, a diferencia de una función anidada)."""
+
+  def __init__(self, carpeta):
+    self.carpeta = carpeta
+
+  def __call__(self, ticker, fc_empieza, fc_termina):
+    base = pd.read_csv(os.path.join(self.carpeta, '%s.csv' % ticker), parse_dates=['fc'])
+    base = base[(base['fc'] >= pd.Timestamp(fc_empieza)) & (base['fc'] < pd.Timestamp(fc_termina))]
+    return base[COLUMNAS].reset_index(drop=True)
+
+"""
+CACHE DE PRECIOS
+Params:
+    carpeta: carpeta del cache (un parquet de precios y un json de rango cubierto por ticker)
+    fuente: función (ticker, fc_empieza, fc_termina) -> DataFrame, por defecto descarga. Puede ser una FuenteLocal
+    offline: si es True nunca llama a la fuente y devuelve lo que haya en el cache
+
+Returns:
+    objeto con descarga(ticker, fc_empieza, fc_termina), que devuelve lo mismo que descarga pero solo pide a la fuente los tramos del rango que el cache no cubre
+"""
+class CachePrecios:
+  """Guarda por ticker los precios y el rango de fechas ya pedido (los fines de semana y feriados no tienen filas, por eso el rango no sale de los datos)."""
+
+  def __init__(self, carpeta, fuente=descarga, offline=False):
+    self.carpeta = carpeta
+    self.fuente = fuente
+    self.offline = offline
+    os.makedirs(carpeta, exist_ok=True)
+
+  def _archivos(self, ticker):
+    return os.path.join(self.carpeta, '%s.parquet' % ticker), os.path.join(self.carpeta, '%s.json' % ticker)
+
+  def _lee(self, ticker):
+    """Precios y rango cubierto [desde, hasta) del ticker, o (None, None, None) si no hay cache."""
+    archivo_precios, archivo_rango = self._archivos(ticker)
+    if not (os.path.exists(archivo_precios) and os.path.exists(archivo_rango)):
+      return None, None, None
+    with open(archivo_rango) as f:
+      rango = json.load(f)
+    return pd.read_parquet(archivo_precios), pd.Timestamp(rango['desde']), pd.Timestamp(rango['hasta'])
+
+  def _guarda(self, ticker, base, desde, hasta):
+    archivo_precios, archivo_rango = self._archivos(ticker)
+    base.to_parquet(archivo_precios, index=False)
+    with open(archivo_rango, 'w') as f:
+      json.dump({'desde': desde.strftime('%Y-%m-%d'), 'hasta': hasta.strftime('%Y-%m-%d')}, f)
+
+  def descarga(self, ticker, fc_empieza, fc_termina):
+    """Completa el cache con los tramos faltantes (antes del primer día o después del último pedido) y devuelve el rango pedido."""
+    fc_empieza, fc_termina = pd.Timestamp(fc_empieza), pd.Timestamp(fc_termina)
+    base, desde, hasta = self._lee(ticker)
+    if not self.offline:
+      if base is None:
+        tramos = [(fc_empieza, fc_termina)]
+        desde, hasta = fc_empieza, fc_termina
+      else:
+        tramos = [tramo for tramo in ((fc_empieza, desde), (hasta, fc_termina)) if tramo[0] < tramo[1]]
+      if tramos:
+        nuevos = [self.fuente(ticker, *tramo) for tramo in tramos]
+        partes = ([] if base is None else [base]) + [nuevo for nuevo in nuevos if len(nuevo)]
+        base = pd.concat(partes) if partes else pd.DataFrame(columns=COLUMNAS)
+        base['fc'] = pd.to_datetime(base['fc'])
+        base = base.drop_duplicates('fc', keep='last').sort_values('fc').reset_index(drop=True)
+        # El día de hoy (todavía abierto) y los futuros no quedan cubiertos: se vuelven a pedir en la próxima actualización
+        self._guarda(ticker, base, min(desde, fc_empieza), min(max(hasta, fc_termina), pd.Timestamp.today().normalize()))
+    if base is None:
+      return pd.DataFrame(columns=COLUMNAS)
+    base = base[(base['fc'] >= fc_empieza) & (base['fc'] < fc_termina)]
+    return base.reset_index(drop=True)
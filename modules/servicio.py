@@ -0,0 +1,443 @@
+"""
+Servicio de scoring local: un proceso que carga model_alza y model_baja una vez, guarda la historia de cada ticker y puntúa barras nuevas de muchos tickers en una sola llamada a cada modelo.
+Los features salen de los nombres de columnas del modelo (ver FeaturesModelo), calculados como en el notebook v2_dev; pc_merval usa las barras del merval (ticker '^MERV')
+
+Protocolo: una línea JSON por pedido y una por respuesta, por socket Unix (o TCP)
+    {"tipo": "barras", "barras": [{"ticker": "GGAL.BA", "fc": "2021-05-07", "y": 120.5, "vl": 1e6, "high": 122, "low": 119}, ...]}
+        -> {"predicciones": [{"ticker": ..., "fc": ..., "pred_alza": ..., "pred_baja": ...}, ...]} (una por ticker, la de su última barra; None si el notebook la descartaría)
+    {"tipo": "estado"} -> {"tickers": ..., "pedidos": ..., "latencia_p50_ms": ..., "latencia_p99_ms": ...}
+
+Uso:
+    python -m modules.servicio --modelo_alza modelo_alza/ --modelo_baja modelo_baja/ --historia historia.csv --socket /tmp/scoring.sock
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import pickle
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from modules import indicators_stream as stream
+from modules.modelo_plano import ModeloPlano
+from modules.pipeline import FEATURES, calcula_features, _normaliza
+
+# Columnas de precios.py que se guardan por ticker, más el cierre del merval de la fecha (mvl)
+_VALORES = ['fc', 'y', 'vl', 'high', 'low', 'mvl']
+
+# Las columnas de precios.py con los nombres que usan por defecto los indicadores (no hay apertura)
+RENOMBRE = {'fc': '<FC>', 'y': '<CLOSE>', 'vl': '<VOL>', 'high': '<HIGH>', 'low': '<LOW>', 'mvl': '<MERVAL>'}
+
+# Columnas que los notebooks de v2 calculan antes del df.dropna(), sobre todas las barras (las de calcula_historia salen de estas)
+MEDIAS = ['exp1', 'exp2', 'macd', 'exp3', 'histog']
+PREVIAS = ['pc_merval', 'amplitud'] + MEDIAS
+
+def carga_modelo(ruta):
+  """Modelo exportado con modelo_plano (una carpeta: carga por mmap, sin xgboost) o pickleado (el .dat de v2, un XGBClassifier)."""
+  if os.path.isdir(ruta):
+    return ModeloPlano(ruta)
+  with open(ruta, 'rb') as f:
+    return pickle.load(f)
+
+def _columnas_modelo(modelo):
+  """Columnas en el orden con el que se entrenó el modelo (feature_names del booster de xgboost o feature_names_in_ de sklearn)."""
+  if hasattr(modelo, 'get_booster') and modelo.get_booster().feature_names is not None:
+    return list(modelo.get_booster().feature_names)
+  if hasattr(modelo, 'feature_names_in_'):
+    return list(modelo.feature_names_in_)
+  return None
+
+def _columnas_features(features):
+  """Columnas que generan los features de una lista para calcula_features."""
+  columnas = []
+  for feature in features:
+    nombre, params = _normaliza(feature)
+    columnas += FEATURES[nombre].columnas(params)
+  return columnas
+
+"""
+FEATURES DEL MODELO
+Params:
+    columnas: columnas que recibe el modelo (sus feature_names): exp1...histog, pc_merval, amplitud, var_<columna>_<lag> de esas, las de calcula_canalidad_y,
+              las de calcula_canalidad_histog_macd sobre histog y las de las tendencias AT
+
+Returns:
+    objeto que calcula esas columnas como el notebook v2_dev: llamado con un DataFrame de un ticker (columnas de precios.py y mvl) devuelve los features de todas las barras,
+    e indicadores() devuelve la lista equivalente de indicadores de indicators_stream. Si el modelo usa una columna que no sabe calcular, ValueError al crearlo
+"""
+class FeaturesModelo:
+  """
+  Arma las dos etapas del notebook a partir de los nombres: pc_merval, amplitud y las medias sobre todas las barras, y después del df.dropna() la historia, las canalidades y las tendencias AT
+  sobre las barras que quedan. En las barras que el notebook descarta (ej. sin cierre del merval, o las primeras 25 sin exp2) las columnas de la segunda etapa quedan nulas
+  """
+
+  def __init__(self, columnas):
+    self.columnas = list(columnas)
+    pares, ventanas_y, ventanas_histog, lags = [], set(), set(), set()
+    for columna in self.columnas:
+      var = re.match(r'var_(.+)_(\d+)$', columna)
+      if var is not None and var.group(1) in PREVIAS:
+        pares.append((var.group(1), int(var.group(2))))
+      elif re.match(r'nu_dias_y_entre_(max_min|5pc)_\d+$', columna):
+        ventanas_y.add(int(columna.rsplit('_', 1)[1]))
+      elif re.match(r'nu_dias_histog_(entre_5pc|positivo|negativo|mismo_signo)_\d+$', columna):
+        ventanas_histog.add(int(columna.rsplit('_', 1)[1]))
+      elif re.match(r'(nu_pruebas|precio_proyectado|tendencia)_(techo|piso)_\w+_\d+$', columna):
+        lags.add(int(columna.rsplit('_', 1)[1]))
+    self.usa_merval = 'pc_merval' in self.columnas or any(columna == 'pc_merval' for columna, _ in pares)
+    self.pares = pares
+    self.ventanas_y = sorted(ventanas_y)
+    self.ventanas_histog = sorted(ventanas_histog)
+    self.lags = sorted(lags, reverse=True)
+
+    self.previas = (['calcula_pc_merval'] if self.usa_merval else []) + [('calcula_amplitud', {'nombre': 'amplitud'}), 'calcula_medias']
+    self.posteriores = []
+    if self.pares:
+      self.posteriores.append(('calcula_historia', {'pares': self.pares}))
+    if self.ventanas_y:
+      self.posteriores.append(('calcula_canalidad_y', {'lista_ventanas': self.ventanas_y}))
+    if self.ventanas_histog:
+      self.posteriores.append(('calcula_canalidad_histog_macd', {'histog_col': 'histog', 'lista_ventanas': self.ventanas_histog}))
+    if self.lags:
+      self.posteriores.append(('calcula_AT_tendencias_lags', {'lista_lags': self.lags}))
+    # El df.dropna() del notebook: sin el merval de la fecha pc_merval es nulo y la barra no se usa
+    self.sin_nulos = ['<CLOSE>', '<VOL>', '<HIGH>', '<LOW>'] + _columnas_features(self.previas)
+
+    calculadas = set(RENOMBRE.values()) | set(_columnas_features(self.previas + self.posteriores))
+    faltan = [columna for columna in self.columnas if columna not in calculadas]
+    if faltan:
+      raise ValueError("El modelo usa columnas que no se saben calcular: %s" % faltan)
+
+  def __call__(self, data):
+    """Features de todas las barras de un ticker (en orden), con las columnas de precios renombradas con RENOMBRE."""
+    base = calcula_features(data.rename(columns=RENOMBRE), self.previas)
+    quedan = base[self.sin_nulos].notna().all(axis=1)
+    if not self.posteriores or not quedan.any():
+      return base
+    posteriores = calcula_features(base[quedan], self.posteriores, return_new_only=True)
+    return pd.concat([base, posteriores.reindex(base.index)], axis=1)
+
+  def indicadores(self):
+    """Indicadores en streaming equivalentes (una lista nueva por ticker): los de la segunda etapa solo ven las barras sin nulos."""
+    posteriores = []
+    if self.pares:
+      posteriores.append(stream.Historia(pares=self.pares))
+    if self.ventanas_y:
+      posteriores.append(stream.CanalidadY(lista_ventanas=self.ventanas_y))
+    if self.ventanas_histog:
+      posteriores.append(stream.CanalidadHistogMacd('histog', self.ventanas_histog))
+    if self.lags:
+      posteriores.append(stream.TendenciasATLags(self.lags))
+    return (([stream.PcMerval()] if self.usa_merval else []) + [stream.Amplitud(nombre='amplitud'), stream.Medias()] +
+            [stream.SinNulos(self.sin_nulos, posteriores)])
+
+"""
+ESTADO POR TICKER
+Params:
+    features: lista de features para pipeline.calcula_features (sobre las columnas renombradas con RENOMBRE), o función DataFrame de un ticker (columnas de precios.py y mvl) -> DataFrame con los features (ej. FeaturesModelo)
+    indicadores: función sin argumentos que devuelve una lista nueva de indicadores de indicators_stream (semilla / actualiza), equivalentes a features. Si se indica, cada barra nueva actualiza el estado de los indicadores del ticker en vez de recalcular features sobre toda la historia. Los indicadores se actualizan en orden y cada uno ve lo que devolvieron los anteriores (ej. CanalidadHistogMacd después de Macd)
+    ventana: cantidad de barras que se guardan por ticker. Si es None se guarda toda la historia: las tendencias AT y las medias exponenciales dependen de toda la historia y con una ventana no dan lo mismo que el notebook
+
+Returns:
+    objeto con la historia reciente de cada ticker: carga(data) la precarga y actualiza(barras_por_ticker) suma barras y devuelve los features de la última barra de cada ticker
+"""
+class EstadoTickers:
+  """Historia y features de un grupo de tickers. Vive en el proceso principal o en un proceso del pool (uno por grupo de tickers)."""
+
+  def __init__(self, features, indicadores=None, ventana=None):
+    self.features = features
+    self.indicadores = indicadores
+    self.ventana = ventana
+    self.historia = {}
+    self.estados = {}
+
+  def _calcula(self, ticker, historia):
+    """Features de toda la historia del ticker (el cálculo por lotes)."""
+    if callable(self.features):
+      return self.features(pd.DataFrame(dict(historia, ticker=ticker)))
+    return calcula_features(pd.DataFrame({RENOMBRE[columna]: valores for columna, valores in historia.items()}), self.features)
+
+  def _siembra(self, ticker, historia):
+    """Arma el estado de los indicadores en streaming con la historia (y los features por lotes, para los que usan columnas de otros)."""
+    data = self._calcula(ticker, historia)
+    self.estados[ticker] = [indicador.semilla(data) for indicador in self.indicadores()]
+
+  def carga(self, data, ticker_col='ticker'):
+    """Precarga (o reemplaza) la historia de los tickers de data, en el formato de precios.py."""
+    for ticker, base in data.groupby(ticker_col, sort=False):
+      base = base.sort_values('fc')
+      if self.ventana is not None:
+        base = base.tail(self.ventana)
+      self.historia[ticker] = {columna: base[columna].to_numpy(dtype='datetime64[ns]' if columna == 'fc' else float) if columna in base else np.full(len(base), np.nan)
+                               for columna in _VALORES}
+      if self.indicadores is not None:
+        self._siembra(ticker, self.historia[ticker])
+    return len(self.historia)
+
+  def _agrega_barras(self, ticker, barras):
+    """
+    Suma las barras a la historia del ticker y recorta a la ventana. La historia son arrays de numpy: agregar un día no arma un DataFrame.
+    Devuelve la historia y la cantidad de barras agregadas al final en orden (None si hubo correcciones de fechas que ya estaban o barras viejas: una barra de una fecha que ya está la reemplaza)
+    """
+    nuevas = {columna: np.array([barra.get(columna, np.nan) for barra in barras], dtype='datetime64[ns]' if columna == 'fc' else float) for columna in _VALORES}
+    orden = np.argsort(nuevas['fc'], kind='stable')
+    nuevas = {columna: valores[orden] for columna, valores in nuevas.items()}
+    historia = self.historia.get(ticker)
+    al_final = historia is not None and (len(historia['fc']) == 0 or nuevas['fc'][0] > historia['fc'][-1]) and (np.diff(nuevas['fc']) > np.timedelta64(0)).all()
+    if historia is None:
+      historia = nuevas
+    else:
+      historia = {columna: np.concatenate([historia[columna], nuevas[columna]]) for columna in _VALORES}
+    if not al_final:
+      # Se queda la última versión de cada fecha, en orden
+      fechas = historia['fc'][::-1]
+      _, ultimas = np.unique(fechas, return_index=True)
+      historia = {columna: valores[len(fechas) - 1 - ultimas] for columna, valores in historia.items()}
+    if self.ventana is not None:
+      historia = {columna: valores[-self.ventana:] for columna, valores in historia.items()}
+    self.historia[ticker] = historia
+    return historia, (len(barras) if al_final else None)
+
+  def _actualiza_indicadores(self, ticker, historia, agregadas):
+    """Pasa las barras nuevas por los indicadores del ticker y devuelve los features de la última. Sin estado previo o con correcciones, se vuelve a sembrar con la historia hasta la anteúltima barra."""
+    if agregadas is None or ticker not in self.estados:
+      self._siembra(ticker, {columna: valores[:-1] for columna, valores in historia.items()})
+      agregadas = 1
+    for i in range(len(historia['fc']) - agregadas, len(historia['fc'])):
+      fila = {RENOMBRE[columna]: valores[i] for columna, valores in historia.items()}
+      fila['<FC>'] = pd.Timestamp(fila['<FC>'])
+      for indicador in self.estados[ticker]:
+        fila.update(indicador.actualiza(fila))
+    return fila
+
+  def actualiza(self, barras_por_ticker):
+    """Lista de (ticker, fecha de la última barra, diccionario con los features de la última barra), en el orden de barras_por_ticker."""
+    filas = []
+    for ticker, barras in barras_por_ticker.items():
+      historia, agregadas = self._agrega_barras(ticker, barras)
+      if self.indicadores is None:
+        fila = self._calcula(ticker, historia).iloc[-1].to_dict()
+      else:
+        fila = self._actualiza_indicadores(ticker, historia, agregadas)
+      filas.append((ticker, str(historia['fc'][-1])[:10], fila))
+    return filas
+
+# Estado de cada proceso del pool (un grupo de tickers por proceso)
+_estado = None
+
+def _inicia_grupo(features, indicadores, ventana):
+  global _estado
+  _estado = EstadoTickers(features, indicadores, ventana)
+
+def _en_grupo(metodo, *args):
+  return getattr(_estado, metodo)(*args)
+
+"""
+SCORING
+Params:
+    modelo_alza: modelo con predict_proba (o ruta al .dat pickleado o a la carpeta de modelo_plano)
+    modelo_baja: modelo con predict_proba (o ruta al .dat pickleado o a la carpeta de modelo_plano)
+    features: como en EstadoTickers. Si es None, FeaturesModelo con las columnas del modelo
+    indicadores: como en EstadoTickers. Si features es None y streaming es True, los de FeaturesModelo
+    columnas: columnas que recibe el modelo, en orden. Si es None se toman del modelo
+    ventana: como en EstadoTickers (por defecto toda la historia)
+    procesos: si es mayor a 1, los tickers se reparten (por hash del ticker, siempre al mismo) entre esa cantidad de procesos que guardan su historia y calculan sus features en paralelo. Los modelos quedan en el proceso principal
+    streaming: si es False los features del modelo se recalculan sobre la historia en cada barra (el cálculo por lotes, para comparar)
+    ticker_merval: ticker del merval (su cierre es el mvl de cada fecha). Sus barras tienen que llegar antes o en el mismo pedido que las de los otros tickers de esa fecha.
+        Solo alimenta pc_merval: no se guarda su historia ni se puntúa
+
+Returns:
+    objeto con carga_historia(data) para precargar los tickers y puntua(barras) para puntuar barras nuevas. Si los features no generan alguna columna del modelo, ValueError al crearlo
+"""
+class Scoring:
+  """Estado residente del servicio: los modelos, el cierre del merval por fecha y la historia de cada ticker (acá o repartida en procesos)."""
+
+  def __init__(self, modelo_alza, modelo_baja, features=None, indicadores=None, columnas=None, ventana=None, procesos=1, streaming=True, ticker_merval='^MERV'):
+    self.modelo_alza = carga_modelo(modelo_alza) if isinstance(modelo_alza, str) else modelo_alza
+    self.modelo_baja = carga_modelo(modelo_baja) if isinstance(modelo_baja, str) else modelo_baja
+    self.columnas = columnas or _columnas_modelo(self.modelo_alza)
+    if self.columnas is None:
+      raise ValueError("El modelo no tiene los nombres de sus features: hay que pasar columnas")
+    self._del_modelo = set(self.columnas)
+    if features is None:
+      features = FeaturesModelo(self.columnas)
+      if streaming and indicadores is None:
+        indicadores = features.indicadores
+    elif not callable(features):
+      faltan = [columna for columna in self.columnas if columna not in set(RENOMBRE.values()) | set(_columnas_features(features))]
+      if faltan:
+        raise ValueError("Los features no generan las columnas del modelo: %s" % faltan)
+    # Las barras que el notebook descarta (ver FeaturesModelo) no se puntúan
+    self.sin_nulos = list(getattr(features, 'sin_nulos', []))
+    self.ticker_merval = ticker_merval
+    self.merval = {}
+    self.tickers = set()
+    if procesos > 1:
+      self.grupos = [ProcessPoolExecutor(max_workers=1, initializer=_inicia_grupo, initargs=(features, indicadores, ventana)) for _ in range(procesos)]
+    else:
+      self.grupos = None
+      self.estado = EstadoTickers(features, indicadores, ventana)
+
+  def _grupo(self, ticker):
+    return zlib.crc32(str(ticker).encode()) % len(self.grupos)
+
+  def _reparte(self, metodo, partes):
+    """Corre el método de EstadoTickers con la parte de cada grupo (todos a la vez) y devuelve los resultados por grupo."""
+    futuros = [self.grupos[i].submit(_en_grupo, metodo, parte) for i, parte in partes.items()]
+    return [futuro.result() for futuro in futuros]
+
+  def carga_historia(self, data, ticker_col='ticker'):
+    """Precarga (o reemplaza) la historia de los tickers de data, en el formato de precios.py. Si no trae mvl, se toma el cierre del merval de la misma fecha (de data o de lo ya cargado)."""
+    if self.ticker_merval is not None:
+      es_merval = data[ticker_col] == self.ticker_merval
+      merval = data[es_merval]
+      self.merval.update(zip(pd.to_datetime(merval['fc']), merval['y'].astype(float)))
+      data = data[~es_merval]
+      if 'mvl' not in data.columns:
+        data = data.assign(mvl=pd.to_datetime(data['fc']).map(self.merval).astype(float))
+    self.tickers.update(data[ticker_col].unique())
+    if self.grupos is None:
+      self.estado.carga(data, ticker_col)
+      return
+    grupo = data[ticker_col].map(self._grupo)
+    self._reparte('carga', {i: parte for i, parte in data.groupby(grupo)})
+
+  def _agrega_merval(self, barras):
+    """Guarda los cierres de las barras del merval y agrega a cada barra de los otros tickers el mvl de su fecha (nulo si todavía no llegó). Las del merval no siguen."""
+    for barra in barras:
+      if barra['ticker'] == self.ticker_merval:
+        self.merval[pd.Timestamp(barra['fc'])] = float(barra['y'])
+    return [barra if 'mvl' in barra else dict(barra, mvl=self.merval.get(pd.Timestamp(barra['fc']), np.nan)) for barra in barras if barra['ticker'] != self.ticker_merval]
+
+  def puntua(self, barras):
+    """
+    Actualiza los tickers que traen barras y puntúa la última barra de cada uno, con una sola llamada a predict_proba por modelo.
+    Las barras sin todas las columnas del modelo (las que el notebook descarta con el dropna) tienen pred_alza y pred_baja None
+    """
+    if self.ticker_merval is not None:
+      barras = self._agrega_merval(barras)
+    por_ticker = collections.defaultdict(list)
+    for barra in barras:
+      por_ticker[barra['ticker']].append(barra)
+    if not por_ticker:
+      return []
+    self.tickers.update(por_ticker)
+    if self.grupos is None:
+      filas = self.estado.actualiza(por_ticker)
+    else:
+      partes = collections.defaultdict(dict)
+      for ticker, barras_ticker in por_ticker.items():
+        partes[self._grupo(ticker)][ticker] = barras_ticker
+      filas = {fila[0]: fila for resultado in self._reparte('actualiza', partes) for fila in resultado}
+      filas = [filas[ticker] for ticker in por_ticker]
+    completas = [i for i, (_, _, fila) in enumerate(filas)
+                 if fila.keys() >= self._del_modelo and not any(pd.isna(fila[columna]) for columna in self.sin_nulos)]
+    pred_alza = [None]*len(filas)
+    pred_baja = [None]*len(filas)
+    if completas:
+      X = pd.DataFrame(np.array([[filas[i][2][columna] for columna in self.columnas] for i in completas], dtype=float), columns=self.columnas)
+      for i, alza, baja in zip(completas, self.modelo_alza.predict_proba(X)[:, 1], self.modelo_baja.predict_proba(X)[:, 1]):
+        pred_alza[i] = float(alza)
+        pred_baja[i] = float(baja)
+    return [{'ticker': ticker, 'fc': fc, 'pred_alza': alza, 'pred_baja': baja} for (ticker, fc, _), alza, baja in zip(filas, pred_alza, pred_baja)]
+
+  def cierra(self):
+    """Termina los procesos de los grupos."""
+    for grupo in self.grupos or []:
+      grupo.shutdown()
+
+"""
+SERVIDOR
+Params:
+    scoring: objeto Scoring
+    socket: ruta del socket Unix. Si es None se escucha por TCP en host:puerto
+    host: host TCP
+    puerto: puerto TCP
+
+Returns:
+    servidor asyncio (ya escuchando). Los pedidos se atienden de a uno (el estado es compartido) en un thread aparte, así el loop sigue aceptando conexiones
+"""
+async def sirve(scoring, socket=None, host='127.0.0.1', puerto=8765):
+  """Una línea JSON por pedido; las latencias de los últimos pedidos quedan para el pedido de estado."""
+  candado = asyncio.Lock()
+  latencias = collections.deque(maxlen=10000)
+  loop = asyncio.get_running_loop()
+
+  async def atiende(lector, escritor):
+    while True:
+      linea = await lector.readline()
+      if not linea:
+        break
+      inicio = time.perf_counter()
+      try:
+        pedido = json.loads(linea)
+        if pedido.get('tipo') == 'estado':
+          ms = np.array(latencias)*1000
+          respuesta = {'tickers': len(scoring.tickers), 'pedidos': len(latencias),
+                       'latencia_p50_ms': float(np.percentile(ms, 50)) if len(ms) else None,
+                       'latencia_p99_ms': float(np.percentile(ms, 99)) if len(ms) else None}
+        else:
+          async with candado:
+            respuesta = {'predicciones': await loop.run_in_executor(None, scoring.puntua, pedido['barras'])}
+          latencias.append(time.perf_counter() - inicio)
+      except Exception as error:
+        respuesta = {'error': '%s: %s' % (type(error).__name__, error)}
+      escritor.write((json.dumps(respuesta) + '\n').encode())
+      await escritor.drain()
+    escritor.close()
+
+  if socket is not None:
+    return await asyncio.start_unix_server(atiende, path=socket)
+  return await asyncio.start_server(atiende, host, puerto)
+
+async def consulta(pedido, socket=None, host='127.0.0.1', puerto=8765):
+  """Cliente: manda un pedido (diccionario) y devuelve la respuesta."""
+  if socket is not None:
+    lector, escritor = await asyncio.open_unix_connection(socket)
+  else:
+    lector, escritor = await asyncio.open_connection(host, puerto)
+  escritor.write((json.dumps(pedido) + '\n').encode())
+  await escritor.drain()
+  respuesta = json.loads(await lector.readline())
+  escritor.close()
+  return respuesta
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Servicio de scoring de model_alza / model_baja")
+  parser.add_argument('--modelo_alza', default='v2/model_alza.dat', help="modelo pickleado o carpeta exportada con modelo_plano")
+  parser.add_argument('--modelo_baja', default='v2/model_baja.dat', help="modelo pickleado o carpeta exportada con modelo_plano")
+  parser.add_argument('--historia', default=None, help="csv con la historia completa de los tickers y del merval (columnas de precios.py) para precargar")
+  parser.add_argument('--features', default=None, help="json con la lista de features para calcula_features (por defecto los del modelo, ver FeaturesModelo). Sin versión en streaming: se recalculan en cada barra")
+  parser.add_argument('--ventana', type=int, default=None, help="barras que se guardan por ticker (por defecto toda la historia)")
+  parser.add_argument('--sin_streaming', action='store_true', help="recalcula los features sobre la historia en cada barra")
+  parser.add_argument('--ticker_merval', default='^MERV')
+  parser.add_argument('--procesos', type=int, default=1, help="procesos entre los que se reparten los tickers")
+  parser.add_argument('--socket', default=None, help="ruta del socket Unix (si no, TCP)")
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--puerto', type=int, default=8765)
+  args = parser.parse_args(argv)
+
+  features = None
+  if args.features is not None:
+    with open(args.features) as f:
+      features = [feature if isinstance(feature, str) else tuple(feature) for feature in json.load(f)]
+  scoring = Scoring(args.modelo_alza, args.modelo_baja, features, ventana=args.ventana, procesos=args.procesos, streaming=not args.sin_streaming,
+                    ticker_merval=args.ticker_merval)
+  if args.historia is not None:
+    scoring.carga_historia(pd.read_csv(args.historia, parse_dates=['fc']))
+
+  async def corre():
+    servidor = await sirve(scoring, args.socket, args.host, args.puerto)
+    async with servidor:
+      await servidor.serve_forever()
+  asyncio.run(corre())
+
+if __name__ == '__main__':
+  main()
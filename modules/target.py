@@ -0,0 +1,130 @@
+"""
+Target de clasificación por stop loss (SL) y take profit (TG): para cada día, qué barrera se toca primero en los próximos días y cuántos días tarda
+"""
+
+import numpy as np
+
+from modules.columnas import agrega_columnas
+from modules.instrumentacion import instrumenta
+
+INDETERMINADO = 99
+
+def _ordena_tickers(data, ticker_col, date_col):
+  """Orden de las filas por ticker y fecha, y para cada fila (ya ordenada) la posición del último día de su ticker."""
+  if ticker_col is not None:
+    _, codigos = np.unique(data[ticker_col].astype(str).values, return_inverse=True)
+  else:
+    codigos = np.zeros(len(data), dtype=int)
+  orden = np.lexsort((codigos,) if date_col is None else (data[date_col].values, codigos))
+  codigos = codigos[orden]
+  return orden, np.searchsorted(codigos, codigos, side='right') - 1
+
+def _tabla_extremos(valores, niveles, extremo, relleno):
+  """Tabla dispersa: tabla[k][p] es el extremo (máximo o mínimo, ignorando nulos) de valores[p : p + 2**k]. Pasado el final se rellena con relleno."""
+  tabla = [np.where(np.isnan(valores), relleno, valores)]
+  for k in range(1, niveles):
+    anterior = tabla[-1]
+    paso = 2**(k-1)
+    siguiente = np.full(len(valores), relleno)
+    siguiente[:len(valores)-paso] = extremo(anterior[:len(valores)-paso], anterior[paso:])
+    tabla.append(siguiente)
+  return tabla
+
+def _primer_toque(tabla, y, limite, toca):
+  """
+  Búsqueda del primer día j > i (j <= limite[i]) en que toca(extremo, y[i]) es verdadero, para todas las filas a la vez.
+  Avanza de a potencias de 2 mientras el tramo no toque la barrera (el extremo de un tramo toca si y solo si toca algún día del tramo). Devuelve los días hasta el toque, 0 si no toca
+  """
+  n = len(y)
+  filas = np.arange(n)
+  pos = filas.copy()  # último día revisado sin toque
+  for k in range(len(tabla)-1, -1, -1):
+    paso = 2**k
+    entra = pos + paso <= limite
+    idx = np.where(entra, pos + 1, 0)
+    avanza = entra & ~toca(tabla[k][np.minimum(idx, n-1)], y)
+    pos = np.where(avanza, pos + paso, pos)
+  siguiente = pos + 1
+  hay = siguiente <= limite
+  toca_siguiente = np.zeros(n, dtype=bool)
+  toca_siguiente[hay] = toca(tabla[0][siguiente[hay]], y[hay])
+  return np.where(toca_siguiente, siguiente - filas, 0)
+
+def _combina(dias_gana, dias_pierde, gana_empate):
+  """Label de la primera barrera tocada (1 la que gana, 0 la que pierde, 99 ninguna) y días hasta tocarla. Si las dos se tocan el mismo día, decide gana_empate."""
+  gana = (dias_gana > 0) & ((dias_pierde == 0) | (dias_gana < dias_pierde) | ((dias_gana == dias_pierde) & gana_empate))
+  pierde = (dias_pierde > 0) & ~gana
+  target = np.where(gana, 1, np.where(pierde, 0, INDETERMINADO))
+  dias = np.where(gana, dias_gana, np.where(pierde, dias_pierde, np.nan))
+  return target, dias
+
+"""
+TARGETS DE ALZA Y BAJA
+Params:
+    data: pandas DataFrame (uno o varios tickers)
+    pares: lista de pares (SL, TG) en proporción (ej: [(0.06, 0.15)]). Se calculan todos en la misma pasada
+    dias_indeterminacion: cantidad máxima de días hacia adelante en los que se busca el toque
+    y_col: the name of the CLOSE values column (precio de compra)
+    high_col: the name of the HIGH values column
+    low_col: the name of the LOW values column
+    ticker_col: the name of the TICKER values column (si es None, data es de un solo ticker). No se mira más allá del último día de cada ticker
+    date_col: the name of the DATE values column (si es None, se asume que data ya está ordenada por fecha dentro de cada ticker)
+    return_new_only: si es True devuelve solo las columnas nuevas
+    compact: si es True las columnas nuevas se guardan con tipos chicos
+
+Returns:
+    copy of 'data' DataFrame con target_alza, dias_alza, target_baja y dias_baja para cada par. Con un solo par las columnas no llevan sufijo, con varios llevan _<SL>_<TG> (ej: target_alza_0.06_0.15)
+    target_alza: 1 si el máximo supera +TG antes de que el mínimo perfore -SL, 0 al revés, 99 si no pasa ninguna en el plazo. Si las dos pasan el mismo día, 1
+    target_baja: 1 si el mínimo perfora -TG antes de que el máximo supere +SL, 0 al revés, 99 si ninguna. Si las dos pasan el mismo día, 0
+    dias_*: días (filas) hasta la barrera que define el target, nulo si es 99
+"""
+@instrumenta
+def calcula_targets(data, pares=((0.06, 0.15),), dias_indeterminacion=90, y_col='y', high_col='high', low_col='low',
+                    ticker_col='ticker', date_col='fc', return_new_only=False, compact=False):
+  """Mismo resultado que el while de v2_train (high.shift(-i)/y-1 contra las barreras, i de 1 a dias_indeterminacion) pero respetando el corte entre tickers, con una tabla de máximos y mínimos por potencias de 2 en vez de una pasada por día."""
+  orden, fin_ticker = _ordena_tickers(data, ticker_col, date_col)
+  y = data[y_col].values.astype(float)[orden]
+  high = data[high_col].values.astype(float)[orden]
+  low = data[low_col].values.astype(float)[orden]
+
+  # Último día que puede mirar cada fila: el plazo o el fin de su ticker
+  limite = np.minimum(np.arange(len(data)) + dias_indeterminacion, fin_ticker)
+
+  niveles = max(int(dias_indeterminacion).bit_length(), 1)
+  maximos = _tabla_extremos(high, niveles, np.fmax, -np.inf)
+  minimos = _tabla_extremos(low, niveles, np.fmin, np.inf)
+
+  nuevas = {}
+  for SL, TG in pares:
+    sufijo = '' if len(pares) == 1 else '_%s_%s' % (SL, TG)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      dias_sube_TG = _primer_toque(maximos, y, limite, lambda extremo, y: extremo/y-1 > TG)
+      dias_baja_SL = _primer_toque(minimos, y, limite, lambda extremo, y: extremo/y-1 < -SL)
+      dias_sube_SL = _primer_toque(maximos, y, limite, lambda extremo, y: extremo/y-1 > SL)
+      dias_baja_TG = _primer_toque(minimos, y, limite, lambda extremo, y: extremo/y-1 < -TG)
+    target_alza, dias_alza = _combina(dias_sube_TG, dias_baja_SL, gana_empate=True)
+    target_baja, dias_baja = _combina(dias_baja_TG, dias_sube_SL, gana_empate=False)
+    for nombre, valores in (('target_alza', target_alza), ('dias_alza', dias_alza), ('target_baja', target_baja), ('dias_baja', dias_baja)):
+      original = np.empty_like(valores)
+      original[orden] = valores
+      nuevas[nombre + sufijo] = original
+
+  return agrega_columnas(data, nuevas, return_new_only, compact)
+
+"""
+TARGET DE CLASIFICACIÓN
+Params:
+    dataset: pandas DataFrame con y, high y low
+    SL: stop loss en proporción (ej: 0.06)
+    TG: take profit (target) en proporción (ej: 0.15)
+    dias_indeterminacion: cantidad máxima de días hacia adelante en los que se busca el toque
+    ticker_col: the name of the TICKER values column (si es None, dataset es de un solo ticker)
+
+Returns:
+    copy of 'dataset' DataFrame con la columna target (el target_alza de calcula_targets)
+"""
+def calcula_target_class(dataset, SL, TG, dias_indeterminacion, ticker_col='ticker'):
+  """Reemplazo de la función de los notebooks (que usaba el df global en vez de dataset)."""
+  target = calcula_targets(dataset, [(SL, TG)], dias_indeterminacion, ticker_col=ticker_col if ticker_col in dataset.columns else None,
+                           date_col='fc' if 'fc' in dataset.columns else None, return_new_only=True)
+  return agrega_columnas(dataset, {'target': target['target_alza']})
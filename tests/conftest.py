@@ -0,0 +1,27 @@
+"""
+Datos sintéticos para los tests: los módulos se importan como en el resto del repo (from modules.x import ...)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def precios(filas=600, semilla=0):
+  """Serie de precios con la forma de los indicadores (<FC>, <OPEN>, <HIGH>, <LOW>, <CLOSE>, <VOL>): camino aleatorio lognormal, días hábiles."""
+  rng = np.random.default_rng(semilla)
+  close = 100*np.exp(np.cumsum(rng.normal(0, 0.02, filas)))
+  high = close*(1 + np.abs(rng.normal(0, 0.01, filas)))
+  low = close*(1 - np.abs(rng.normal(0, 0.01, filas)))
+  apertura = close*(1 + rng.normal(0, 0.005, filas))
+  vol = rng.integers(1000, 100000, filas).astype(float)
+  return pd.DataFrame({'<FC>': pd.bdate_range('2010-01-01', periods=filas), '<OPEN>': apertura, '<HIGH>': high, '<LOW>': low, '<CLOSE>': close, '<VOL>': vol})
+
+@pytest.fixture
+def datos():
+  return precios
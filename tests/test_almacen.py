@@ -0,0 +1,73 @@
+"""
+Almacén de features: agregar días escribe un archivo nuevo sin reescribir la historia, y la lectura proyecta columnas, filtra fechas y poda particiones de tickers
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.almacen import guarda_features, lee_features, ultima_fecha
+
+pytest.importorskip('pyarrow')
+
+def _panel(filas=300):
+  partes = []
+  for semilla, ticker in enumerate(['A', 'B', 'C']):
+    parte = precios(filas, semilla)
+    parte.insert(0, '<TICKER>', ticker)
+    partes.append(parte)
+  return pd.concat(partes, ignore_index=True)
+
+def _archivos(ruta):
+  """Archivo: (tamaño, fecha de modificación en ns) de cada parquet del almacén."""
+  archivos = {}
+  for carpeta, _, nombres in os.walk(ruta):
+    for nombre in nombres:
+      estado = os.stat(os.path.join(carpeta, nombre))
+      archivos[os.path.relpath(os.path.join(carpeta, nombre), ruta)] = (estado.st_size, estado.st_mtime_ns)
+  return archivos
+
+def test_agregar_dias_no_reescribe(tmp_path):
+  ruta = str(tmp_path)
+  panel = _panel()
+  assert guarda_features(panel[panel['<FC>'] < '2010-06-01'], ruta) == {'A': 107, 'B': 107, 'C': 107}
+  antes = _archivos(ruta)
+  # Se vuelve a mandar toda la base: solo se escriben los días nuevos, en un archivo más por ticker
+  assert guarda_features(panel, ruta) == {'A': 193, 'B': 193, 'C': 193}
+  despues = _archivos(ruta)
+  assert {archivo: despues[archivo] for archivo in antes} == antes
+  assert sorted(set(despues) - set(antes)) == [os.path.join('ticker=%s' % ticker, '20100601_20110224.parquet') for ticker in 'ABC']
+  pd.testing.assert_frame_equal(lee_features(ruta), panel, check_exact=True)
+  assert guarda_features(panel, ruta) == {'A': 0, 'B': 0, 'C': 0} and _archivos(ruta) == despues
+
+def test_ultima_fecha(tmp_path):
+  ruta = str(tmp_path)
+  assert ultima_fecha(ruta, 'A') is None
+  panel = _panel()
+  guarda_features(panel[panel['<FC>'] < '2010-06-01'], ruta)
+  assert ultima_fecha(ruta, 'A') == pd.Timestamp('2010-05-31')
+  guarda_features(panel, ruta)
+  assert ultima_fecha(ruta, 'A') == panel['<FC>'].max() == lee_features(ruta, tickers=['A'])['<FC>'].max()
+
+def test_columnas_fechas_y_tickers(tmp_path):
+  ruta = str(tmp_path)
+  panel = _panel()
+  guarda_features(panel, ruta)
+  leido = lee_features(ruta, columnas=['<CLOSE>'], tickers=['B', 'A'], desde='2010-03-01', hasta='2010-03-31')
+  esperado = panel[panel['<TICKER>'].isin(['A', 'B']) & (panel['<FC>'] >= '2010-03-01') & (panel['<FC>'] <= '2010-03-31')]
+  pd.testing.assert_frame_equal(leido, esperado[['<TICKER>', '<FC>', '<CLOSE>']].reset_index(drop=True), check_exact=True)
+
+def test_tickers_no_abre_las_otras_particiones(tmp_path):
+  ruta = str(tmp_path)
+  panel = _panel()
+  guarda_features(panel, ruta)
+  # Un archivo roto en otra partición: leer A no lo toca
+  carpeta = os.path.join(ruta, 'ticker=C')
+  with open(os.path.join(carpeta, os.listdir(carpeta)[0]), 'wb') as f:
+    f.write(b'roto')
+  leido = lee_features(ruta, tickers=['A'])
+  pd.testing.assert_frame_equal(leido, panel[panel['<TICKER>'] == 'A'].reset_index(drop=True), check_exact=True)
+  with pytest.raises(Exception):
+    lee_features(ruta)
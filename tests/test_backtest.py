@@ -0,0 +1,77 @@
+"""
+Equivalencia del backtest vectorizado contra una simulación día por día de cada operación
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.backtest import backtest_umbrales, operaciones
+
+def _panel(filas=1000):
+  """Tres tickers en el formato de precios.py con predicciones al azar, y algunos días de rango amplio en los que se tocan el SL y el TG a la vez."""
+  partes = []
+  for semilla, ticker in [(1, 'A'), (2, 'B'), (3, 'C')]:
+    parte = precios(filas, semilla).rename(columns={'<FC>': 'fc', '<CLOSE>': 'y', '<HIGH>': 'high', '<LOW>': 'low'})[['fc', 'y', 'high', 'low']]
+    parte.loc[parte.index[::37], 'high'] *= 1.2
+    parte.loc[parte.index[::37], 'low'] *= 0.85
+    parte.insert(1, 'ticker', ticker)
+    partes.append(parte)
+  panel = pd.concat(partes, ignore_index=True)
+  rng = np.random.default_rng(0)
+  panel['pred_alza'] = rng.random(len(panel))
+  panel['pred_baja'] = rng.random(len(panel))
+  return panel
+
+def _fuerza_bruta(data, umbral_alza, umbral_baja, SL=0.06, TG=0.15, dias_max=90, costo=0.015, empate_tg=False, una_por_ticker=True):
+  """Recorre cada ticker día por día: (ticker, salida, retorno neto) de cada operación."""
+  resultado = []
+  for ticker, parte in data.sort_values(['ticker', 'fc']).groupby('ticker'):
+    y, high, low, pred_alza, pred_baja = [parte[columna].values for columna in ['y', 'high', 'low', 'pred_alza', 'pred_baja']]
+    n = len(parte)
+    i = 0
+    while i < n:
+      if pred_alza[i] > umbral_alza and pred_baja[i] < umbral_baja:
+        salida = None
+        for j in range(i + 1, min(i + dias_max, n - 1) + 1):
+          toca_TG = high[j]/y[i] - 1 > TG
+          toca_SL = low[j]/y[i] - 1 < -SL
+          if toca_TG and (empate_tg or not toca_SL):
+            salida = ('TG', j, TG)
+            break
+          if toca_SL:
+            salida = ('SL', j, -SL)
+            break
+        if salida is None:
+          salida = ('tiempo', i + dias_max, y[i + dias_max]/y[i] - 1) if i + dias_max <= n - 1 else ('abierta', n - 1, np.nan)
+        resultado.append((ticker, salida[0], salida[2] - costo))
+        if una_por_ticker:
+          i = salida[1] + 1
+          continue
+      i += 1
+  return resultado
+
+@pytest.mark.parametrize('una_por_ticker', [True, False])
+@pytest.mark.parametrize('empate_tg', [False, True])
+@pytest.mark.parametrize('umbral_alza,umbral_baja', [(0.5, 0.11), (0.3, 0.5), (0.9, 0.9)])
+def test_operaciones_igual_a_fuerza_bruta(umbral_alza, umbral_baja, empate_tg, una_por_ticker):
+  panel = _panel()
+  esperado = _fuerza_bruta(panel, umbral_alza, umbral_baja, empate_tg=empate_tg, una_por_ticker=una_por_ticker)
+  # Desordenado: operaciones ordena por ticker y fecha
+  calculado = operaciones(panel.sample(frac=1, random_state=1), umbral_alza, umbral_baja, empate_tg=empate_tg, una_por_ticker=una_por_ticker)
+  assert list(calculado['ticker']) == [operacion[0] for operacion in esperado]
+  assert list(calculado['salida']) == [operacion[1] for operacion in esperado]
+  np.testing.assert_allclose(calculado['retorno'].values, [operacion[2] for operacion in esperado], rtol=1e-12)
+
+def test_resumen_igual_a_fuerza_bruta():
+  panel = _panel(600)
+  # Con pocos días también hay salidas por tiempo
+  resumen = backtest_umbrales(panel, [0.3, 0.5], [0.5, 0.9], dias_max=5)
+  for _, fila in resumen.iterrows():
+    esperado = _fuerza_bruta(panel, fila['umbral_alza'], fila['umbral_baja'], dias_max=5)
+    cerradas = np.array([operacion[2] for operacion in esperado if operacion[1] != 'abierta'])
+    assert fila['operaciones'] == len(cerradas) and fila['abiertas'] == len(esperado) - len(cerradas)
+    assert fila['salidas_TG'] == sum(operacion[1] == 'TG' for operacion in esperado) and fila['salidas_tiempo'] == sum(operacion[1] == 'tiempo' for operacion in esperado) > 0
+    assert fila['pnl'] == pytest.approx(cerradas.sum(), rel=1e-12)
+    assert fila['tasa_acierto'] == pytest.approx((cerradas > 0).mean(), rel=1e-12)
@@ -0,0 +1,52 @@
+"""
+Modo compacto: los conteos salen en enteros chicos y exactos, el resto en float32 dentro del contrato de precisión, y el reporte de memoria da los bytes ahorrados
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.columnas import _compacta_valores, compacta, reporte_memoria
+from modules.pipeline import calcula_features
+
+FEATURES = ['calcula_canalidad_y', 'calcula_canalidad_histog_macd', 'rsi', 'calcula_amplitud', 'momentum']
+
+def test_compacta_valores():
+  assert _compacta_valores(np.array([0, 3, 255])).dtype == np.uint8
+  assert _compacta_valores(np.array([0, 256])).dtype == np.uint16
+  assert _compacta_valores(np.array([-1, 100])).dtype == np.int8
+  assert _compacta_valores(np.array([-1, 40000])).dtype == np.int32
+  assert _compacta_valores(np.array([], dtype=np.int64)).dtype == np.int64
+  assert _compacta_valores(np.array([0.1, np.nan])).dtype == np.float32 and np.isnan(_compacta_valores(np.array([0.1, np.nan]))[1])
+  assert _compacta_valores(np.array([True, False])).dtype == bool
+
+def test_features_compactos(datos):
+  data = datos(600, 2)
+  data.loc[data.index[[100, 101]], '<CLOSE>'] = np.nan
+  completo = calcula_features(data, FEATURES)
+  compacto = calcula_features(data, FEATURES, compact=True)
+  pd.testing.assert_frame_equal(compacto[data.columns], completo[data.columns], check_exact=True)
+  for columna in completo.columns[len(data.columns):]:
+    if columna.startswith('nu_dias_'):
+      # Ventanas de hasta 180 días: uint8, y exactos
+      assert compacto[columna].dtype == np.uint8, columna
+      np.testing.assert_array_equal(compacto[columna].values, completo[columna].values, err_msg=columna)
+    else:
+      assert compacto[columna].dtype == np.float32, columna
+      esperado = completo[columna].values
+      np.testing.assert_array_equal(np.isnan(compacto[columna].values), np.isnan(esperado), err_msg=columna)
+      np.testing.assert_allclose(compacto[columna].values.astype(float), esperado, rtol=2**-24, atol=0, err_msg=columna)
+
+def test_compacta_y_reporte_memoria(datos):
+  data = datos(500, 4)
+  completo = calcula_features(data, FEATURES)
+  compacto = compacta(completo)
+  # Como compact=True, pero también compacta los precios de entrada
+  nuevas = completo.columns[len(data.columns):]
+  pd.testing.assert_frame_equal(compacto[nuevas], calcula_features(data, FEATURES, compact=True)[nuevas], check_exact=True)
+  assert (compacto.dtypes[data.columns[1:]] == np.float32).all()
+  reporte = reporte_memoria(completo, compacto)
+  # 8 bytes a 1 por cada conteo y 8 a 4 por cada float (incluidos los precios de entrada); la fecha y el índice quedan igual
+  conteos = sum(columna.startswith('nu_dias_') for columna in completo.columns)
+  floats = len(completo.columns) - 1 - conteos
+  assert reporte['bytes_ahorrados'] == reporte['bytes_original'] - reporte['bytes_compacto'] == len(completo)*(7*conteos + 4*floats)
+  assert reporte['proporcion'] == reporte['bytes_compacto']/reporte['bytes_original'] < 0.5
@@ -0,0 +1,82 @@
+"""
+Walk-forward de punta a punta sobre un panel sintético, con las métricas contra sklearn
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+xgb = pytest.importorskip('xgboost')
+metrics = pytest.importorskip('sklearn.metrics')
+
+from modules.entrenamiento import MatrizFeatures, auc, candidatos_aleatorios, entrena_final, folds_mensuales, mejores_candidatos, walk_forward
+from modules.target import INDETERMINADO
+
+def _panel(tickers=3, dias=900, semilla=0):
+  """Features con algo de señal sobre los dos targets, y algunos indeterminados."""
+  rng = np.random.default_rng(semilla)
+  partes = []
+  for t in range(tickers):
+    x = rng.normal(size=(dias, 4))
+    x[rng.random(x.shape) < 0.05] = np.nan
+    senal = np.nan_to_num(x[:, 0]) + 0.5*np.nan_to_num(x[:, 1]) + rng.normal(size=dias)
+    parte = pd.DataFrame(x, columns=['f0', 'f1', 'f2', 'f3'])
+    parte.insert(0, 'fc', pd.bdate_range('2015-01-01', periods=dias))
+    parte.insert(1, 'ticker', 'T%d' % t)
+    parte['target_alza'] = np.where(senal > 0.5, 1, 0)
+    parte['target_baja'] = np.where(senal < -0.5, 1, 0)
+    parte.loc[rng.random(dias) < 0.1, 'target_alza'] = INDETERMINADO
+    partes.append(parte)
+  return pd.concat(partes, ignore_index=True)
+
+def test_auc_igual_a_sklearn():
+  rng = np.random.default_rng(1)
+  y = rng.random(500) < 0.3
+  score = np.round(rng.random(500), 1)  # con empates
+  assert auc(y, score) == pytest.approx(metrics.roc_auc_score(y, score), abs=1e-12)
+  assert np.isnan(auc(np.ones(5), np.arange(5)))
+
+def test_folds_con_embargo():
+  fechas = pd.bdate_range('2015-01-01', periods=900)
+  for mes, entrenamiento, test in folds_mensuales(fechas, meses_minimos=24, embargo=130):
+    assert (fechas[test].to_period('M').astype(str) == mes).all()
+    assert (fechas[entrenamiento].max() < pd.Timestamp(mes) - pd.Timedelta(days=130))
+
+def test_walk_forward_de_punta_a_punta(tmp_path):
+  base = _panel()
+  candidatos = candidatos_aleatorios(2, semilla=3)
+  for candidato in candidatos:
+    candidato['n_estimators'] = 10
+  metricas, matriz = walk_forward(base, candidatos, columnas=['f0', 'f1', 'f2', 'f3'], meses_minimos=24, trabajos=2)
+  folds = folds_mensuales(base['fc'], 24, 130)
+  assert len(metricas) == len(folds)*2*2
+  assert metricas['auc'].mean() > 0.6
+
+  # Un fold a mano, con pandas, xgb.train y roc_auc_score
+  mes, entrenamiento, test = folds[3]
+  fila = metricas[(metricas['mes'] == mes) & (metricas['target'] == 'target_alza') & (metricas['candidato'] == 1)].iloc[0]
+  entrenamiento = base.iloc[entrenamiento]
+  entrenamiento = entrenamiento[entrenamiento['target_alza'] != INDETERMINADO]
+  test = base.iloc[test]
+  test = test[test['target_alza'] != INDETERMINADO]
+  params = {k: v for k, v in candidatos[1].items() if k != 'n_estimators'}
+  params.update({'objective': 'binary:logistic', 'eval_metric': 'auc', 'nthread': 1, 'seed': 5})
+  columnas = ['f0', 'f1', 'f2', 'f3']
+  booster = xgb.train(params, xgb.DMatrix(entrenamiento[columnas].to_numpy(dtype=np.float32), label=entrenamiento['target_alza'], feature_names=columnas), 10)
+  p = booster.predict(xgb.DMatrix(test[columnas].to_numpy(dtype=np.float32), feature_names=columnas))
+  assert fila['filas_entrenamiento'] == len(entrenamiento) and fila['filas_test'] == len(test)
+  assert fila['auc'] == pytest.approx(metrics.roc_auc_score(test['target_alza'], p), abs=1e-9)
+  assert fila['logloss'] == pytest.approx(metrics.log_loss(test['target_alza'], p), abs=1e-6)  # p es float32
+
+  # La matriz guardada da las mismas métricas
+  matriz.guarda(str(tmp_path))
+  otra, _ = walk_forward(MatrizFeatures.carga(str(tmp_path)), candidatos, meses_minimos=24, trabajos=1)
+  pd.testing.assert_frame_equal(otra.drop(columns='segundos'), metricas.drop(columns='segundos'))
+  # Y en paralelo también
+  paralelo, _ = walk_forward(matriz, candidatos, meses_minimos=24, trabajos=3)
+  pd.testing.assert_frame_equal(paralelo.drop(columns='segundos'), metricas.drop(columns='segundos'))
+
+  mejores = mejores_candidatos(metricas)
+  finales = entrena_final(matriz, {target: candidatos[i] for target, i in mejores.items()})
+  assert set(finales) == {'target_alza', 'target_baja'}
+  assert finales['target_alza'].num_boosted_rounds() == 10
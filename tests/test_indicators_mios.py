@@ -0,0 +1,126 @@
+"""
+Equivalencia de los indicadores vectorizados de indicators_mios contra la versión original con loops (tests/referencia)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import indicators_mios as nuevo
+from modules.instrumentacion import SinkMemoria, instrumentado
+from referencia import indicators_mios as original
+
+# calcula_canalidad_histog_macd original recorre una global 'ventanas' que el módulo no define
+original.ventanas = [5, 30, 90, 180]
+
+@pytest.mark.parametrize('semilla', [0, 1])
+@pytest.mark.parametrize('lags', [4, 15, 30])
+def test_AT_tendencias_igual_al_original(datos, semilla, lags):
+  data = datos(400, semilla)
+  esperado = original.calcula_AT_tendencias(data.copy(), lags)
+  pd.testing.assert_frame_equal(nuevo.calcula_AT_tendencias(data.copy(), lags), esperado, check_exact=True)
+
+@pytest.mark.parametrize('lags', [4, 30, 360])
+def test_ultimas_filas_igual_a_la_cola(datos, lags):
+  data = datos(2000, 3)
+  completo = nuevo.calcula_AT_tendencias(data.copy(), lags)
+  ultimas = nuevo.calcula_AT_tendencias(data.copy(), lags, ultimas_filas=3)
+  pd.testing.assert_frame_equal(ultimas.tail(3), completo.tail(3), check_exact=True)
+  assert ultimas.iloc[:-3, -10:].isna().all().all()
+
+@pytest.mark.parametrize('ultimas_filas', [1, 3, 200])
+@pytest.mark.parametrize('lags', [4, 30, 120])
+def test_ultimas_filas_con_estado(datos, lags, ultimas_filas):
+  data = datos(2500, 5)
+  data.loc[data.index[[100, 2301, 2450]], '<CLOSE>'] = np.nan
+  completo = nuevo.calcula_AT_tendencias(data.copy(), lags)
+  # El estado de las primeras filas, y después la historia con 300 filas nuevas
+  estado = nuevo.estado_AT_tendencias(data.iloc[:2200], [lags])
+  ultimas = nuevo.calcula_AT_tendencias(data.copy(), lags, ultimas_filas=ultimas_filas, picos=estado)
+  pd.testing.assert_frame_equal(ultimas.tail(ultimas_filas), completo.tail(ultimas_filas), check_exact=True)
+  assert ultimas.iloc[:-ultimas_filas, -10:].isna().all().all()
+  lags_estado = nuevo.estado_AT_tendencias(data.iloc[:2200], [lags, 8])
+  pd.testing.assert_frame_equal(nuevo.calcula_AT_tendencias_lags(data.copy(), [lags, 8], ultimas_filas=ultimas_filas, picos=lags_estado).tail(ultimas_filas),
+                                nuevo.calcula_AT_tendencias_lags(data.copy(), [lags, 8]).tail(ultimas_filas), check_exact=True)
+  with pytest.raises(ValueError, match='ultimas_filas <= 300'):
+    nuevo.calcula_AT_tendencias(data.copy(), lags, ultimas_filas=301, picos=estado)
+
+def test_ultimas_filas_con_estado_no_depende_de_la_historia(datos):
+  """Con el estado solo se recorren las filas nuevas, sea cual sea el largo de la historia (sin estado se recorre toda)."""
+  recorridas = {}
+  for filas in (1000, 8000):
+    data = datos(filas + 5, 6)
+    estado = nuevo.estado_AT_tendencias(data.iloc[:filas], [15])
+    for con_estado in (True, False):
+      with instrumentado(SinkMemoria()) as sink:
+        nuevo.calcula_AT_tendencias(data, 15, ultimas_filas=5, picos=estado if con_estado else None)
+      recorridas[(filas, con_estado)] = sink.eventos[-1]['filas_recorridas']
+  assert recorridas[(1000, True)] == recorridas[(8000, True)] == 2*5
+  assert recorridas[(8000, False)] > 7000
+
+def _picos_original(data, lags, close_col='<CLOSE>'):
+  """Las columnas de picos de calcula_AT_tendencias original (cierres desplazados y redondeados), sin el resto del cálculo."""
+  desplazados = pd.DataFrame(index=data.index)
+  for i in range(1, lags + 1):
+    desplazados['p%sb' % i] = round(data[close_col].shift(i), 2)
+    desplazados['p%sf' % i] = round(data[close_col].shift(-i), 2)
+  maxb, maxf = round(desplazados.filter(regex='b').max(axis=1), 2), round(desplazados.filter(regex='f').max(axis=1), 2)
+  minb, minf = round(desplazados.filter(regex='b').min(axis=1), 2), round(desplazados.filter(regex='f').min(axis=1), 2)
+  close = data[close_col]
+  return np.flatnonzero((close > maxb) & (close > maxf)), np.flatnonzero((close < minb) & (close < minf))
+
+@pytest.mark.parametrize('semilla', [0, 1, 2])
+def test_detecta_picos_igual_al_original(datos, semilla):
+  data = datos(1500, semilla)
+  data.loc[data.index[[5, 100, 101]], '<CLOSE>'] = np.nan
+  lista_lags = [360, 120, 30, 8, 4, 2, 1]
+  picos = nuevo.detecta_picos(data, lista_lags)
+  for lags in lista_lags:
+    techos, pisos = _picos_original(data, lags)
+    np.testing.assert_array_equal(picos[lags]['techos'], techos)
+    np.testing.assert_array_equal(picos[lags]['pisos'], pisos)
+
+def test_AT_tendencias_lags_igual_a_cada_lag(datos):
+  data = datos(1200, 4)
+  lista_lags = [120, 30, 8, 4]
+  esperado = pd.concat([nuevo.calcula_AT_tendencias(data.copy(), lags, return_new_only=True) for lags in lista_lags], axis=1)
+  pd.testing.assert_frame_equal(nuevo.calcula_AT_tendencias_lags(data.copy(), lista_lags, return_new_only=True), esperado, check_exact=True)
+
+@pytest.mark.parametrize('semilla', [0, 1])
+def test_canalidad_igual_al_original(datos, semilla):
+  data = datos(1500, semilla)
+  data['macd_histog'] = np.random.default_rng(semilla).normal(0, 1, len(data))
+  data.loc[data.index[[3, 50]], '<CLOSE>'] = np.nan
+  pd.testing.assert_frame_equal(nuevo.calcula_canalidad_y(data.copy()), original.calcula_canalidad_y(data.copy()), check_exact=True)
+  pd.testing.assert_frame_equal(nuevo.calcula_canalidad_y(data.copy(), lista_ventanas=[3, 2]), original.calcula_canalidad_y(data.copy(), lista_ventanas=[3, 2]), check_exact=True)
+  pd.testing.assert_frame_equal(nuevo.calcula_canalidad_histog_macd(data.copy()), original.calcula_canalidad_histog_macd(data.copy()), check_exact=True)
+
+def _historia_notebook(dataset, lags):
+  """calcula_historia de los notebooks."""
+  for (columnName, columnData) in dataset.iloc[:, 6:].items():
+    i = 1
+    while i < lags:
+      dataset["var_%s_%s" % (columnName, i)] = columnData/columnData.shift(i) - 1
+      i = i + 1
+  return dataset
+
+@pytest.mark.parametrize('semilla', [0, 1])
+@pytest.mark.parametrize('lags', [2, 15])
+def test_historia_igual_al_notebook(datos, semilla, lags):
+  data = datos(500, semilla)
+  data['a'] = data['<CLOSE>']*2
+  data['b'] = data['<VOL>']
+  # Ceros y nulos: divisiones por cero como en pandas
+  data.loc[data.index[3], 'a'] = 0.
+  data.loc[data.index[[10, 11]], 'b'] = np.nan
+  pd.testing.assert_frame_equal(nuevo.calcula_historia(data.copy(), lags), _historia_notebook(data.copy(), lags), check_exact=True)
+
+def test_historia_por_pares(datos):
+  data = datos(300, 2)
+  data['a'] = data['<CLOSE>']*2
+  data['b'] = data['<VOL>']
+  data.loc[data.index[3], 'a'] = 0.
+  completo = _historia_notebook(data.copy(), 6)
+  matriz, nombres = nuevo.calcula_historia(data, pares=[('b', 3), ('a', 1), ('a', 5)], como_array=True)
+  assert nombres == ['var_b_3', 'var_a_1', 'var_a_5']
+  np.testing.assert_array_equal(matriz, completo[nombres].values)
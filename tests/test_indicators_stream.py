@@ -0,0 +1,99 @@
+"""
+Los indicadores en streaming, sembrados con una parte de la historia y actualizados de a una barra, dan lo mismo que la versión por lotes sobre toda la historia
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import indicators_foreign as foreign
+from modules import indicators_mios as mios
+from modules import indicators_stream as stream
+
+def _recorre(indicadores, data, desde):
+  """Siembra con las primeras 'desde' filas y actualiza con el resto: un DataFrame con lo que devuelve cada barra, con el índice de data."""
+  for indicador in indicadores:
+    indicador.semilla(data.iloc[:desde])
+  filas = []
+  for barra in data.iloc[desde:].to_dict('records'):
+    fila = {}
+    for indicador in indicadores:
+      fila.update(indicador.actualiza(dict(barra, **fila)))
+    filas.append(fila)
+  return pd.DataFrame(filas, index=data.index[desde:])
+
+def _iguales(calculado, esperado, desde):
+  for columna in calculado.columns:
+    np.testing.assert_array_equal(calculado[columna].values.astype(float), esperado[columna].values[desde:].astype(float), err_msg=columna)
+
+@pytest.mark.parametrize('desde', [0, 10, 700])
+def test_mios_igual_a_lotes(datos, desde):
+  data = datos(1500, 3)
+  data['macd_histog'] = np.random.default_rng(1).normal(0, 1, len(data))
+  data.loc[data.index[[200, 201, 900]], '<CLOSE>'] = np.nan
+  esperado = mios.calcula_AT_tendencias_lags(data.copy(), [30, 8, 4])
+  esperado = mios.calcula_amplitud(mios.calcula_canalidad_histog_macd(mios.calcula_canalidad_y(esperado)))
+  indicadores = [stream.TendenciasAT(lags) for lags in (30, 8, 4)] + [stream.CanalidadY(), stream.CanalidadHistogMacd(), stream.Amplitud()]
+  _iguales(_recorre(indicadores, data, desde), esperado, desde)
+
+def test_volumen_estandarizado_con_la_historia_hasta_cada_dia(datos):
+  data = datos(600, 5)
+  data.loc[data.index[50], '<VOL>'] = np.nan
+  calculado = _recorre([stream.VolumenEstandarizado()], data, 100)
+  for fila in (105, 300, 599):
+    assert calculado['vol_std'].loc[fila] == pytest.approx(mios.estandariza_volumen(data.iloc[:fila + 1].copy())['vol_std'].iloc[-1], rel=1e-9)
+
+FOREIGN = [(lambda: stream.Ema(10), lambda data: foreign.ema(data, 10)),
+           (stream.Macd, foreign.macd),
+           (stream.Trix, foreign.trix),
+           (stream.Rsi, foreign.rsi),
+           (lambda: stream.Rsi(0), lambda data: foreign.rsi(data, 0)),
+           (stream.Atr, lambda data: foreign.average_true_range(data, drop_tr=False)),
+           (stream.Dmi, foreign.directional_movement_index),
+           (stream.Obv, foreign.on_balance_volume),
+           (stream.Pvt, foreign.price_volume_trend),
+           (stream.AccDist, foreign.acc_dist),
+           (stream.ChaikinOscillator, foreign.chaikin_oscillator),
+           (stream.EaseOfMovement, foreign.ease_of_movement),
+           (stream.Nvi, foreign.negative_volume_index),
+           (stream.Pvi, foreign.positive_volume_index),
+           (stream.ChaikinVolatility, foreign.chaikin_volatility),
+           (stream.MassIndex, foreign.mass_index),
+           (lambda: stream.MassIndex(inclusive_window=True), lambda data: foreign.mass_index(data, inclusive_window=True)),
+           (stream.BollingerBands, foreign.bollinger_bands),
+           (lambda: stream.BollingerBands(inclusive_window=True), lambda data: foreign.bollinger_bands(data, inclusive_window=True)),
+           (stream.WilliamsAd, foreign.williams_ad)]
+
+@pytest.mark.parametrize('nulos', [False, True])
+@pytest.mark.parametrize('desde', [0, 5, 300])
+@pytest.mark.parametrize('indicador,lotes', FOREIGN)
+def test_foreign_igual_a_lotes(datos, indicador, lotes, desde, nulos):
+  data = datos(600, 3)
+  data.loc[data.index[100], '<HIGH>'] = data.loc[data.index[100], '<LOW>']
+  if nulos:
+    data.loc[data.index[[50, 320, 321]], '<CLOSE>'] = np.nan
+    data.loc[data.index[[60, 330]], '<HIGH>'] = np.nan
+    data.loc[data.index[70], '<VOL>'] = np.nan
+    data.loc[data.index[340], '<VOL>'] = 0
+  calculado = _recorre([indicador()], data, desde)
+  esperado = lotes(data.copy())
+  _iguales(calculado, esperado, desde)
+
+@pytest.mark.parametrize('desde', [0, 5, 300])
+def test_medias_con_los_inicios_de_toda_la_historia(datos, desde):
+  data = datos(600, 7)
+  data.loc[data.index[[3, 40, 41, 350]], '<CLOSE>'] = np.nan
+  esperado = mios.calcula_medias(data.copy())
+  calculado = _recorre([stream.Medias(inicios=mios._inicios_medias(data['<CLOSE>'].values.astype(float)))], data, desde)
+  _iguales(calculado, esperado, desde)
+
+def test_dmi_con_otra_columna_de_cierre(datos):
+  data = datos(300, 4)
+  renombrado = data.rename(columns={'<CLOSE>': 'y'})
+  calculado = _recorre([stream.Dmi(close_col='y')], renombrado, 100)
+  esperado = _recorre([stream.Dmi()], data, 100)
+  pd.testing.assert_frame_equal(calculado, esperado, check_exact=True)
+
+def test_acumulados_abstractos():
+  with pytest.raises(TypeError):
+    stream._Acumulado(10)
@@ -0,0 +1,73 @@
+"""
+Instrumentación: sin sinks no sale nada, SinkMemoria junta un evento completo por llamada (anidadas incluidas) y ResumenTickers agrupa por el ticker de ticker_actual
+"""
+
+import logging
+
+import pandas as pd
+
+from conftest import precios
+from modules import indicators_foreign as foreign
+from modules import indicators_mios as mios
+from modules.instrumentacion import ResumenTickers, SinkLogging, SinkMemoria, _sinks, instrumentado, ticker_actual
+from modules.pipeline import calcula_features, calcula_por_ticker
+
+def test_sin_sinks_no_escribe_nada(capsys, caplog):
+  caplog.set_level(logging.DEBUG)
+  assert _sinks == []
+  data = precios(300)
+  calculado = mios.calcula_AT_tendencias_lags(data.copy(), [30, 8])
+  capturado = capsys.readouterr()
+  assert capturado.out == '' and capturado.err == '' and caplog.records == []
+  pd.testing.assert_frame_equal(calculado, mios.calcula_AT_tendencias_lags.__wrapped__(data.copy(), [30, 8]), check_exact=True)
+
+def test_sink_logging_escribe_en_el_logger_no_en_stdout(capsys, caplog):
+  caplog.set_level(logging.INFO, logger='modules.instrumentacion')
+  with instrumentado(SinkLogging()):
+    foreign.rsi(precios(200))
+  assert capsys.readouterr().out == ''
+  assert len(caplog.records) == 1 and caplog.records[0].getMessage().startswith('rsi ticker=None filas=200 ')
+
+def test_sink_memoria_junta_los_eventos():
+  data = precios(400)
+  with instrumentado(SinkMemoria(memoria=True)) as sink:
+    with ticker_actual('GGAL'):
+      mios.calcula_AT_tendencias_lags(data, [30, 8])
+  eventos = sink.a_dataframe()
+  # Las anidadas terminan (y se reportan) antes que la de afuera
+  assert list(eventos['funcion']) == ['detecta_picos', 'calcula_AT_tendencias', 'calcula_AT_tendencias', 'calcula_AT_tendencias_lags']
+  assert list(eventos['profundidad']) == [1, 1, 1, 0] and list(eventos['externa']) == [False, False, False, True]
+  assert (eventos['ticker'] == 'GGAL').all() and (eventos['filas'] == 400).all()
+  assert (eventos['fin'] - eventos['inicio'] - eventos['segundos']).abs().max() < 1e-6 and (eventos['segundos'] > 0).all()
+  afuera = eventos.iloc[-1]
+  assert afuera['inicio'] <= eventos['inicio'].min() and afuera['fin'] >= eventos['fin'].max()
+  # Memoria: la de afuera no pierde el pico de las anidadas
+  assert (eventos['pico_memoria_bytes'] > 0).all() and afuera['pico_memoria_bytes'] >= eventos['pico_memoria_bytes'].max()
+  # Los contadores que reporta cada función (más picos con menos lags)
+  assert 0 < eventos['picos_techos'].iloc[1] < eventos['picos_techos'].iloc[2] and eventos['tendencias_pisos'].iloc[1:3].notna().all()
+
+def test_sink_memoria_sin_medir_memoria():
+  with instrumentado(SinkMemoria()) as sink:
+    foreign.rsi(precios(200))
+  assert sink.eventos[0]['pico_memoria_bytes'] is None and sink.eventos[0]['filas'] == 200
+
+def test_resumen_por_ticker():
+  partes = []
+  for semilla, (ticker, filas) in enumerate([('A', 300), ('B', 200), ('C', 100)]):
+    parte = precios(filas, semilla)
+    parte['<TICKER>'] = ticker
+    partes.append(parte)
+  panel = pd.concat(partes).sort_values('<FC>', kind='stable').reset_index(drop=True)
+  with instrumentado(ResumenTickers()) as resumen:
+    calcula_features(panel, ['rsi', ('calcula_AT_tendencias_lags', {'lista_lags': [30, 8]})], ticker_col='<TICKER>')
+    calcula_por_ticker(panel, foreign.rsi, '<TICKER>')
+  tabla = resumen.resumen()
+  # La llamada de todo el panel (sin ticker) y, dentro de cada ticker, solo la más externa: los indicadores que corre calcula_features no se suman otra vez
+  assert tabla.loc[(None, 'calcula_features'), 'filas'] == 600
+  tabla = tabla[tabla.index.get_level_values('ticker').notna()]
+  assert set(tabla.index) == {(ticker, funcion) for ticker in 'ABC' for funcion in ('calcula_features', 'rsi')}
+  for ticker, filas in [('A', 300), ('B', 200), ('C', 100)]:
+    assert tabla.loc[(ticker, 'calcula_features'), 'llamadas'] == 1 and tabla.loc[(ticker, 'calcula_features'), 'filas'] == filas
+    assert tabla.loc[(ticker, 'rsi'), 'llamadas'] == 1 and tabla.loc[(ticker, 'rsi'), 'filas'] == filas
+  assert tabla['segundos'].is_monotonic_decreasing
+  assert ResumenTickers().resumen().empty
@@ -0,0 +1,50 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.modelo_plano import ModeloPlano, _float_xgb, compara_con_xgboost, exporta_modelo
+
+xgb = pytest.importorskip('xgboost')
+
+def _entrena(objetivo, base_score=None):
+  rng = np.random.default_rng(0)
+  X = pd.DataFrame(rng.normal(size=(500, 6)), columns=['f%d' % i for i in range(6)])
+  X.iloc[rng.random(X.shape) < 0.05] = np.nan
+  y = (X['f0'].fillna(0) + X['f1'].fillna(0)*X['f2'].fillna(0) + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+  params = {'objective': objetivo, 'max_depth': 4, 'eta': 0.3}
+  if base_score is not None:
+    params['base_score'] = base_score
+  return xgb.train(params, xgb.DMatrix(X, label=y), num_boost_round=20), X
+
+@pytest.mark.parametrize('valor, esperado', [('5E-1', 0.5), ('[5E-1]', 0.5), ('[2.5E-1,1E0]', 0.25), (0.5, 0.5)])
+def test_float_xgb(valor, esperado):
+  assert _float_xgb(valor) == esperado
+
+@pytest.mark.parametrize('objetivo, base_score', [('binary:logistic', None), ('binary:logistic', 0.3), ('reg:squarederror', 0.2)])
+def test_igual_a_booster(tmp_path, objetivo, base_score):
+  booster, X = _entrena(objetivo, base_score)
+  info = exporta_modelo(booster, str(tmp_path))
+  if base_score is not None:
+    assert info['margen_base'] == pytest.approx(np.log(base_score/(1 - base_score)) if objetivo == 'binary:logistic' else base_score)
+  plano = ModeloPlano(str(tmp_path))
+  np.testing.assert_allclose(plano.margen(X), booster.predict(xgb.DMatrix(X), output_margin=True), atol=1e-5)
+  assert compara_con_xgboost(booster, str(tmp_path)) < 1e-5
+  assert compara_con_xgboost(booster, str(tmp_path), X=X) < 1e-5
+
+def test_base_score_de_la_configuracion(tmp_path):
+  booster, _ = _entrena('binary:logistic', 0.3)
+  # xgboost >= 2 guarda el base_score como vector: '[3E-1]'
+  if int(xgb.__version__.split('.')[0]) >= 2:
+    assert json.loads(booster.save_config())['learner']['learner_model_param']['base_score'].startswith('[')
+  assert exporta_modelo(booster, str(tmp_path))['margen_base'] == pytest.approx(np.log(0.3/0.7))
+
+@pytest.mark.skipif(int(xgb.__version__.split('.')[0]) >= 2, reason="los .dat de v2 (xgboost < 1.0) solo los abre xgboost 1.x")
+@pytest.mark.parametrize('modelo', ['model_alza', 'model_baja'])
+def test_modelos_v2(tmp_path, modelo):
+  ruta = os.path.join(os.path.dirname(__file__), '..', 'v2', modelo + '.dat')
+  info = exporta_modelo(ruta, str(tmp_path))
+  assert len(info['features']) == 205
+  assert compara_con_xgboost(ruta, str(tmp_path)) < 1e-5
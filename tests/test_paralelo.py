@@ -0,0 +1,74 @@
+"""
+Features en paralelo: los resultados vuelven en el orden pedido, un ticker que falla no frena al resto, en_vuelo acota los tickers mandados a la vez y con almacén se escribe ahí
+"""
+
+import functools
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.almacen import lee_features
+from modules.paralelo import calcula_features_tickers
+from modules.pipeline import calcula_features
+
+FEATURES = ['rsi', 'momentum']
+SEMILLAS = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+
+def _carga(ticker):
+  """Precios de un ticker (corre en los procesos hijos). Los primeros tardan más, así terminan en otro orden que el pedido; ROTO falla."""
+  if ticker == 'ROTO':
+    raise ValueError('sin datos para ROTO')
+  time.sleep({'A': 0.6, 'B': 0.3}.get(ticker, 0))
+  return precios(300, SEMILLAS[ticker])
+
+def _carga_contando(carpeta, ticker):
+  """Marca el ticker como en curso mientras carga y anota cuántos había en curso a la vez."""
+  en_curso = os.path.join(carpeta, ticker + '.en_curso')
+  open(en_curso, 'w').close()
+  time.sleep(0.3)
+  with open(os.path.join(carpeta, ticker + '.visto'), 'w') as f:
+    f.write(str(sum(archivo.endswith('.en_curso') for archivo in os.listdir(carpeta))))
+  os.remove(en_curso)
+  return precios(100, SEMILLAS[ticker])
+
+def _esperado(ticker):
+  data = calcula_features(precios(300, SEMILLAS[ticker]), FEATURES)
+  data.insert(0, '<TICKER>', ticker)
+  return data
+
+def test_orden_de_entrada_aunque_terminen_desordenados():
+  base, errores = calcula_features_tickers(['A', 'B', 'C'], FEATURES, _carga, procesos=3, une=False)
+  assert errores == {}
+  assert [df['<TICKER>'].iloc[0] for df in base] == ['A', 'B', 'C']
+  for df in base:
+    pd.testing.assert_frame_equal(df, _esperado(df['<TICKER>'].iloc[0]), check_exact=True)
+
+def test_un_ticker_que_falla_no_frena_al_resto():
+  base, errores = calcula_features_tickers(['A', 'ROTO', 'C'], FEATURES, _carga, procesos=2)
+  assert list(errores) == ['ROTO'] and 'sin datos para ROTO' in errores['ROTO']
+  pd.testing.assert_frame_equal(base, pd.concat([_esperado('A'), _esperado('C')]), check_exact=True)
+
+@pytest.mark.parametrize('en_vuelo', [1, 2])
+def test_en_vuelo_acota_los_tickers_mandados(tmp_path, en_vuelo):
+  carga = functools.partial(_carga_contando, str(tmp_path))
+  base, errores = calcula_features_tickers(['A', 'B', 'C', 'D'], FEATURES, carga, procesos=4, en_vuelo=en_vuelo)
+  assert errores == {} and len(base) == 400
+  vistos = [int(open(os.path.join(str(tmp_path), ticker + '.visto')).read()) for ticker in 'ABCD']
+  assert max(vistos) <= en_vuelo
+  if en_vuelo == 2:
+    # Con lugar para dos, alguna vez hubo dos a la vez (hay cuatro procesos libres)
+    assert max(vistos) == 2
+
+def test_escribe_en_el_almacen(tmp_path):
+  pytest.importorskip('pyarrow')
+  almacen = str(tmp_path / 'almacen')
+  escritas, errores = calcula_features_tickers(['A', 'ROTO', 'C'], FEATURES, _carga, procesos=2, almacen=almacen)
+  assert escritas == {'A': 300, 'C': 300} and list(errores) == ['ROTO']
+  esperado = pd.concat([_esperado('A'), _esperado('C')], ignore_index=True)
+  pd.testing.assert_frame_equal(lee_features(almacen), esperado, check_exact=True)
+  # Una segunda corrida no tiene fechas nuevas que escribir
+  escritas, _ = calcula_features_tickers(['A', 'C'], FEATURES, _carga, procesos=2, almacen=almacen)
+  assert escritas == {'A': 0, 'C': 0}
@@ -0,0 +1,77 @@
+"""
+El pipeline da lo mismo que llamar a cada indicador en orden sobre la base
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules import indicators_foreign as foreign
+from modules import indicators_mios as mios
+from modules.pipeline import calcula_features, calcula_por_ticker, plan_features
+
+def test_igual_a_llamar_cada_indicador(datos):
+  data = datos(500, 2)
+  features = ['macd', ('ema', {'period': 12}), 'directional_movement_index', 'average_true_range', 'money_flow_index', 'calcula_canalidad_histog_macd',
+              ('calcula_AT_tendencias_lags', {'lista_lags': [30, 8]}), 'rsi', 'bollinger_bands', 'calcula_amplitud', 'calcula_canalidad_y', 'williams_r']
+  esperado = data.copy()
+  for funcion in [foreign.macd, lambda d: foreign.ema(d, 12), foreign.directional_movement_index, foreign.average_true_range, foreign.money_flow_index,
+                  mios.calcula_canalidad_histog_macd, lambda d: mios.calcula_AT_tendencias_lags(d, [30, 8]), foreign.rsi, foreign.bollinger_bands,
+                  mios.calcula_amplitud, mios.calcula_canalidad_y, foreign.williams_r]:
+    esperado = funcion(esperado)
+  calculado = calcula_features(data, features)
+  assert set(calculado.columns) == set(esperado.columns)
+  pd.testing.assert_frame_equal(calculado, esperado[calculado.columns], check_exact=True)
+
+def test_intermedios_una_vez_y_sin_pedir_no_quedan(datos):
+  plan = plan_features(['macd', 'calcula_canalidad_histog_macd'])
+  assert [nombre for nombre, _, _ in plan].count('macd') == 1
+  calculado = calcula_features(datos(200), ['calcula_canalidad_histog_macd'])
+  assert 'macd_histog' not in calculado.columns and 'ema26' not in calculado.columns
+
+def test_parametro_obligatorio(datos):
+  data = datos(300)
+  calculado = calcula_features(data, [('calcula_AT_tendencias', {'lags': 8})])
+  pd.testing.assert_frame_equal(calculado, mios.calcula_AT_tendencias(data.copy(), 8), check_exact=True)
+  with pytest.raises(TypeError, match='necesita'):
+    calcula_features(data, ['calcula_AT_tendencias'])
+  with pytest.raises(TypeError, match='no tiene'):
+    calcula_features(data, [('rsi', {'periodo': 3})])
+
+def test_average_true_range_sin_borrar_true_range(datos):
+  data = datos(300)
+  calculado = calcula_features(data, [('average_true_range', {'drop_tr': False})])
+  pd.testing.assert_frame_equal(calculado, foreign.average_true_range(data.copy(), drop_tr=False), check_exact=True)
+  calculado = calcula_features(data, [('average_true_range', {'drop_tr': False}), 'directional_movement_index'])
+  assert list(calculado.columns[6:]) == ['true_range', 'atr', 'di_plus', 'di_minus', 'dxi', 'adx']
+
+PANEL = ['macd', 'rsi', 'on_balance_volume', 'estandariza_volumen', 'calcula_medias', 'momentum', 'bollinger_bands', 'calcula_canalidad_y',
+         ('calcula_historia', {'columnas': ['<CLOSE>'], 'lags': 5}), ('calcula_AT_tendencias', {'lags': 8})]
+
+def _panel():
+  """Tres tickers de escalas muy distintas, intercalados por fecha: si algo pasara de un ticker al siguiente se notaría en las primeras filas de cada uno."""
+  partes = []
+  for i, (ticker, escala) in enumerate([('A', 1.), ('B', 1000.), ('C', 0.01)]):
+    parte = precios(400 - 50*i, i)
+    parte[['<OPEN>', '<HIGH>', '<LOW>', '<CLOSE>']] *= escala
+    parte['<VOL>'] *= escala
+    parte['<TICKER>'] = ticker
+    partes.append(parte)
+  return pd.concat(partes).sort_values('<FC>', kind='stable').reset_index(drop=True)
+
+def test_panel_igual_a_cada_ticker_solo():
+  panel = _panel()
+  calculado = calcula_features(panel, PANEL, ticker_col='<TICKER>')
+  pd.testing.assert_frame_equal(calculado[panel.columns], panel, check_exact=True)
+  for ticker, parte in panel.groupby('<TICKER>'):
+    esperado = calcula_features(parte, PANEL)
+    pd.testing.assert_frame_equal(calculado[calculado['<TICKER>'] == ticker], esperado, check_exact=True)
+
+def test_sin_arrastre_entre_tickers():
+  panel = _panel()
+  calculado = calcula_por_ticker(panel, foreign.momentum, '<TICKER>', periods=5)
+  for ticker, parte in calculado.groupby('<TICKER>'):
+    # Las primeras filas de cada ticker no tienen historia aunque en el panel vengan después de las de otro, y ninguna compara contra el cierre de otra escala
+    assert (parte['momentum'].iloc[:5] == 0).all() and parte['momentum'].abs().max() < 1
+    np.testing.assert_array_equal(parte['momentum'].values, foreign.momentum(panel[panel['<TICKER>'] == ticker].copy(), 5)['momentum'].values)
@@ -0,0 +1,80 @@
+"""
+Por bloques da lo mismo que calcula_features sobre la base entera: idéntico sin tolerancia (con los features que dependen de toda la historia siguiendo su estado), y dentro de la tolerancia
+con las medias exponenciales calculadas con calentamiento
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.pipeline import calcula_features, calentamiento_features, filas_ewm
+from modules.por_bloques import calcula_features_por_bloques
+
+pytest.importorskip('pyarrow')
+
+EXACTOS = ['calcula_amplitud', 'momentum', 'williams_r', 'calcula_canalidad_y', ('calcula_historia', {'columnas': ['<CLOSE>'], 'lags': 5}),
+           ('calcula_AT_tendencias', {'lags': 30}), ('calcula_AT_tendencias_lags', {'lista_lags': [8, 4]})]
+CON_MEDIAS = ['macd', 'rsi', 'trix', 'bollinger_bands', 'mass_index', 'directional_movement_index', 'average_true_range', 'money_flow_index',
+              'ultimate_oscillator', 'chaikin_volatility', 'ease_of_movement', ('ema', {'period': 12}), 'calcula_canalidad_histog_macd']
+CON_HISTORIA = ['acc_dist', 'on_balance_volume', 'price_volume_trend', 'chaikin_oscillator', 'williams_ad', 'negative_volume_index', 'positive_volume_index',
+                'estandariza_volumen', 'calcula_medias', ('bollinger_bands', {'inclusive_window': True}), ('mass_index', {'inclusive_window': True})]
+
+def _panel(tmp_path, filas=1500):
+  """Tres tickers intercalados por fecha, con algunos cierres nulos (uno entre los primeros, que corre el inicio de las medias de calcula_medias) y un volumen nulo."""
+  partes = []
+  for i, ticker in enumerate(['A', 'B', 'C']):
+    parte = precios(filas - 200*i, i)
+    parte.loc[parte.index[300:305], '<CLOSE>'] = np.nan
+    parte.loc[parte.index[3 + i], '<CLOSE>'] = np.nan
+    parte.loc[parte.index[150], '<VOL>'] = np.nan
+    parte['<TICKER>'] = ticker
+    partes.append(parte)
+  panel = pd.concat(partes).sort_values('<FC>', kind='stable').reset_index(drop=True)
+  ruta = str(tmp_path / 'panel.parquet')
+  panel.to_parquet(ruta)
+  return panel, ruta
+
+@pytest.mark.parametrize('features', [EXACTOS, CON_MEDIAS, CON_HISTORIA])
+@pytest.mark.parametrize('filas_bloque', [97, 1000])
+def test_exacto_con_estado(tmp_path, filas_bloque, features):
+  panel, ruta = _panel(tmp_path)
+  info = calcula_features_por_bloques(ruta, str(tmp_path / 'salida.parquet'), features, filas_bloque, ticker_col='<TICKER>')
+  assert info['filas'] == len(panel)
+  esperado = calcula_features(panel, features, ticker_col='<TICKER>')
+  pd.testing.assert_frame_equal(pd.read_parquet(str(tmp_path / 'salida.parquet')), esperado, check_exact=True)
+
+def test_con_tolerancia(tmp_path):
+  panel, ruta = _panel(tmp_path)
+  info = calcula_features_por_bloques(ruta, str(tmp_path / 'salida.parquet'), CON_MEDIAS, 300, ticker_col='<TICKER>', tolerancia=1e-9)
+  assert info['calentamiento'] < 1500
+  esperado = calcula_features(panel, CON_MEDIAS, ticker_col='<TICKER>')
+  calculado = pd.read_parquet(str(tmp_path / 'salida.parquet'))
+  assert list(calculado.columns) == list(esperado.columns)
+  for columna in esperado.columns[len(panel.columns):]:
+    np.testing.assert_allclose(calculado[columna], esperado[columna], rtol=1e-6, atol=1e-9, err_msg=columna)
+
+def test_cota_de_las_medias_exponenciales():
+  rng = np.random.default_rng(0)
+  x = pd.Series(rng.normal(10, 3, 5000))
+  for com in (3, 14, 26):
+    filas = filas_ewm(com, 1e-6)
+    completa = x.ewm(com=com).mean().values[-1]
+    truncada = x.iloc[-filas - 1:].ewm(com=com).mean().values[-1]
+    assert abs(completa - truncada) <= 1e-6*x.abs().max()
+
+def test_acumulados_se_rechazan():
+  with pytest.raises(ValueError, match='on_balance_volume'):
+    calentamiento_features(['on_balance_volume', 'rsi'], tolerancia=1e-6)
+  with pytest.raises(ValueError, match='estandariza_volumen'):
+    calentamiento_features(['estandariza_volumen'], tolerancia=1e-6)
+
+def test_return_new_only_conserva_ticker_y_fecha(tmp_path):
+  panel, ruta = _panel(tmp_path, 600)
+  features = ['momentum', ('calcula_AT_tendencias', {'lags': 8})]
+  calcula_features_por_bloques(ruta, str(tmp_path / 'salida.parquet'), features, 250, ticker_col='<TICKER>', return_new_only=True)
+  calculado = pd.read_parquet(str(tmp_path / 'salida.parquet'))
+  esperado = calcula_features(panel, features, ticker_col='<TICKER>', return_new_only=True)
+  assert list(calculado.columns[:2]) == ['<TICKER>', '<FC>']
+  pd.testing.assert_frame_equal(calculado[['<TICKER>', '<FC>']], panel[['<TICKER>', '<FC>']], check_exact=True)
+  pd.testing.assert_frame_equal(calculado.iloc[:, 2:], esperado, check_exact=True)
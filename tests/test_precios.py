@@ -0,0 +1,69 @@
+"""
+Cache de precios sobre una FuenteLocal: la segunda vez solo se piden las fechas que faltan, offline nunca llama a la fuente y la salida tiene el formato de descarga
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.precios import COLUMNAS, CachePrecios, FuenteLocal
+
+pytest.importorskip('pyarrow')
+
+class _Contada:
+  """Fuente que anota los tramos que se le piden."""
+
+  def __init__(self, fuente):
+    self.fuente = fuente
+    self.pedidos = []
+
+  def __call__(self, ticker, fc_empieza, fc_termina):
+    self.pedidos.append((ticker, pd.Timestamp(fc_empieza), pd.Timestamp(fc_termina)))
+    return self.fuente(ticker, fc_empieza, fc_termina)
+
+def _sin_conexion(ticker, fc_empieza, fc_termina):
+  raise AssertionError("offline no tiene que llamar a la fuente")
+
+def _fuente(carpeta):
+  """Un csv de GGAL.BA con dos años de días hábiles, en el formato de descarga."""
+  data = precios(520, 3)
+  pd.DataFrame({'fc': data['<FC>'], 'ticker': 'GGAL.BA', 'y': data['<CLOSE>'], 'vl': data['<VOL>'], 'high': data['<HIGH>'], 'low': data['<LOW>']}) \
+    .to_csv(os.path.join(carpeta, 'GGAL.BA.csv'), index=False)
+  return FuenteLocal(carpeta)
+
+def test_solo_pide_lo_que_falta(tmp_path):
+  local = _fuente(str(tmp_path))
+  fuente = _Contada(local)
+  cache = CachePrecios(str(tmp_path / 'cache'), fuente)
+  primera = cache.descarga('GGAL.BA', '2010-03-01', '2010-06-01')
+  assert fuente.pedidos == [('GGAL.BA', pd.Timestamp('2010-03-01'), pd.Timestamp('2010-06-01'))]
+  pd.testing.assert_frame_equal(primera, local('GGAL.BA', '2010-03-01', '2010-06-01'), check_exact=True)
+  fuente.pedidos = []
+  # Un rango más amplio: solo los tramos de antes y de después
+  segunda = CachePrecios(str(tmp_path / 'cache'), fuente).descarga('GGAL.BA', '2010-01-01', '2010-09-01')
+  assert fuente.pedidos == [('GGAL.BA', pd.Timestamp('2010-01-01'), pd.Timestamp('2010-03-01')), ('GGAL.BA', pd.Timestamp('2010-06-01'), pd.Timestamp('2010-09-01'))]
+  pd.testing.assert_frame_equal(segunda, local('GGAL.BA', '2010-01-01', '2010-09-01'), check_exact=True)
+  fuente.pedidos = []
+  # Adentro de lo cubierto no se pide nada
+  tercera = cache.descarga('GGAL.BA', '2010-02-01', '2010-08-01')
+  assert fuente.pedidos == []
+  pd.testing.assert_frame_equal(tercera, local('GGAL.BA', '2010-02-01', '2010-08-01'), check_exact=True)
+  assert sorted(os.listdir(str(tmp_path / 'cache'))) == ['GGAL.BA.json', 'GGAL.BA.parquet']
+
+def test_offline_no_llama_a_la_fuente(tmp_path):
+  local = _fuente(str(tmp_path))
+  CachePrecios(str(tmp_path / 'cache'), local).descarga('GGAL.BA', '2010-03-01', '2010-06-01')
+  offline = CachePrecios(str(tmp_path / 'cache'), _sin_conexion, offline=True)
+  # Fuera de lo cubierto devuelve solo lo que hay en el cache
+  pd.testing.assert_frame_equal(offline.descarga('GGAL.BA', '2010-01-01', '2010-09-01'), local('GGAL.BA', '2010-03-01', '2010-06-01'), check_exact=True)
+  vacio = offline.descarga('^MERV', '2010-01-01', '2010-09-01')
+  assert list(vacio.columns) == COLUMNAS and len(vacio) == 0
+
+def test_formato_de_descarga(tmp_path):
+  local = _fuente(str(tmp_path))
+  calculado = CachePrecios(str(tmp_path / 'cache'), local).descarga('GGAL.BA', '2010-01-01', '2010-09-01')
+  assert list(calculado.columns) == COLUMNAS
+  assert list(calculado.dtypes) == list(local('GGAL.BA', '2010-01-01', '2010-09-01').dtypes)
+  assert pd.api.types.is_datetime64_any_dtype(calculado['fc']) and calculado['fc'].is_monotonic_increasing
@@ -0,0 +1,91 @@
+"""
+El servicio calcula las columnas del modelo como el notebook v2_dev, y en streaming da lo mismo que por lotes
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.pipeline import _columnas_AT
+from modules.servicio import MEDIAS, PREVIAS, EstadoTickers, FeaturesModelo, Scoring, _columnas_features
+
+# Las 205 columnas de model_alza / model_baja
+COLUMNAS_V2 = (MEDIAS + ['var_%s_%d' % (columna, lag) for columna in PREVIAS for lag in range(1, 15)] +
+               _columnas_features([('calcula_canalidad_y', {'lista_ventanas': [30, 90, 180]}), ('calcula_canalidad_histog_macd', {'histog_col': 'histog'})]) +
+               _columnas_AT([360, 120, 90, 60, 30, 15, 8, 4]))
+
+class _Modelo:
+  """predict_proba lineal sobre las columnas, con feature_names_in_ como los modelos de sklearn."""
+
+  def __init__(self, columnas):
+    self.feature_names_in_ = np.array(columnas, dtype=object)
+
+  def predict_proba(self, X):
+    z = np.nan_to_num(X[list(self.feature_names_in_)].to_numpy(dtype=float), posinf=0, neginf=0).sum(axis=1)/100
+    p = 1/(1 + np.exp(-z))
+    return np.column_stack([1 - p, p])
+
+def _historia(filas, semilla, ticker='A'):
+  """Un ticker en el formato de precios.py, con el cierre del merval (mvl) y algunas fechas sin merval."""
+  data = precios(filas, semilla).rename(columns={'<FC>': 'fc', '<CLOSE>': 'y', '<VOL>': 'vl', '<HIGH>': 'high', '<LOW>': 'low'})[['fc', 'y', 'vl', 'high', 'low']]
+  data['ticker'] = ticker
+  data['mvl'] = precios(filas, 100)['<CLOSE>'].values*10
+  data.loc[data.index[[40, 300, filas - 30]], 'mvl'] = np.nan
+  return data
+
+def test_columnas_v2():
+  features = FeaturesModelo(COLUMNAS_V2)
+  assert len(COLUMNAS_V2) == 205
+  assert features.lags == [360, 120, 90, 60, 30, 15, 8, 4] and features.ventanas_y == [30, 90, 180] and features.usa_merval
+
+def test_columnas_desconocidas():
+  with pytest.raises(ValueError, match='vol_std'):
+    FeaturesModelo(['exp1', 'var_vol_std_1', 'vol_std'])
+  with pytest.raises(ValueError, match='exp1'):
+    Scoring(_Modelo(['exp1', 'macd_histog']), _Modelo(['exp1', 'macd_histog']), features=['macd'])
+
+def test_barras_que_descarta_el_notebook():
+  data = _historia(400, 1)
+  calculado = FeaturesModelo(COLUMNAS_V2)(data)
+  descartadas = calculado['var_exp1_1'].isna() & calculado['nu_dias_y_entre_5pc_30'].isna()
+  esperado = np.zeros(len(data), dtype=bool)
+  esperado[:25] = True
+  esperado[[40, 300, 370]] = True
+  np.testing.assert_array_equal(descartadas.values, esperado)
+
+def test_streaming_igual_a_lotes():
+  data = _historia(1000, 2)
+  features = FeaturesModelo(COLUMNAS_V2)
+  esperado = features(data)
+  estado = EstadoTickers(features, features.indicadores)
+  estado.carga(data.iloc[:850])
+  for i in range(850, len(data)):
+    (_, _, fila), = estado.actualiza({'A': [data.iloc[i].to_dict()]})
+    for columna in COLUMNAS_V2:
+      if columna in fila:
+        assert fila[columna] == esperado[columna].iloc[i] or (np.isnan(fila[columna]) and np.isnan(esperado[columna].iloc[i])), (i, columna)
+      else:
+        assert np.isnan(esperado[columna].iloc[i]), (i, columna)
+
+def test_scoring_con_merval():
+  historia = pd.concat([_historia(800, 3, 'A'), _historia(800, 4, 'B')]).drop(columns='mvl')
+  merval = _historia(800, 100, '^MERV').drop(columns='mvl')
+  merval = merval[merval['fc'] != merval['fc'].iloc[790]]
+  datos = pd.concat([historia, merval])
+  predicciones = {}
+  for streaming in (True, False):
+    scoring = Scoring(_Modelo(COLUMNAS_V2), _Modelo(COLUMNAS_V2), streaming=streaming)
+    scoring.carga_historia(datos[datos['fc'] < datos['fc'].iloc[780]])
+    predicciones[streaming] = []
+    for fecha in datos['fc'].iloc[780:800]:
+      barras = datos[datos['fc'] == fecha].assign(fc=fecha.strftime('%Y-%m-%d')).to_dict('records')
+      predicciones[streaming].append(scoring.puntua(barras[::-1]))
+  assert predicciones[True] == predicciones[False]
+  # El merval solo da el mvl: no se puntúa ni cuenta como ticker
+  assert all(prediccion['ticker'] != '^MERV' for pedido in predicciones[True] for prediccion in pedido)
+  assert [len(pedido) for pedido in predicciones[True]] == [2]*20 and scoring.tickers == {'A', 'B'}
+  # El día sin merval el notebook descarta las barras: no se puntúan
+  sin_merval = predicciones[True][10]
+  assert [prediccion['ticker'] for prediccion in sin_merval] == ['B', 'A'] and all(prediccion['pred_alza'] is None for prediccion in sin_merval)
+  assert all(prediccion['pred_alza'] is not None for pedido in predicciones[True][11:] for prediccion in pedido)
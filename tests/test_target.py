@@ -0,0 +1,59 @@
+"""
+Equivalencia de calcula_targets contra el loop del notebook v2_train, por ticker
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import precios
+from modules.target import INDETERMINADO, calcula_target_class, calcula_targets
+
+def _target_notebook(df, SL, TG, dias_indeterminacion):
+  """El while de v2_train (un solo ticker), guardando además el día en que se define cada target."""
+  df = df.copy()
+  df['target_alza'] = INDETERMINADO
+  df['target_baja'] = INDETERMINADO
+  df['dias_alza'] = np.nan
+  df['dias_baja'] = np.nan
+  for i in range(1, dias_indeterminacion + 1):
+    low = df.low.shift(-i)/df.y - 1
+    high = df.high.shift(-i)/df.y - 1
+    alza = np.where(low < -SL, 0, INDETERMINADO)
+    alza = np.where(high > TG, 1, alza)
+    baja = np.where(low < -TG, 1, INDETERMINADO)
+    baja = np.where(high > SL, 0, baja)
+    for sentido, nuevo in (('alza', alza), ('baja', baja)):
+      define = (df['target_' + sentido] == INDETERMINADO) & (nuevo != INDETERMINADO)
+      df.loc[define, 'dias_' + sentido] = i
+      df['target_' + sentido] = np.where(df['target_' + sentido] == INDETERMINADO, nuevo, df['target_' + sentido])
+  return df
+
+def _panel(filas=1200):
+  """Tres tickers en el formato de precios.py, con un máximo nulo."""
+  partes = []
+  for semilla, ticker in [(1, 'A'), (2, 'B'), (3, 'C')]:
+    parte = precios(filas, semilla).rename(columns={'<FC>': 'fc', '<CLOSE>': 'y', '<HIGH>': 'high', '<LOW>': 'low'})[['fc', 'y', 'high', 'low']]
+    parte.insert(1, 'ticker', ticker)
+    partes.append(parte)
+  panel = pd.concat(partes, ignore_index=True)
+  panel.loc[17, 'high'] = np.nan
+  return panel
+
+@pytest.mark.parametrize('SL,TG,dias', [(0.06, 0.15, 90), (0.02, 0.03, 10), (0.1, 0.3, 200), (0.01, 0.01, 1)])
+def test_igual_al_notebook(SL, TG, dias):
+  panel = _panel()
+  esperado = pd.concat([_target_notebook(parte, SL, TG, dias) for _, parte in panel.groupby('ticker', sort=False)])
+  # Desordenado: calcula_targets ordena por ticker y fecha
+  calculado = calcula_targets(panel.sample(frac=1, random_state=0), [(SL, TG)], dias).sort_index()
+  for columna in ('target_alza', 'target_baja', 'dias_alza', 'dias_baja'):
+    np.testing.assert_array_equal(calculado[columna].values.astype(float), esperado[columna].values.astype(float), err_msg=columna)
+
+def test_varios_pares_y_target_class():
+  panel = _panel(600)
+  pares = calcula_targets(panel, [(0.06, 0.15), (0.02, 0.03)], return_new_only=True)
+  assert list(pares.columns) == ['%s_%s' % (columna, par) for par in ('0.06_0.15', '0.02_0.03') for columna in ('target_alza', 'dias_alza', 'target_baja', 'dias_baja')]
+  un_par = calcula_targets(panel, [(0.02, 0.03)])
+  np.testing.assert_array_equal(pares['target_alza_0.02_0.03'].values, un_par['target_alza'].values)
+  ticker = panel[panel['ticker'] == 'A']
+  np.testing.assert_array_equal(calcula_target_class(ticker, 0.06, 0.15, 90)['target'].values, _target_notebook(ticker, 0.06, 0.15, 90)['target_alza'].values)